@@ -0,0 +1,445 @@
+-- ===================================================
+-- OPTIONAL: Date-Range Partitioned Schema Variant
+-- Run after Table_Creation.sql, layer2.sql and layer3.sql. Converts the three
+-- time-ordered tables to yearly RANGE partitions so date filters (archive runs,
+-- recent-window queries) only touch the partitions they need:
+--   OBSERVATIONSESSIONS by Date
+--   OBSERVATIONS        by SessionDate (copy of the session's Date, kept by triggers)
+--   OBSERVATION_LOG     by ChangeTimestamp
+-- Partition pYYYY holds the rows of year YYYY (the first one also everything older);
+-- pmax catches rows beyond the newest year partition.
+--
+-- MySQL restrictions this variant works around:
+--   * Partitioned InnoDB tables can neither have nor be referenced by FOREIGN KEYs.
+--     The foreign keys of these tables are replaced by BEFORE INSERT / UPDATE / DELETE
+--     triggers that raise the same error numbers (1452 missing parent, 1451 parent in
+--     use, including a changed parent key that still has children), which the app
+--     already handles.
+--   * Every unique key must contain the partitioning column, so the primary keys
+--     become (SessionID, Date), (ObservationID, SessionDate) and (LogID, ChangeTimestamp).
+--     Uniqueness of the bare IDs is kept by the SESSION_KEYS / OBSERVATION_KEYS registry
+--     tables, which the same triggers maintain (error 1062).
+--   * Deleting a researcher, telescope or celestial object is no longer blocked by
+--     sessions/observations that still reference it.
+--   * Partitioned tables cannot have FULLTEXT indexes, so the notes index from
+--     layer3.sql is dropped; the notes search (astro_notes.py) detects this and
+--     falls back to an unranked LIKE scan.
+-- ===================================================
+USE astro_observatory;
+
+
+-- Helpers: run one statement built at runtime / drop every FK of a table
+
+DELIMITER //
+CREATE PROCEDURE run_ddl (
+    IN ddl_in TEXT
+)
+BEGIN
+    SET @ddl = ddl_in;
+    PREPARE ddl_stmt FROM @ddl;
+    EXECUTE ddl_stmt;
+    DEALLOCATE PREPARE ddl_stmt;
+END //
+
+CREATE PROCEDURE drop_foreign_keys (
+    IN table_name_in VARCHAR(64)
+)
+BEGIN
+    DECLARE fk_names TEXT;
+    DECLARE fk_name VARCHAR(64);
+
+    SELECT GROUP_CONCAT(CONSTRAINT_NAME) INTO fk_names
+    FROM information_schema.TABLE_CONSTRAINTS
+    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = table_name_in AND CONSTRAINT_TYPE = 'FOREIGN KEY';
+
+    WHILE fk_names IS NOT NULL AND fk_names <> '' DO
+        SET fk_name = SUBSTRING_INDEX(fk_names, ',', 1);
+        SET fk_names = IF(LOCATE(',', fk_names) > 0, SUBSTRING(fk_names, LOCATE(',', fk_names) + 1), '');
+        CALL run_ddl(CONCAT('ALTER TABLE ', table_name_in, ' DROP FOREIGN KEY ', fk_name));
+    END WHILE;
+END //
+DELIMITER ;
+
+
+-- Step 1: Remove the foreign keys (children first)
+
+CALL drop_foreign_keys('OBSERVATION_LOG');
+CALL drop_foreign_keys('OBSERVATIONS');
+CALL drop_foreign_keys('OBSERVATIONSESSIONS');
+
+-- ...and the notes FULLTEXT index (not supported on partitioned tables)
+ALTER TABLE OBSERVATIONS DROP INDEX ft_observations_notes;
+
+
+-- Step 2: Denormalize the session date onto OBSERVATIONS
+
+ALTER TABLE OBSERVATIONS ADD COLUMN SessionDate DATE NOT NULL DEFAULT '1000-01-01';
+
+UPDATE OBSERVATIONS AS O
+JOIN OBSERVATIONSESSIONS AS OS ON O.SessionID = OS.SessionID
+SET O.SessionDate = OS.Date;
+
+
+-- Step 3: Primary keys that include the partitioning column, then partition
+
+ALTER TABLE OBSERVATIONSESSIONS DROP PRIMARY KEY, ADD PRIMARY KEY (SessionID, Date);
+ALTER TABLE OBSERVATIONS DROP PRIMARY KEY, ADD PRIMARY KEY (ObservationID, SessionDate);
+ALTER TABLE OBSERVATION_LOG DROP PRIMARY KEY, ADD PRIMARY KEY (LogID, ChangeTimestamp);
+
+-- Recent-window access on OBSERVATIONS (pruned by SessionDate)
+CREATE INDEX idx_observations_session_date ON OBSERVATIONS (SessionDate, DataQualityRating);
+
+ALTER TABLE OBSERVATIONSESSIONS
+PARTITION BY RANGE COLUMNS (Date) (
+    PARTITION p2024 VALUES LESS THAN ('2025-01-01'),
+    PARTITION p2025 VALUES LESS THAN ('2026-01-01'),
+    PARTITION p2026 VALUES LESS THAN ('2027-01-01'),
+    PARTITION pmax VALUES LESS THAN (MAXVALUE)
+);
+
+ALTER TABLE OBSERVATIONS
+PARTITION BY RANGE COLUMNS (SessionDate) (
+    PARTITION p2024 VALUES LESS THAN ('2025-01-01'),
+    PARTITION p2025 VALUES LESS THAN ('2026-01-01'),
+    PARTITION p2026 VALUES LESS THAN ('2027-01-01'),
+    PARTITION pmax VALUES LESS THAN (MAXVALUE)
+);
+
+ALTER TABLE OBSERVATION_LOG
+PARTITION BY RANGE COLUMNS (ChangeTimestamp) (
+    PARTITION p2024 VALUES LESS THAN ('2025-01-01'),
+    PARTITION p2025 VALUES LESS THAN ('2026-01-01'),
+    PARTITION p2026 VALUES LESS THAN ('2027-01-01'),
+    PARTITION pmax VALUES LESS THAN (MAXVALUE)
+);
+
+
+-- Step 4: Key registries for the bare IDs
+-- Plain (non-partitioned) tables whose PRIMARY KEY gives SessionID / ObservationID the
+-- uniqueness the partitioned tables cannot declare. The triggers below add and remove
+-- entries, so a duplicate ID fails on the registry's key (error 1062) under any isolation
+-- level, including two sessions inserting the same ID at once.
+
+CREATE TABLE SESSION_KEYS (
+    SessionID INT PRIMARY KEY
+);
+
+CREATE TABLE OBSERVATION_KEYS (
+    ObservationID INT PRIMARY KEY
+);
+
+INSERT INTO SESSION_KEYS (SessionID) SELECT SessionID FROM OBSERVATIONSESSIONS;
+INSERT INTO OBSERVATION_KEYS (ObservationID) SELECT ObservationID FROM OBSERVATIONS;
+
+
+-- Step 5: Triggers standing in for the dropped keys
+-- Parent and child lookups are locking reads (FOR SHARE), as a real foreign key check
+-- would be: they see the latest committed rows rather than the transaction's snapshot,
+-- and the row they find cannot be deleted until this transaction ends.
+
+DELIMITER //
+CREATE TRIGGER trg_sessions_check_insert
+BEFORE INSERT ON OBSERVATIONSESSIONS
+FOR EACH ROW
+BEGIN
+    DECLARE parent_count INT;
+
+    INSERT INTO SESSION_KEYS (SessionID) VALUES (NEW.SessionID);
+    IF NEW.ResearcherID IS NOT NULL THEN
+        SELECT COUNT(*) INTO parent_count FROM RESEARCHERS WHERE ResearcherID = NEW.ResearcherID FOR SHARE;
+        IF parent_count = 0 THEN
+            SIGNAL SQLSTATE '23000' SET MESSAGE_TEXT = 'ResearcherID does not exist', MYSQL_ERRNO = 1452;
+        END IF;
+    END IF;
+    IF NEW.TelescopeID IS NOT NULL THEN
+        SELECT COUNT(*) INTO parent_count FROM TELESCOPES WHERE TelescopeID = NEW.TelescopeID FOR SHARE;
+        IF parent_count = 0 THEN
+            SIGNAL SQLSTATE '23000' SET MESSAGE_TEXT = 'TelescopeID does not exist', MYSQL_ERRNO = 1452;
+        END IF;
+    END IF;
+END //
+
+CREATE TRIGGER trg_sessions_check_update
+BEFORE UPDATE ON OBSERVATIONSESSIONS
+FOR EACH ROW
+BEGIN
+    DECLARE parent_count INT;
+    DECLARE child_count INT;
+
+    IF NEW.SessionID <> OLD.SessionID THEN
+        SELECT COUNT(*) INTO child_count FROM OBSERVATIONS WHERE SessionID = OLD.SessionID FOR SHARE;
+        IF child_count > 0 THEN
+            SIGNAL SQLSTATE '23000' SET MESSAGE_TEXT = 'Session still has observations', MYSQL_ERRNO = 1451;
+        END IF;
+        UPDATE SESSION_KEYS SET SessionID = NEW.SessionID WHERE SessionID = OLD.SessionID;
+    END IF;
+    IF NOT (OLD.ResearcherID <=> NEW.ResearcherID) AND NEW.ResearcherID IS NOT NULL THEN
+        SELECT COUNT(*) INTO parent_count FROM RESEARCHERS WHERE ResearcherID = NEW.ResearcherID FOR SHARE;
+        IF parent_count = 0 THEN
+            SIGNAL SQLSTATE '23000' SET MESSAGE_TEXT = 'ResearcherID does not exist', MYSQL_ERRNO = 1452;
+        END IF;
+    END IF;
+    IF NOT (OLD.TelescopeID <=> NEW.TelescopeID) AND NEW.TelescopeID IS NOT NULL THEN
+        SELECT COUNT(*) INTO parent_count FROM TELESCOPES WHERE TelescopeID = NEW.TelescopeID FOR SHARE;
+        IF parent_count = 0 THEN
+            SIGNAL SQLSTATE '23000' SET MESSAGE_TEXT = 'TelescopeID does not exist', MYSQL_ERRNO = 1452;
+        END IF;
+    END IF;
+END //
+
+CREATE TRIGGER trg_sessions_check_delete
+BEFORE DELETE ON OBSERVATIONSESSIONS
+FOR EACH ROW
+BEGIN
+    DECLARE child_count INT;
+
+    SELECT COUNT(*) INTO child_count FROM OBSERVATIONS WHERE SessionID = OLD.SessionID FOR SHARE;
+    IF child_count > 0 THEN
+        SIGNAL SQLSTATE '23000' SET MESSAGE_TEXT = 'Session still has observations', MYSQL_ERRNO = 1451;
+    END IF;
+    DELETE FROM SESSION_KEYS WHERE SessionID = OLD.SessionID;
+END //
+
+-- Keep OBSERVATIONS.SessionDate in step when a session is moved to another date
+CREATE TRIGGER trg_sessions_date_sync
+AFTER UPDATE ON OBSERVATIONSESSIONS
+FOR EACH ROW
+BEGIN
+    IF NOT (OLD.Date <=> NEW.Date) THEN
+        UPDATE OBSERVATIONS SET SessionDate = NEW.Date WHERE SessionID = NEW.SessionID;
+    END IF;
+END //
+
+CREATE TRIGGER trg_observations_check_insert
+BEFORE INSERT ON OBSERVATIONS
+FOR EACH ROW
+BEGIN
+    DECLARE parent_count INT;
+    DECLARE session_date DATE;
+
+    INSERT INTO OBSERVATION_KEYS (ObservationID) VALUES (NEW.ObservationID);
+    IF NEW.ObjectID IS NOT NULL THEN
+        SELECT COUNT(*) INTO parent_count FROM CELESTIALOBJECTS WHERE ObjectID = NEW.ObjectID FOR SHARE;
+        IF parent_count = 0 THEN
+            SIGNAL SQLSTATE '23000' SET MESSAGE_TEXT = 'ObjectID does not exist', MYSQL_ERRNO = 1452;
+        END IF;
+    END IF;
+    IF NEW.SessionID IS NOT NULL THEN
+        SELECT MAX(Date) INTO session_date FROM OBSERVATIONSESSIONS WHERE SessionID = NEW.SessionID FOR SHARE;
+        IF session_date IS NULL THEN
+            SIGNAL SQLSTATE '23000' SET MESSAGE_TEXT = 'SessionID does not exist', MYSQL_ERRNO = 1452;
+        END IF;
+        SET NEW.SessionDate = session_date;
+    END IF;
+END //
+
+CREATE TRIGGER trg_observations_check_update
+BEFORE UPDATE ON OBSERVATIONS
+FOR EACH ROW
+BEGIN
+    DECLARE parent_count INT;
+    DECLARE child_count INT;
+    DECLARE session_date DATE;
+
+    IF NOT (OLD.ObjectID <=> NEW.ObjectID) AND NEW.ObjectID IS NOT NULL THEN
+        SELECT COUNT(*) INTO parent_count FROM CELESTIALOBJECTS WHERE ObjectID = NEW.ObjectID FOR SHARE;
+        IF parent_count = 0 THEN
+            SIGNAL SQLSTATE '23000' SET MESSAGE_TEXT = 'ObjectID does not exist', MYSQL_ERRNO = 1452;
+        END IF;
+    END IF;
+    IF NOT (OLD.SessionID <=> NEW.SessionID) AND NEW.SessionID IS NOT NULL THEN
+        SELECT MAX(Date) INTO session_date FROM OBSERVATIONSESSIONS WHERE SessionID = NEW.SessionID FOR SHARE;
+        IF session_date IS NULL THEN
+            SIGNAL SQLSTATE '23000' SET MESSAGE_TEXT = 'SessionID does not exist', MYSQL_ERRNO = 1452;
+        END IF;
+        SET NEW.SessionDate = session_date;
+    END IF;
+    IF NEW.ObservationID <> OLD.ObservationID THEN
+        SELECT COUNT(*) INTO child_count FROM OBSERVATION_LOG WHERE ObservationID = OLD.ObservationID FOR SHARE;
+        IF child_count > 0 THEN
+            SIGNAL SQLSTATE '23000' SET MESSAGE_TEXT = 'Observation still has audit log rows', MYSQL_ERRNO = 1451;
+        END IF;
+        UPDATE OBSERVATION_KEYS SET ObservationID = NEW.ObservationID WHERE ObservationID = OLD.ObservationID;
+    END IF;
+END //
+
+CREATE TRIGGER trg_observations_check_delete
+BEFORE DELETE ON OBSERVATIONS
+FOR EACH ROW
+BEGIN
+    DECLARE child_count INT;
+
+    SELECT COUNT(*) INTO child_count FROM OBSERVATION_LOG WHERE ObservationID = OLD.ObservationID FOR SHARE;
+    IF child_count > 0 THEN
+        SIGNAL SQLSTATE '23000' SET MESSAGE_TEXT = 'Observation still has audit log rows', MYSQL_ERRNO = 1451;
+    END IF;
+    DELETE FROM OBSERVATION_KEYS WHERE ObservationID = OLD.ObservationID;
+END //
+
+-- Audit rows must point at an existing observation (looked up in the registry by key)
+CREATE TRIGGER trg_log_check_insert
+BEFORE INSERT ON OBSERVATION_LOG
+FOR EACH ROW
+BEGIN
+    DECLARE parent_count INT;
+
+    IF NEW.ObservationID IS NOT NULL THEN
+        SELECT COUNT(*) INTO parent_count FROM OBSERVATION_KEYS WHERE ObservationID = NEW.ObservationID FOR SHARE;
+        IF parent_count = 0 THEN
+            SIGNAL SQLSTATE '23000' SET MESSAGE_TEXT = 'ObservationID does not exist', MYSQL_ERRNO = 1452;
+        END IF;
+    END IF;
+END //
+
+CREATE TRIGGER trg_log_check_update
+BEFORE UPDATE ON OBSERVATION_LOG
+FOR EACH ROW
+BEGIN
+    DECLARE parent_count INT;
+
+    IF NOT (OLD.ObservationID <=> NEW.ObservationID) AND NEW.ObservationID IS NOT NULL THEN
+        SELECT COUNT(*) INTO parent_count FROM OBSERVATION_KEYS WHERE ObservationID = NEW.ObservationID FOR SHARE;
+        IF parent_count = 0 THEN
+            SIGNAL SQLSTATE '23000' SET MESSAGE_TEXT = 'ObservationID does not exist', MYSQL_ERRNO = 1452;
+        END IF;
+    END IF;
+END //
+DELIMITER ;
+
+
+-- Procedure 9: Add yearly partitions up to (and including) through_year
+-- Splits the empty pmax partition, so it is a metadata-only change as long as it
+-- runs before rows for the new year arrive.
+
+DELIMITER //
+CREATE PROCEDURE add_year_partitions (
+    IN table_name_in VARCHAR(64),
+    IN through_year INT
+)
+BEGIN
+    DECLARE y INT;
+
+    SELECT MAX(CAST(SUBSTRING(PARTITION_NAME, 2) AS UNSIGNED)) INTO y
+    FROM information_schema.PARTITIONS
+    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = table_name_in
+    AND PARTITION_NAME REGEXP '^p[0-9]{4}$';
+
+    WHILE y IS NOT NULL AND y < through_year DO
+        SET y = y + 1;
+        CALL run_ddl(CONCAT(
+            'ALTER TABLE ', table_name_in, ' REORGANIZE PARTITION pmax INTO (',
+            'PARTITION p', y, ' VALUES LESS THAN (''', y + 1, '-01-01''), ',
+            'PARTITION pmax VALUES LESS THAN (MAXVALUE))'
+        ));
+    END WHILE;
+END //
+DELIMITER ;
+
+
+-- Procedure 10: Retire yearly partitions older than before_year
+-- detach_in = TRUE swaps each partition out into its own table (<TABLE>_pYYYY) with
+-- EXCHANGE PARTITION before dropping it, so the rows are kept; FALSE drops them.
+-- Either way no row-by-row DELETE runs (and no DELETE triggers fire), so the work those
+-- triggers would do is done here: the retired IDs leave the key registries, and the
+-- OBSERVATION_LOG rows of retired observations (which may sit in newer log partitions)
+-- are moved to OBSERVATIONS_pYYYY_LOG with detach_in, or purged without it.
+
+DELIMITER //
+CREATE PROCEDURE retire_year_partitions (
+    IN table_name_in VARCHAR(64),
+    IN before_year INT,
+    IN detach_in BOOLEAN,
+    OUT retired_count INT
+)
+BEGIN
+    DECLARE partition_names TEXT;
+    DECLARE pname VARCHAR(64);
+
+    SET retired_count = 0;
+
+    SELECT GROUP_CONCAT(PARTITION_NAME ORDER BY PARTITION_ORDINAL_POSITION) INTO partition_names
+    FROM information_schema.PARTITIONS
+    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = table_name_in
+    AND PARTITION_NAME REGEXP '^p[0-9]{4}$'
+    AND CAST(SUBSTRING(PARTITION_NAME, 2) AS UNSIGNED) < before_year;
+
+    WHILE partition_names IS NOT NULL AND partition_names <> '' DO
+        SET pname = SUBSTRING_INDEX(partition_names, ',', 1);
+        SET partition_names = IF(LOCATE(',', partition_names) > 0,
+                                 SUBSTRING(partition_names, LOCATE(',', partition_names) + 1), '');
+        IF table_name_in = 'OBSERVATIONS' THEN
+            IF detach_in THEN
+                CALL run_ddl(CONCAT('CREATE TABLE OBSERVATIONS_', pname, '_LOG LIKE OBSERVATION_LOG'));
+                CALL run_ddl(CONCAT('ALTER TABLE OBSERVATIONS_', pname, '_LOG REMOVE PARTITIONING'));
+                CALL run_ddl(CONCAT('INSERT INTO OBSERVATIONS_', pname, '_LOG SELECT L.* FROM OBSERVATION_LOG AS L ',
+                                    'JOIN OBSERVATIONS PARTITION (', pname, ') AS O ON O.ObservationID = L.ObservationID'));
+            END IF;
+            CALL run_ddl(CONCAT('DELETE L FROM OBSERVATION_LOG AS L ',
+                                'JOIN OBSERVATIONS PARTITION (', pname, ') AS O ON O.ObservationID = L.ObservationID'));
+            CALL run_ddl(CONCAT('DELETE K FROM OBSERVATION_KEYS AS K ',
+                                'JOIN OBSERVATIONS PARTITION (', pname, ') AS O ON O.ObservationID = K.ObservationID'));
+        ELSEIF table_name_in = 'OBSERVATIONSESSIONS' THEN
+            CALL run_ddl(CONCAT('DELETE K FROM SESSION_KEYS AS K ',
+                                'JOIN OBSERVATIONSESSIONS PARTITION (', pname, ') AS OS ON OS.SessionID = K.SessionID'));
+        END IF;
+        IF detach_in THEN
+            CALL run_ddl(CONCAT('CREATE TABLE ', table_name_in, '_', pname, ' LIKE ', table_name_in));
+            CALL run_ddl(CONCAT('ALTER TABLE ', table_name_in, '_', pname, ' REMOVE PARTITIONING'));
+            CALL run_ddl(CONCAT('ALTER TABLE ', table_name_in, ' EXCHANGE PARTITION ', pname,
+                                ' WITH TABLE ', table_name_in, '_', pname));
+        END IF;
+        CALL run_ddl(CONCAT('ALTER TABLE ', table_name_in, ' DROP PARTITION ', pname));
+        SET retired_count = retired_count + 1;
+    END WHILE;
+END //
+DELIMITER ;
+
+
+-- Procedure 11: Partition maintenance (schedule e.g. monthly, or via a MySQL EVENT)
+-- Creates partitions for the next years_ahead years on the live and archive tables.
+-- With keep_years > 0, retires live partitions older than the last keep_years years
+-- (current year included) and rebuilds the trigger-maintained summaries, since
+-- retired rows leave without firing the DELETE triggers. Archive tables are never retired.
+
+DELIMITER //
+CREATE PROCEDURE maintain_observation_partitions (
+    IN years_ahead INT,
+    IN keep_years INT,
+    IN detach_in BOOLEAN
+)
+BEGIN
+    DECLARE through_year INT DEFAULT YEAR(CURDATE()) + IFNULL(years_ahead, 1);
+    DECLARE retired INT DEFAULT 0;
+    DECLARE total_retired INT DEFAULT 0;
+
+    CALL add_year_partitions('OBSERVATIONSESSIONS', through_year);
+    CALL add_year_partitions('OBSERVATIONS', through_year);
+    CALL add_year_partitions('OBSERVATION_LOG', through_year);
+    CALL add_year_partitions('OBSERVATIONS_ARCHIVE', through_year);
+    CALL add_year_partitions('OBSERVATION_LOG_ARCHIVE', through_year);
+
+    IF keep_years IS NOT NULL AND keep_years > 0 THEN
+        CALL retire_year_partitions('OBSERVATION_LOG', YEAR(CURDATE()) - keep_years + 1, detach_in, retired);
+        CALL retire_year_partitions('OBSERVATIONS', YEAR(CURDATE()) - keep_years + 1, detach_in, retired);
+        SET total_retired = total_retired + retired;
+        CALL retire_year_partitions('OBSERVATIONSESSIONS', YEAR(CURDATE()) - keep_years + 1, detach_in, retired);
+
+        IF total_retired > 0 THEN
+            CALL rebuild_all_researcher_totals();
+            CALL rebuild_telescope_utilization();
+        END IF;
+    END IF;
+END //
+DELIMITER ;
+
+-- Make sure next year's partitions exist right away
+CALL maintain_observation_partitions(1, NULL, FALSE);
+
+-- Execution Examples:
+-- CALL maintain_observation_partitions(1, NULL, FALSE); -- only add partitions for next year
+-- CALL maintain_observation_partitions(1, 5, TRUE);     -- also detach years older than the last 5
+-- EXPLAIN SELECT COUNT(*) FROM OBSERVATIONSESSIONS WHERE Date >= '2025-01-01';  -- partitions: p2025,p2026,...
+--
+-- Scheduling with the event scheduler (SET GLOBAL event_scheduler = ON):
+-- CREATE EVENT ev_maintain_observation_partitions ON SCHEDULE EVERY 1 MONTH
+-- DO CALL maintain_observation_partitions(1, NULL, FALSE);
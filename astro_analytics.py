@@ -0,0 +1,212 @@
+"""Catalog-scale analytics that run as one set-based pass instead of per-row round-trips.
+
+Usage:
+    python astro_analytics.py effective-magnitude [--object-type Galaxy] [--out effmag.csv]
+    python astro_analytics.py check-parity
+"""
+import argparse
+import csv
+import sys
+
+import numpy as np
+import pandas as pd
+
+from astro_db import get_pool
+from astro_metrics import get_query_metrics
+
+DEFAULT_BLOCK_SIZE = 5000
+
+# ===================================================
+# Effective Magnitude (batch)
+# ===================================================
+# Same formula as calculate_effective_magnitude() in layer2.sql:
+#     Effective Mag = Apparent Mag + 5 * LOG10(Redshift * 1000)
+
+EFFECTIVE_MAGNITUDE_COLUMNS = (
+    "ObservationID", "ObjectID", "ObjectName", "ObjectType", "Date",
+    "Magnitude", "Redshift", "EffectiveMagnitude",
+)
+
+# Raw columns for the vectorized (NumPy) path; the formula is applied client-side
+_OBSERVATION_BLOCK_SQL = """
+SELECT O.ObservationID, CO.ObjectID, CO.ObjectName, CO.ObjectType, OS.Date, CO.Magnitude, CO.Redshift
+FROM OBSERVATIONS AS O
+JOIN CELESTIALOBJECTS AS CO ON O.ObjectID = CO.ObjectID
+JOIN OBSERVATIONSESSIONS AS OS ON O.SessionID = OS.SessionID
+{where}
+ORDER BY O.ObservationID
+"""
+
+# Fully set-based path: the server evaluates the formula inline for every row
+_EFFECTIVE_MAGNITUDE_SQL = """
+SELECT O.ObservationID, CO.ObjectID, CO.ObjectName, CO.ObjectType, OS.Date, CO.Magnitude, CO.Redshift,
+       CO.Magnitude + 5 * LOG10(CO.Redshift * 1000.0) AS EffectiveMagnitude
+FROM OBSERVATIONS AS O
+JOIN CELESTIALOBJECTS AS CO ON O.ObjectID = CO.ObjectID
+JOIN OBSERVATIONSESSIONS AS OS ON O.SessionID = OS.SessionID
+{where}
+ORDER BY O.ObservationID
+"""
+
+_PARITY_SQL = """
+SELECT ObjectID, Magnitude, Redshift, calculate_effective_magnitude(Magnitude, Redshift) AS StoredResult
+FROM CELESTIALOBJECTS
+{where}
+"""
+
+# calculate_effective_magnitude returns FLOAT (single precision), so compare loosely
+PARITY_TOLERANCE = 1e-3
+
+
+def effective_magnitude(magnitude, redshift):
+    """Vectorized effective magnitude; NaN where MySQL's LOG10 would return NULL."""
+    magnitude = np.asarray(magnitude, dtype=float)
+    scaled = np.asarray(redshift, dtype=float) * 1000.0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result = magnitude + 5 * np.log10(scaled)
+    return np.where(scaled > 0, result, np.nan)
+
+
+def _where_clause(object_type=None, telescope_id=None, date_from=None, date_to=None):
+    conditions, params = [], []
+    if object_type:
+        conditions.append("CO.ObjectType = %s")
+        params.append(object_type)
+    if telescope_id:
+        conditions.append("OS.TelescopeID = %s")
+        params.append(telescope_id)
+    if date_from:
+        conditions.append("OS.Date >= %s")
+        params.append(date_from)
+    if date_to:
+        conditions.append("OS.Date <= %s")
+        params.append(date_to)
+    where = ("WHERE " + " AND ".join(conditions)) if conditions else ""
+    return where, params
+
+
+def iter_effective_magnitudes(pool, engine="numpy", block_size=DEFAULT_BLOCK_SIZE, **filters):
+    """Yield DataFrame blocks of effective magnitudes for every matching observation.
+
+    ``engine="numpy"`` fetches Magnitude/Redshift column blocks and applies the
+    formula vectorized; ``engine="sql"`` lets MySQL evaluate it inline. Either
+    way the whole filtered set costs one query, streamed ``block_size`` rows at a time.
+    Filters: object_type, telescope_id, date_from, date_to.
+    """
+    where, params = _where_clause(**filters)
+    sql = (_EFFECTIVE_MAGNITUDE_SQL if engine == "sql" else _OBSERVATION_BLOCK_SQL).format(where=where)
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            with get_query_metrics().track(f"effective_magnitude_{engine}", sql):
+                cursor.execute(sql, params)
+            columns = [c[0] for c in cursor.description]
+            while True:
+                rows = cursor.fetchmany(block_size)
+                if not rows:
+                    break
+                block = pd.DataFrame(rows, columns=columns)
+                if engine == "sql":
+                    block["EffectiveMagnitude"] = block["EffectiveMagnitude"].astype(float)
+                else:
+                    block["EffectiveMagnitude"] = effective_magnitude(block["Magnitude"], block["Redshift"])
+                yield block
+        finally:
+            cursor.close()
+
+
+def compute_effective_magnitudes(pool, engine="numpy", **filters):
+    """All matching observations as one DataFrame (use the iterator for very large sets)."""
+    blocks = list(iter_effective_magnitudes(pool, engine=engine, **filters))
+    if not blocks:
+        return pd.DataFrame(columns=list(EFFECTIVE_MAGNITUDE_COLUMNS))
+    return pd.concat(blocks, ignore_index=True)
+
+
+def export_effective_magnitudes(pool, path, engine="numpy", **filters):
+    """Stream effective magnitudes to a CSV file block by block; returns the row count."""
+    written = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(EFFECTIVE_MAGNITUDE_COLUMNS)
+        for block in iter_effective_magnitudes(pool, engine=engine, **filters):
+            writer.writerows(block[list(EFFECTIVE_MAGNITUDE_COLUMNS)].itertuples(index=False, name=None))
+            written += len(block)
+    return written
+
+
+def check_effective_magnitude_parity(pool, object_type=None, tolerance=PARITY_TOLERANCE):
+    """Compare the vectorized formula with the stored function over the catalog.
+
+    Returns {"checked": n, "mismatches": [...], "max_abs_diff": x}; an empty
+    mismatch list means both implementations agree (NULL <-> NaN included).
+    """
+    where, params = ("WHERE ObjectType = %s", [object_type]) if object_type else ("", [])
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            with get_query_metrics().track("effective_magnitude_parity", _PARITY_SQL) as stat:
+                cursor.execute(_PARITY_SQL.format(where=where), params)
+                rows = cursor.fetchall()
+                stat["rows"] = len(rows)
+        finally:
+            cursor.close()
+    if not rows:
+        return {"checked": 0, "mismatches": [], "max_abs_diff": 0.0}
+
+    object_ids = [r[0] for r in rows]
+    vectorized = effective_magnitude([r[1] for r in rows], [r[2] for r in rows])
+    stored = np.array([np.nan if r[3] is None else float(r[3]) for r in rows])
+    both_null = np.isnan(vectorized) & np.isnan(stored)
+    diff = np.abs(vectorized - stored)
+    bad = ~both_null & ~(diff <= tolerance)
+    mismatches = [
+        {"ObjectID": object_ids[i], "Vectorized": float(vectorized[i]), "StoredFunction": float(stored[i])}
+        for i in np.flatnonzero(bad)
+    ]
+    comparable = diff[~np.isnan(diff)]
+    return {
+        "checked": len(rows),
+        "mismatches": mismatches,
+        "max_abs_diff": float(comparable.max()) if comparable.size else 0.0,
+    }
+
+
+# ===================================================
+# CLI
+# ===================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Catalog-scale analytics.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    eff = sub.add_parser("effective-magnitude", help="effective magnitude for every matching observation")
+    eff.add_argument("--object-type")
+    eff.add_argument("--telescope-id", type=int)
+    eff.add_argument("--date-from", help="YYYY-MM-DD")
+    eff.add_argument("--date-to", help="YYYY-MM-DD")
+    eff.add_argument("--engine", choices=["numpy", "sql"], default="numpy")
+    eff.add_argument("--out", default="effective_magnitudes.csv")
+
+    parity = sub.add_parser("check-parity", help="compare the vectorized formula with the stored function")
+    parity.add_argument("--object-type")
+
+    args = parser.parse_args(argv)
+    pool = get_pool()
+    if args.command == "effective-magnitude":
+        count = export_effective_magnitudes(
+            pool, args.out, engine=args.engine, object_type=args.object_type,
+            telescope_id=args.telescope_id, date_from=args.date_from, date_to=args.date_to,
+        )
+        print(f"Wrote {count} rows to {args.out}")
+        return 0
+    result = check_effective_magnitude_parity(pool, object_type=args.object_type)
+    print(f"Checked {result['checked']} objects, max |diff| = {result['max_abs_diff']:.2e}, "
+          f"{len(result['mismatches'])} mismatch(es)")
+    for m in result["mismatches"][:20]:
+        print(f"  ObjectID {m['ObjectID']}: vectorized={m['Vectorized']} stored={m['StoredFunction']}")
+    return 0 if not result["mismatches"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,28 +1,89 @@
 import streamlit as st
-import mysql.connector
 from mysql.connector import Error
 import pandas as pd
-import base64
+import functools
+import hashlib
 import os
-
-# --- Database Configuration ---
-DB_CONFIG = {
-    'host': 'localhost',
-    'database': 'astro_observatory',
-    'user': 'root',
-    'password': 'password'  # change this to your MySQL password
-}
+import shutil
+import tempfile
+import time
+
+from astro_archive import DEFAULT_CHUNK_SIZE as ARCHIVE_CHUNK_SIZE
+from astro_columnar import MIRRORED_FUNCTIONS, columnar_fetch_page, get_columnar_mirror, mirror_status, sync_mirror
+from astro_db import get_pool, get_query_cache, get_statement_cache
+from astro_ingest import DEFAULT_CHUNK_SIZE
+from astro_jobs import ACTIVE_STATES, get_job_runner
+from astro_metrics import METRICS_FILE, get_query_metrics
+from astro_paging import AUDIT_LOG_OPEN_RANGE, AUDIT_LOG_PAGED, SEEING_JOIN_PAGED, export_rows, fetch_page
+from astro_quality import DEFAULT_CHUNK_SIZE as RERATE_CHUNK_SIZE, RATING_MAX, RATING_MIN
+from astro_queries import TOP_N_METRICS
+from astro_sky import DEFAULT_SKY_LIMIT, MAX_RADIUS_DEG, MAX_SKY_LIMIT, parse_dec, parse_ra
+from astro_snapshot import (
+    load_snapshot, refresh_snapshot, snapshot_distance_extreme, snapshot_magnitude_extreme,
+    snapshot_telescope_hours, snapshot_telescope_usage, stale_sections,
+)
+from astro_service import (
+    archive_observations, calculate_effective_magnitude, create_researcher, distance_extreme,
+    effective_magnitude_parity, effective_magnitudes, import_observations, insert_celestial_object,
+    insert_observation, insert_telescope, magnitude_extreme, observation_magnitude, observers_of_discoverer,
+    pending_archive_count, query_plan_report, rebuild_researcher_totals, recent_archive_runs, record_exists,
+    rerate_by_rule, rerate_from_file, rerate_preview,
+    researcher_stats, researcher_totals_drift, search_observation_notes, sky_box_search, sky_cone_search,
+    telescope_daily_usage, telescope_hours, telescope_hours_report,
+    telescope_usage, top_n_per_type, update_quality_rating, update_researcher_total_time, validate_observation,
+)
 
 # ===================================================
 # Background Music Function - REPLACE YOUR EXISTING ONE
 # ===================================================
+# Set ASTRO_BGM=0 to skip the player entirely (headless / benchmark runs)
+BGM_ENABLED = os.environ.get("ASTRO_BGM", "1") != "0"
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+# Files here are served by Streamlit at app/static/<name> (see .streamlit/config.toml)
+STATIC_DIR = os.path.join(APP_DIR, "static")
+
+@functools.lru_cache(maxsize=4)
+def _audio_source_url(static_file, mtime, size):
+    """Resolve the <source> URL once per file version (path, mtime, size)"""
+    # browser fetches and caches the file itself; hash busts the cache when it changes
+    with open(static_file, "rb") as f:
+        digest = hashlib.sha1(f.read()).hexdigest()[:12]
+    return f"app/static/{os.path.basename(static_file)}?v={digest}"
+
+def _static_audio_file(audio_file):
+    """Path of the file under static/, copied there on first use if it sits next to the app; None if missing"""
+    name = os.path.basename(audio_file)
+    static_file = os.path.join(STATIC_DIR, name)
+    if os.path.exists(static_file):
+        return static_file
+    for candidate in (os.path.join(APP_DIR, name), audio_file):
+        if os.path.exists(candidate):
+            os.makedirs(STATIC_DIR, exist_ok=True)
+            # copy under a temporary name so a concurrent session never serves a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=STATIC_DIR, suffix=".part")
+            os.close(fd)
+            try:
+                shutil.copy2(candidate, tmp_path)
+                os.replace(tmp_path, static_file)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            return static_file
+    return None
+
 def add_background_music(audio_file):
     """Add looping background music in the footer"""
-    if os.path.exists(audio_file):
-        with open(audio_file, "rb") as f:
-            audio_bytes = f.read()
-        audio_base64 = base64.b64encode(audio_bytes).decode()
-        
+    if not BGM_ENABLED:
+        return
+    try:
+        found = _static_audio_file(audio_file)
+    except OSError as e:
+        st.warning(f"Background music disabled: could not copy {os.path.basename(audio_file)} into {STATIC_DIR} ({e}).")
+        return
+    if found:
+        stat = os.stat(found)
+        audio_src = _audio_source_url(found, stat.st_mtime, stat.st_size)
+
         # Create a footer music player that spans the bottom of the page
         audio_html = f"""
         <div style="position: fixed; bottom: 0; left: 0; right: 0; z-index: 9999; 
@@ -36,7 +97,7 @@ def add_background_music(audio_file):
                 🎵 Interstellar Soundtrack
             </p>
             <audio controls loop id="background-music" style="height: 35px;">
-                <source src="data:audio/mp3;base64,{audio_base64}" type="audio/mp3">
+                <source src="{audio_src}" type="audio/mp3">
                 Your browser does not support the audio element.
             </audio>
             <script>
@@ -84,92 +145,209 @@ def add_background_music(audio_file):
 # Utility Functions
 # ===================================================
 
-def get_db_connection():
-    try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        if conn.is_connected():
-            return conn
-    except Error as e:
-        st.error(f"❌ Failed to connect to MySQL: {e}")
-        return None
+def show_sql_error(e):
+    st.error(f"⚠️ SQL Error: {e}")
 
-def execute_sql(conn, sql, params=None, fetch=False):
-    if not conn:
-        return [] if fetch else False
-    cursor = None
-    try:
-        cursor = conn.cursor()
-        cursor.execute(sql, params if params else ())
-        if fetch:
-            columns = [i[0] for i in cursor.description]
-            rows = cursor.fetchall()
-            return columns, rows
-        else:
-            conn.commit()
-            return True
-    except Error as e:
-        st.error(f"⚠️ SQL Error: {e}")
-        return [] if fetch else False
-    finally:
-        if cursor:
-            cursor.close()
-
-def record_exists(conn, table, column, value):
-    sql = f"SELECT 1 FROM {table} WHERE {column} = %s LIMIT 1"
-    cols, rows = execute_sql(conn, sql, params=(value,), fetch=True)
-    return bool(rows)
-
-def insert_celestial_object(conn,object_id,name,obj_type,magnitude,ra,dec,last_obs,distance_parsecs,redshift,diameter_km,mass_solar):
-    try:
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            INSERT INTO CELESTIALOBJECTS 
-            (ObjectID, ObjectName, ObjectType, Magnitude, RightAscension, Declination, LastObservedDate, Distance_Parsecs, Redshift, Diameter_km, Mass_SolarMass)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """,
-            (object_id, name, obj_type, magnitude, ra, dec, last_obs, distance_parsecs, redshift, diameter_km, mass_solar)
-        )
-        conn.commit()
-        cursor.close()
-        return True, None
-    except Error as e:
+# seconds between automatic reruns while this session has background queries running
+JOB_POLL_INTERVAL = 0.5
+
+# Set ASTRO_FRAGMENTS=0 to rerun the whole script on every interaction (for before/after timing)
+FRAGMENTS_ENABLED = os.environ.get("ASTRO_FRAGMENTS", "1") != "0"
+# script runs kept for the rerun-timing readout (Tab 5)
+RERUN_HISTORY = 100
+
+def record_rerun(scope, seconds):
+    history = st.session_state.setdefault("rerun_timings", [])
+    history.append({"at": time.strftime("%H:%M:%S"), "scope": scope, "ms": round(seconds * 1000, 1)})
+    del history[:-RERUN_HISTORY]
+
+def in_full_run():
+    """False while a single section reruns on its own (a fragment run)"""
+    return st.session_state.get("_full_run", True)
+
+def rerun_section():
+    """Rerun only the current section when it runs as a fragment, else the whole script"""
+    if FRAGMENTS_ENABLED and not in_full_run():
+        st.rerun(scope="fragment")
+    st.rerun()
+
+def write_metrics_file():
+    """Keep the textfile collector's copy current (ASTRO_METRICS_FILE)"""
+    if METRICS_FILE:
         try:
-            conn.rollback()
-        except:
+            get_query_metrics().write_prometheus(METRICS_FILE)
+        except OSError:
             pass
-        return False, e
 
+def app_section(name):
+    """Decorator for a tab / sidebar body: its widgets rerun only that function (st.fragment)
+
+    Runs on its own are timed, and a section with background queries still running
+    polls by rerunning itself instead of the whole app.
+    """
+    def decorate(render):
+        @functools.wraps(render)
+        def section():
+            st.session_state["_section"] = name
+            started = time.perf_counter()
+            render()
+            if in_full_run():
+                return
+            elapsed = time.perf_counter() - started
+            record_rerun(name, elapsed)
+            write_metrics_file()
+            last_full = next((r["ms"] for r in reversed(st.session_state["rerun_timings"]) if r["scope"] == "full app"), None)
+            st.caption(f"⏱️ Only this section reran: {elapsed * 1000:.0f} ms" + (f" (last full-app rerun: {last_full:.0f} ms)" if last_full else ""))
+            if jobs_in_flight(name):
+                time.sleep(JOB_POLL_INTERVAL)
+                rerun_section()
+        return st.fragment(section) if FRAGMENTS_ENABLED else section
+    return decorate
+
+def submit_job(view_key, label, fn, *args, timeout_ms=None, **kwargs):
+    """Run fn(pool, *args) on a background worker; show_job(view_key, ...) renders it"""
+    if timeout_ms is None:
+        timeout_ms = int(st.session_state.get("job_timeout_s", get_job_runner().timeout_ms / 1000) * 1000)
+    st.session_state.setdefault("jobs", {})[view_key] = get_job_runner().submit(label, fn, *args, timeout_ms=timeout_ms, **kwargs)
+    # the section that submitted it polls for it
+    st.session_state.setdefault("job_sections", {})[view_key] = st.session_state.get("_section")
+
+def show_job(view_key, render):
+    """Progress and a Cancel button while the view's job runs, then render(result, label)"""
+    job_id = st.session_state.get("jobs", {}).get(view_key)
+    job = get_job_runner().get(job_id) if job_id else None
+    if job is None:
+        return
+    if job["status"] in ACTIVE_STATES:
+        elapsed = time.time() - (job["started_at"] or job["submitted_at"])
+        col_status, col_cancel = st.columns([4, 1])
+        col_status.info(f"⏳ {job['label']} — {job['status']} for {elapsed:.1f}s")
+        if col_cancel.button("✖ Cancel", key=f"{view_key}_cancel"):
+            get_job_runner().cancel(job_id)
+            rerun_section()
+    elif job["status"] == "done":
+        render(job["result"], job["label"])
+    elif job["status"] == "cancelled":
+        st.warning(f"✖ {job['label']} was cancelled.")
+    elif job["status"] == "timeout":
+        st.warning(f"⌛ {job['label']} was stopped by the server after {job['timeout_ms'] / 1000:g}s (MAX_EXECUTION_TIME).")
+    else:
+        show_sql_error(job["error"])
+
+def job_state(view_key):
+    job_id = st.session_state.get("jobs", {}).get(view_key)
+    return get_job_runner().get(job_id) if job_id else None
 
-def insert_telescope(conn, telescope_id, name, location, aperture_size, material, mount_type):
+def load_dashboard_snapshot(pool):
+    """Stored Tab 2 snapshot; stale sections are rebuilt on a background worker meanwhile"""
     try:
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            INSERT INTO TELESCOPES (TelescopeID, Name, Location, ApertureSize, PrimaryMirrorMaterial, MountType)
-            VALUES (%s, %s, %s, %s, %s, %s)
-            """,
-            (telescope_id, name, location, aperture_size, material, mount_type)
-        )
-        conn.commit()
-        cursor.close()
-        return True, None
-    except Error as e:
+        snapshot = load_snapshot(pool)
+    except Error as e:   # e.g. DASHBOARD_SNAPSHOT missing (layer3.sql not applied)
+        show_sql_error(e)
+        return {}
+    last = job_state("snapshot_job")
+    stale = stale_sections(snapshot)
+    # a failed refresh is not retried automatically (that would rerun forever); use the button
+    if stale and (last is None or last["status"] == "done"):
+        submit_job("snapshot_job", "Snapshot refresh", refresh_snapshot, stale)
+    return snapshot
+
+def use_mirror():
+    return st.session_state.get("query_engine") == "DuckDB mirror"
+
+def run_section(view_key, label, dashboard, section, live_fn, snapshot_fn, *args, **kwargs):
+    """Answer a Tab 2 section from the snapshot if it has `section`, else from the columnar mirror
+    when that engine is selected, else run live_fn in the background"""
+    answers = st.session_state.setdefault("snapshot_answers", {})
+    answers.pop(view_key, None)
+    if section in dashboard:
+        answers[view_key] = (snapshot_fn(dashboard, *args, **kwargs), label, "snapshot")
+    elif use_mirror() and live_fn.__name__ in MIRRORED_FUNCTIONS:
         try:
-            conn.rollback()
-        except:
-            pass
-        return False, e
+            answers[view_key] = (MIRRORED_FUNCTIONS[live_fn.__name__](get_columnar_mirror(), *args, **kwargs), label, "mirror")
+        except RuntimeError as e:   # mirror not built / duckdb missing: fall back to MySQL
+            st.warning(f"🦆 {e} — running on MySQL instead.")
+    if view_key in answers:
+        st.session_state.get("jobs", {}).pop(view_key, None)
+    else:
+        submit_job(view_key, label, live_fn, *args, **kwargs)
+
+ANSWER_SOURCES = {
+    "snapshot": "📸 Answered from the dashboard snapshot.",
+    "mirror": "🦆 Answered from the DuckDB columnar mirror.",
+}
+
+def show_section(view_key, render):
+    answer = st.session_state.get("snapshot_answers", {}).get(view_key)
+    if answer:
+        result, label, source = answer
+        render(result, label)
+        st.caption(ANSWER_SOURCES[source])
+    else:
+        show_job(view_key, render)
+
+def jobs_in_flight(section=None):
+    """Whether this session (or one of its sections) has background queries running"""
+    runner = get_job_runner()
+    sections = st.session_state.get("job_sections", {})
+    return any(
+        (job := runner.get(job_id)) is not None and job["status"] in ACTIVE_STATES
+        for view_key, job_id in st.session_state.get("jobs", {}).items()
+        if section is None or sections.get(view_key) == section
+    )
+
+def open_paged_view(view_key, params=()):
+    """(Re)start a keyset-paged view at its first page"""
+    st.session_state[view_key] = {"params": tuple(params), "after": None, "before": None}
 
+def render_paged_view(pool, view_key, query, page_size, empty_message="No rows found.", mirror=None):
+    """Show the current page of a view opened with open_paged_view, plus Prev/Next and export
 
-def execute_commit(conn, sql):
+    Pages are read from `mirror` (a ColumnarMirror) when given; the export always reads MySQL.
+    """
+    state = st.session_state.get(view_key)
+    if not state:
+        return
     try:
-        cursor = conn.cursor()
-        cursor.execute(sql)
-        conn.commit()
-        cursor.close()
-    except Error:
-        pass
+        if mirror is not None:
+            page = columnar_fetch_page(mirror, query, state["params"], after=state["after"], before=state["before"], page_size=page_size)
+            st.caption(ANSWER_SOURCES["mirror"])
+        else:
+            page = fetch_page(pool, query, state["params"], after=state["after"], before=state["before"], page_size=page_size)
+    except Error as e:
+        show_sql_error(e)
+        return
+    except RuntimeError as e:
+        st.warning(f"🦆 {e}")
+        return
+    if page["rows"]:
+        st.dataframe(pd.DataFrame(page["rows"], columns=page["columns"]), use_container_width=True)
+    else:
+        st.info(empty_message)
+
+    col_prev, col_next, col_fmt, col_export = st.columns(4)
+    if col_prev.button("◀ Prev", key=f"{view_key}_prev", disabled=not page["has_prev"]):
+        state.update(after=None, before=page["first_key"])
+        rerun_section()
+    if col_next.button("Next ▶", key=f"{view_key}_next", disabled=not page["has_next"]):
+        state.update(after=page["last_key"], before=None)
+        rerun_section()
+    export_fmt = col_fmt.selectbox("Format", ["csv", "parquet"], key=f"{view_key}_fmt", label_visibility="collapsed")
+    if col_export.button("⬇️ Export all", key=f"{view_key}_export"):
+        # rows are streamed block by block into a temp file private to this export (never a DataFrame);
+        # the download button then holds the finished file's bytes, and the file is removed
+        fd, path = tempfile.mkstemp(suffix=f".{export_fmt}")
+        os.close(fd)
+        try:
+            count = export_rows(pool, query.full_sql(), state["params"], path, export_fmt, name=f"{query.name}_export")
+            with open(path, "rb") as f:
+                data = f.read()
+        except (Error, RuntimeError) as e:
+            st.error(f"❌ Export failed: {e}")
+        else:
+            st.download_button(f"Download {count} rows", data, file_name=f"{query.name}.{export_fmt}", key=f"{view_key}_download")
+        finally:
+            os.remove(path)
 
 # ===================================================
 # Streamlit Layout & Styling
@@ -256,21 +434,51 @@ add_background_music("Interstellar_BGM.mp3")
 
 st.title("🌌 Astronomy Database Management System")
 
-conn = get_db_connection()
-if not conn:
+# everything below runs on a full rerun; a fragment run only re-executes one app_section
+script_started = time.perf_counter()
+
+pool = get_pool()  # process-wide, survives Streamlit reruns
+try:
+    # warm-up checkout: reuses an idle pooled connection on every rerun after the first
+    with pool.connection():
+        pass
+except Error as e:
+    st.error(f"❌ Failed to connect to MySQL: {e}")
     st.stop()
 
+@app_section("Sidebar")
+def sidebar_panels():
+    with st.expander("🔌 Connection Pool"):
+        st.json(pool.stats())
+
+    with st.expander("🗄️ Query Cache"):
+        st.json(get_query_cache().stats())
+        if st.button("Clear Query Cache"):
+            get_query_cache().clear()
+
+    with st.expander("🧾 Prepared Statements"):
+        st.json(get_statement_cache().stats())
+
+    with st.expander("⏳ Background Queries"):
+        st.json(get_job_runner().stats())
+        st.number_input(
+            "Server-side timeout per query (s, 0 = none)", min_value=0.0,
+            value=get_job_runner().timeout_ms / 1000, step=5.0, key="job_timeout_s",
+        )
+
 tabs = st.tabs([
     "1️⃣ CRUD & Trigger Demo",
     "2️⃣ Analytical Queries",
     "3️⃣ Stored Procedures / Functions",
-    "4️⃣ Data Entry (Observations)"
+    "4️⃣ Data Entry (Observations)",
+    "5️⃣ Performance"
 ])
 
 # ===================================================
 # TAB 1: CRUD & Trigger
 # ===================================================
-with tabs[0]:
+@app_section("Tab 1: CRUD & Trigger")
+def crud_tab():
     st.header("🧑‍🚀 A. Create New Researcher")
     st.markdown('<div class="info-box">Add new researcher records to the database with basic profile information and experience level.</div>', unsafe_allow_html=True)
 
@@ -287,14 +495,15 @@ with tabs[0]:
         if submitted:
             if not (researcher_id and name and email):
                 st.error("ID, Name, and Email are required!")
-            elif record_exists(conn, "RESEARCHERS", "ResearcherID", researcher_id):
-                st.warning(f"ResearcherID {researcher_id} already exists.")
             else:
-                sql = """INSERT INTO RESEARCHERS (ResearcherID, Name, Email, Institution, DOB, InitialExperience)
-                         VALUES (%s, %s, %s, %s, %s, %s)"""
-                params = (researcher_id, name, email, institution, dob, experience)
-                if execute_sql(conn, sql, params):
-                    st.success(f"✅ Researcher '{name}' created successfully!")
+                try:
+                    if record_exists(pool, "RESEARCHERS", researcher_id):
+                        st.warning(f"ResearcherID {researcher_id} already exists.")
+                    else:
+                        create_researcher(pool, researcher_id, name, email, institution, dob, experience)
+                        st.success(f"✅ Researcher '{name}' created successfully!")
+                except Error as e:
+                    show_sql_error(e)
 
     st.divider()
     st.header("🚀 B. Trigger Test (Update Observation)")
@@ -308,15 +517,7 @@ with tabs[0]:
         if trigger_submit:
                         # ---- Fixed Trigger Test ----
             try:
-                cursor = conn.cursor()
-                cursor.execute(
-                    "UPDATE OBSERVATIONS SET DataQualityRating = %s WHERE ObservationID = %s",
-                    (new_rating, obs_id)
-                )
-                affected = cursor.rowcount
-                conn.commit()
-                cursor.close()
-
+                affected = update_quality_rating(pool, obs_id, new_rating)
                 if affected == 0:
                     st.warning(f"⚠️ No observation found with ID {obs_id}/ Nothing was updated.")
                 else:
@@ -325,22 +526,167 @@ with tabs[0]:
                 st.error(f"❌ SQL Error: {e}")
 
 
-    if st.button("📜 View Audit Log (Last 5 Entries)"):
-        sql = "SELECT LogID, ObservationID, OldDataQuality, ChangeTimestamp FROM OBSERVATION_LOG ORDER BY LogID DESC LIMIT 5"
-        cols, rows = execute_sql(conn, sql, fetch=True)
-        if rows:
-            df = pd.DataFrame(rows, columns=cols)
-            st.dataframe(df, use_container_width=True)
+    st.divider()
+    st.header("📊 C. Bulk Quality Re-rating")
+    st.markdown('<div class="info-box">Re-rate many observations at once, from a rule or from a file of <code>ObservationID, DataQualityRating</code> rows (CSV or Parquet). Each chunk is staged in a temporary table, then one statement writes the audit rows for the ratings that change and one applies them, with one commit per chunk. The audit rows are the same ones the trigger writes.</div>', unsafe_allow_html=True)
+
+    rerate_source = st.radio("Re-rate", ["By rule", "From file"], horizontal=True, key="rerate_source")
+    rerate_chunk = st.number_input("Observations per chunk", min_value=1, value=RERATE_CHUNK_SIZE, step=100, key="rerate_chunk")
+    rerate_progress = st.empty()
+
+    def _show_rerate_progress(r):
+        rerate_progress.info(f"Chunk {r['chunks']}: {r['changed']} changed, {r['unchanged']} unchanged ({r['rows_per_sec']:.0f} rows/s)")
+
+    rerate_report = None
+    if rerate_source == "By rule":
+        rcol1, rcol2, rcol3, rcol4 = st.columns(4)
+        rule_seeing = rcol1.selectbox("Seeing", ["Any", "Poor", "Fair", "Good", "Excellent"], key="rule_seeing")
+        rule_telescope = rcol2.number_input("Telescope ID (0 = any)", min_value=0, step=1, key="rule_telescope")
+        rule_type = rcol3.text_input("Object type (blank = any)", key="rule_type")
+        rule_dates = rcol4.date_input("Session dates (optional)", value=(), key="rule_dates")
+        rcol5, rcol6, rcol7 = st.columns([2, 1, 1])
+        rule_current = rcol5.slider("Current rating", RATING_MIN, RATING_MAX, (RATING_MIN, RATING_MAX), key="rule_current")
+        rule_action = rcol6.radio("Action", ["Set to", "Adjust by"], key="rule_action")
+        if rule_action == "Set to":
+            rule_value = rcol7.number_input("New rating", min_value=RATING_MIN, max_value=RATING_MAX, value=RATING_MIN, step=1, key="rule_rating")
         else:
-            st.info("No audit logs found.")
+            rule_value = rcol7.number_input("Steps", min_value=-RATING_MAX, max_value=RATING_MAX, value=-1, step=1, key="rule_adjust")
+        date_from, date_to = (tuple(rule_dates) + (None, None))[:2]
+        rule = dict(
+            rating=int(rule_value) if rule_action == "Set to" else None,
+            adjust=int(rule_value) if rule_action == "Adjust by" else None,
+            seeing=None if rule_seeing == "Any" else rule_seeing,
+            telescope_id=rule_telescope or None,
+            object_type=rule_type.strip() or None,
+            date_from=date_from, date_to=date_to or date_from,
+            # the full slider range also keeps unrated observations
+            min_rating=rule_current[0] if rule_current[0] > RATING_MIN else None,
+            max_rating=rule_current[1] if rule_current[1] < RATING_MAX else None,
+        )
+        col_preview, col_apply = st.columns(2)
+        if col_preview.button("🔎 Preview", key="rerate_preview_btn"):
+            try:
+                preview = rerate_preview(pool, **rule)
+            except (Error, ValueError) as e:
+                st.error(f"❌ Preview failed: {e}")
+            else:
+                st.info(f"{preview['matched']} observations match; {preview['would_change']} ratings would change.")
+        if col_apply.button("✅ Apply Rule", key="rerate_rule_btn"):
+            try:
+                rerate_report = rerate_by_rule(pool, chunk_size=int(rerate_chunk), progress=_show_rerate_progress, **rule)
+            except (Error, ValueError) as e:
+                st.error(f"❌ Re-rating failed (chunks before the failing one are committed): {e}")
+    else:
+        rerate_file = st.file_uploader("Ratings file", type=["csv", "parquet"], key="rerate_file")
+        if st.button("✅ Apply File", key="rerate_file_btn", disabled=rerate_file is None):
+            try:
+                rerate_report = rerate_from_file(pool, rerate_file, chunk_size=int(rerate_chunk), progress=_show_rerate_progress)
+            except (Error, ValueError, RuntimeError) as e:
+                st.error(f"❌ Re-rating failed (chunks before the failing one are committed): {e}")
+    if rerate_report:
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Changed", rerate_report["changed"])
+        c2.metric("Unchanged", rerate_report["unchanged"])
+        c3.metric("Rejected", rerate_report["rejected"])
+        c4.metric("Rows / sec", f"{rerate_report['rows_per_sec']:.0f}")
+        st.success(f"✅ {rerate_report['chunks']} chunks in {rerate_report['elapsed_s']:.2f}s; audit rows written {'per chunk' if rerate_report['audit'] == 'batched' else 'by the trigger, one per row (layer3.sql not installed)'}.")
+        if rerate_report["rejects"]:
+            st.warning("Some rows were rejected:")
+            st.dataframe(pd.DataFrame(rerate_report["rejects"]), use_container_width=True)
+
+    st.divider()
+    st.header("📜 D. Audit Log")
+    st.markdown('<div class="info-box">Rating changes recorded in OBSERVATION_LOG, newest first. Pages are read by (change time, LogID) from the timestamp index, so paging through an old date range costs the same as the latest page.</div>', unsafe_allow_html=True)
+    acol1, acol2 = st.columns(2)
+    audit_dates = acol1.date_input("Changed between (optional)", value=(), key="audit_dates")
+    audit_page_size = acol2.selectbox("Audit entries per page", [5, 25, 100], key="audit_page_size")
+    if st.button("📜 View Audit Log (Newest First)"):
+        since, until = (tuple(audit_dates) + (None, None))[:2]
+        until = until or since
+        open_paged_view("audit_view", (
+            f"{since} 00:00:00" if since else AUDIT_LOG_OPEN_RANGE[0],
+            f"{until} 23:59:59" if until else AUDIT_LOG_OPEN_RANGE[1],
+        ))
+    render_paged_view(pool, "audit_view", AUDIT_LOG_PAGED, audit_page_size, "No audit logs found.")
 
 # ===================================================
 # TAB 2: Analytical Queries
 # ===================================================
-with tabs[1]:
+@app_section("Tab 2: Analytical Queries")
+def analytics_tab():
     st.header("🔍 Analytical Queries")
     st.markdown('<div class="info-box">Explore insightful analytical queries combining multiple tables, aggregations, and nested subqueries.</div>', unsafe_allow_html=True)
 
+    # -----------------------------
+    # Dashboard Snapshot
+    # -----------------------------
+    st.subheader("📸 Dashboard Snapshot")
+    st.markdown('<div class="info-box">Sections 3–6 can be answered from a precomputed snapshot instead of a query each. It is built with one aggregate scan of the catalog and one of the observations, and stored in <code>DASHBOARD_SNAPSHOT</code> with its generation time. A section is rebuilt in the background when this app writes to its tables or when it is older than the maximum age. Schedule <code>python astro_snapshot.py refresh --every 300</code> if other processes write too.</div>', unsafe_allow_html=True)
+    use_snapshot = st.checkbox("Answer sections 3–6 from the snapshot", value=True, key="use_snapshot")
+    dashboard = load_dashboard_snapshot(pool) if use_snapshot else {}
+    if dashboard:
+        generated = min(entry["generated_at"] for entry in dashboard.values())
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Observations", dashboard.get("observations", {}).get("observations", "—"))
+        c2.metric("Object types", len(dashboard.get("objects", {}).get("by_type", {})) or "—")
+        c3.metric("Oldest section", f"{max(entry['age_s'] for entry in dashboard.values())} s")
+        st.caption(f"Generated {generated:%Y-%m-%d %H:%M:%S} — " + ", ".join(f"{name} built in {entry['build_ms']} ms" for name, entry in dashboard.items()))
+        with st.expander("Snapshot summaries"):
+            if "observations" in dashboard:
+                st.dataframe(pd.DataFrame(dashboard["observations"]["telescopes"]), use_container_width=True, hide_index=True)
+                st.bar_chart(pd.Series(dashboard["observations"]["seeing"], name="Observations"))
+            if "objects" in dashboard:
+                extremes = [
+                    {"ObjectType": obj_type, "Objects": entry["objects"],
+                     **{key: f"{entry[key][0]} ({entry[key][1]})" for key in ("farthest", "nearest", "brightest", "dimmest") if key in entry}}
+                    for obj_type, entry in dashboard["objects"]["by_type"].items()
+                ]
+                st.dataframe(pd.DataFrame(extremes), use_container_width=True, hide_index=True)
+    if st.button("🔄 Refresh Snapshot"):
+        submit_job("snapshot_job", "Snapshot refresh", refresh_snapshot)
+        rerun_section()
+
+    def _show_snapshot_refresh(built, label):
+        st.caption("Last refresh: " + ", ".join(f"{name} {ms} ms" for name, ms in built.items()))
+    show_job("snapshot_job", _show_snapshot_refresh)
+
+    # -----------------------------
+    # Query Engine (MySQL / DuckDB columnar mirror)
+    # -----------------------------
+    st.subheader("🦆 Query Engine")
+    st.markdown('<div class="info-box">Sections 1–5 and the Top-N ranking can run on a columnar copy of the catalog instead of MySQL: Parquet files queried in-process by DuckDB, which scans and aggregates whole columns at a time. The copy is synced incrementally (only rows above each table\'s last copied ID) and can lag behind MySQL; run <code>python astro_columnar.py sync --every 300</code> to keep it fresh. Rows updated in place are picked up by <code>sync --full</code>.</div>', unsafe_allow_html=True)
+    st.radio("Answer sections from", ["MySQL (live)", "DuckDB mirror"], horizontal=True, key="query_engine")
+    if use_mirror():
+        try:
+            mirror_info = mirror_status(pool)
+        except Error as e:
+            show_sql_error(e)
+            mirror_info = mirror_status()
+        if not mirror_info["synced"]:
+            st.warning("The mirror has not been built yet — sync it first. Sections run on MySQL until then.")
+        else:
+            m1, m2, m3 = st.columns(3)
+            m1.metric("Last sync", f"{mirror_info['age_s']:.0f} s ago")
+            m2.metric("Rows behind MySQL", mirror_info.get("rows_behind", "—"))
+            m3.metric("Mirrored rows", sum(t["rows"] for t in mirror_info["tables"].values()))
+            behind = [f"{table} +{t['rows_behind']}" for table, t in mirror_info["tables"].items() if t.get("rows_behind")]
+            if mirror_info["stale"] or behind:
+                st.warning("🕰️ The mirror is stale" + (f" — new rows in {', '.join(behind)}" if behind else f" (synced {mirror_info['synced_at']:%Y-%m-%d %H:%M:%S})") + ". Answers may miss recent data.")
+            else:
+                st.caption(f"✅ Mirror synced {mirror_info['synced_at']:%Y-%m-%d %H:%M:%S} and up to date.")
+    mcol1, mcol2 = st.columns(2)
+    full_sync = mcol2.checkbox("Full re-extract", key="mirror_full_sync")
+    if mcol1.button("🔄 Sync Mirror"):
+        # extraction SELECTs can legitimately run long: no MAX_EXECUTION_TIME for this job
+        submit_job("mirror_sync_job", "Mirror sync", sync_mirror, full=full_sync, timeout_ms=0)
+        rerun_section()
+
+    def _show_mirror_sync(report, label):
+        st.caption("Last sync: " + ", ".join(f"{table} {r['mode']} +{r['new_rows']}" for table, r in report.items()))
+    show_job("mirror_sync_job", _show_mirror_sync)
+
+    st.divider()
+
     # -----------------------------
     # Nested Query — Observers of a Discoverer
     # -----------------------------
@@ -348,22 +694,16 @@ with tabs[1]:
     st.markdown('<div class="info-box">Returns researchers who observed objects discovered by a given discoverer.</div>', unsafe_allow_html=True)
     discoverer = st.text_input("Enter Discoverer Name", "Galileo Galilei")
     if st.button("Run Nested Query"):
-        sql = """
-        SELECT R.Name FROM RESEARCHERS AS R
-        WHERE R.ResearcherID IN (
-            SELECT OS.ResearcherID FROM OBSERVATIONSESSIONS AS OS
-            JOIN OBSERVATIONS AS O ON OS.SessionID = O.SessionID
-            WHERE O.ObjectID IN (
-                SELECT OD.ObjectID FROM OBJECTDISCOVERY AS OD
-                WHERE OD.DiscovererName = %s
-            )
-        );"""
-        cols, rows = execute_sql(conn, sql, params=(discoverer,), fetch=True)
+        run_section("nested_job", f"Observers of {discoverer}", dashboard, None, observers_of_discoverer, None, discoverer)
+
+    def _show_observers(result, label):
+        cols, rows = result
         if rows:
             df = pd.DataFrame(rows, columns=cols)
             st.dataframe(df, use_container_width=True)
         else:
             st.info("No matching researchers found.")
+    show_section("nested_job", _show_observers)
 
     st.divider()
     # -----------------------------
@@ -372,20 +712,11 @@ with tabs[1]:
     st.subheader("2️⃣ Join Query — Observations by Seeing Condition")
     st.markdown('<div class="info-box">Displays celestial objects, session details, and telescopes for a selected seeing condition.</div>', unsafe_allow_html=True)
     seeing = st.selectbox("Select Seeing Condition", ["Poor", "Fair", "Good", "Excellent"])
+    seeing_page_size = st.selectbox("Rows per page", [25, 50, 100, 500], key="seeing_page_size")
     if st.button("Run Join Query"):
-        sql = """
-        SELECT CO.ObjectName, OS.Date, T.Name AS TelescopeName, OS.SeeingCondition
-        FROM OBSERVATIONS AS O
-        JOIN OBSERVATIONSESSIONS AS OS ON O.SessionID = OS.SessionID
-        JOIN TELESCOPES AS T ON OS.TelescopeID = T.TelescopeID
-        JOIN CELESTIALOBJECTS AS CO ON O.ObjectID = CO.ObjectID
-        WHERE OS.SeeingCondition = %s;
-        """
-        cols, rows = execute_sql(conn, sql, params=(seeing,), fetch=True)
-        if rows:
-            st.dataframe(pd.DataFrame(rows, columns=cols), use_container_width=True)
-        else:
-            st.info("No records found for this condition.")
+        open_paged_view("seeing_view", (seeing,))
+    render_paged_view(pool, "seeing_view", SEEING_JOIN_PAGED, seeing_page_size, "No records found for this condition.",
+                      mirror=get_columnar_mirror() if use_mirror() and mirror_status()["synced"] else None)
 
     st.divider()
     # -----------------------------
@@ -395,19 +726,15 @@ with tabs[1]:
     st.markdown('<div class="info-box">Lists telescopes used in more than N observations along with average duration.</div>', unsafe_allow_html=True)
     min_obs = st.number_input("Min Observation Count (N)", min_value=0, value=5, step=1)
     if st.button("Run Aggregate Query"):
-        sql = f"""
-        SELECT T.Name, AVG(O.DurationMinutes) AS AvgDuration, COUNT(O.ObservationID) AS ObsCount
-        FROM TELESCOPES AS T
-        JOIN OBSERVATIONSESSIONS AS OS ON T.TelescopeID = OS.TelescopeID
-        JOIN OBSERVATIONS AS O ON OS.SessionID = O.SessionID
-        GROUP BY T.Name
-        HAVING COUNT(O.ObservationID) > {min_obs};
-        """
-        cols, rows = execute_sql(conn, sql, fetch=True)
+        run_section("telescope_agg_job", f"Telescopes with more than {min_obs} observations", dashboard, "observations", telescope_usage, snapshot_telescope_usage, min_obs)
+
+    def _show_telescope_usage(result, label):
+        cols, rows = result
         if rows:
             st.dataframe(pd.DataFrame(rows, columns=cols), use_container_width=True)
         else:
             st.info("No telescopes match the criteria.")
+    show_section("telescope_agg_job", _show_telescope_usage)
 
     st.divider()
     # -----------------------------
@@ -429,23 +756,18 @@ with tabs[1]:
 
     # Later, use obj_type_final when inserting into CELESTIALOBJECTS table
     # Example:
-    # insert_celestial_object(conn, object_id, obj_name, obj_type_final, obj_magnitude, obj_distance)
+    # insert_celestial_object(pool, object_id, obj_name, obj_type_final, obj_magnitude, obj_distance)
 
     distance_order = st.radio("Find:", ["Farthest", "Nearest"], key="distance_order")
     if st.button("Show Result for Distance"):
-        order_dir = "DESC" if distance_order == "Farthest" else "ASC"
-        sql = f"""
-        SELECT ObjectName, Distance_Parsecs
-        FROM CELESTIALOBJECTS
-        WHERE ObjectType = '{obj_type_final}'
-        ORDER BY Distance_Parsecs {order_dir}
-        LIMIT 1;
-        """
-        cols, rows = execute_sql(conn, sql, fetch=True)
-        if rows:
-            st.success(f"{distance_order} {obj_type_final}: {rows[0][0]} ({rows[0][1]} parsecs)")
+        run_section("distance_job", f"{distance_order} {obj_type_final}", dashboard, "objects", distance_extreme, snapshot_distance_extreme, obj_type_final, farthest=distance_order == "Farthest")
+
+    def _show_distance(extreme, label):
+        if extreme:
+            st.success(f"{label}: {extreme[0]} ({extreme[1]} parsecs)")
         else:
-            st.warning(f"No {obj_type_final} found in the database.")
+            st.warning(f"{label}: no such object found in the database.")
+    show_section("distance_job", _show_distance)
 
     st.divider()
     # -----------------------------
@@ -454,18 +776,113 @@ with tabs[1]:
     st.subheader("5️⃣ Brightest / Dimmest Celestial Object")
     mag_order = st.radio("Find:", ["Brightest", "Dimmest"], key="mag_order")
     if st.button("Show Result for Magnitude"):
-        order_dir = "ASC" if mag_order == "Brightest" else "DESC"
-        sql = f"""
-        SELECT ObjectName, Magnitude
-        FROM CELESTIALOBJECTS
-        ORDER BY Magnitude {order_dir}
-        LIMIT 1;
-        """
-        cols, rows = execute_sql(conn, sql, fetch=True)
-        if rows:
-            st.success(f"{mag_order} object: {rows[0][0]} (Magnitude: {rows[0][1]})")
+        run_section("magnitude_job", f"{mag_order} object", dashboard, "objects", magnitude_extreme, snapshot_magnitude_extreme, brightest=mag_order == "Brightest")
+
+    def _show_magnitude(extreme, label):
+        if extreme:
+            st.success(f"{label}: {extreme[0]} (Magnitude: {extreme[1]})")
         else:
             st.warning("No objects found in the database.")
+    show_section("magnitude_job", _show_magnitude)
+
+    st.markdown("**Top-N per object type**")
+    st.markdown('<div class="info-box">The N most extreme objects of every type in one query, by distance, magnitude or redshift. Each type is read from its own composite index (<code>layer3.sql</code>), so only N index entries per type are touched.</div>', unsafe_allow_html=True)
+    tcol1, tcol2, tcol3, tcol4 = st.columns(4)
+    top_metric = tcol1.selectbox("Rank by", list(TOP_N_METRICS), key="top_n_metric")
+    top_extreme = tcol2.radio("Extreme", list(TOP_N_METRICS[top_metric][1]), horizontal=True, key="top_n_extreme")
+    top_n = tcol3.number_input("N per type", min_value=1, max_value=100, value=5, step=1, key="top_n")
+    top_type = tcol4.text_input("Object Type (blank = all)", key="top_n_type")
+    if st.button("Show Top-N per Type"):
+        run_section("top_n_job", f"Top {top_n} {top_extreme} by {top_metric}", dashboard, None, top_n_per_type, None, top_metric, top_extreme, top_n, top_type.strip() or None)
+
+    def _show_top_n(result, label):
+        cols, rows = result
+        if rows:
+            st.dataframe(pd.DataFrame(rows, columns=cols), use_container_width=True, hide_index=True)
+        else:
+            st.info("No objects with a value for this ranking.")
+    show_section("top_n_job", _show_top_n)
+
+    st.markdown("**Sky Region Search**")
+    st.markdown('<div class="info-box">Objects around a pointing (cone) or inside an RA/Dec box. Coordinates are degrees or catalog text such as <code>05h 34m 31s</code> / <code>+22d 00m 52s</code>. The search reads only the declination zones and RA ranges the region covers from the <code>(SkyZone, RA_Deg, Dec_Deg)</code> index (<code>layer3.sql</code>).</div>', unsafe_allow_html=True)
+    sky_mode = st.radio("Region", ["Cone", "Box"], horizontal=True, key="sky_mode")
+    if sky_mode == "Cone":
+        scol1, scol2, scol3 = st.columns(3)
+        sky_ra = scol1.text_input("RA", value="05h 35m 17s", key="sky_ra")
+        sky_dec = scol2.text_input("Dec", value="-05d 23m 28s", key="sky_dec")
+        sky_radius = scol3.number_input("Radius (degrees)", min_value=0.001, max_value=MAX_RADIUS_DEG, value=5.0, step=0.5, key="sky_radius")
+    else:
+        scol1, scol2, scol3, scol4 = st.columns(4)
+        sky_ra_min = scol1.text_input("RA from", value="0", key="sky_ra_min")
+        sky_ra_max = scol2.text_input("RA to (360 = 24h)", value="90", key="sky_ra_max")
+        sky_dec_min = scol3.text_input("Dec from", value="-30", key="sky_dec_min")
+        sky_dec_max = scol4.text_input("Dec to", value="30", key="sky_dec_max")
+    scol5, scol6 = st.columns(2)
+    sky_type = scol5.text_input("Object Type (blank = all)", key="sky_type")
+    sky_limit = scol6.number_input("Max results", min_value=1, max_value=MAX_SKY_LIMIT, value=DEFAULT_SKY_LIMIT, step=10, key="sky_limit")
+    if st.button("Search Sky Region"):
+        try:
+            if sky_mode == "Cone":
+                label = f"Within {sky_radius:g}° of {sky_ra} {sky_dec}"
+                args = (sky_cone_search, parse_ra(sky_ra), parse_dec(sky_dec), sky_radius)
+            else:
+                ra_max = 360.0 if sky_ra_max.strip() in ("360", "360.0") else parse_ra(sky_ra_max)
+                label = f"RA {sky_ra_min}..{sky_ra_max}, Dec {sky_dec_min}..{sky_dec_max}"
+                args = (sky_box_search, parse_ra(sky_ra_min), ra_max, parse_dec(sky_dec_min), parse_dec(sky_dec_max))
+        except ValueError as e:
+            st.warning(str(e))
+        else:
+            submit_job("sky_job", label, *args, object_type=sky_type.strip() or None, limit=sky_limit)
+
+    def _show_sky(result, label):
+        cols, rows = result
+        if rows:
+            st.caption(f"{label}: {len(rows)} object(s)" + (" — limit reached" if len(rows) >= sky_limit else ""))
+            st.dataframe(pd.DataFrame(rows, columns=cols), use_container_width=True, hide_index=True)
+        else:
+            st.info(f"{label}: no catalog objects (objects without parseable coordinates are never matched).")
+    show_job("sky_job", _show_sky)
+
+    st.markdown("**Observation Notes Search**")
+    st.markdown('<div class="info-box">Searches the free-text notes of every observation through the <code>FULLTEXT</code> index from <code>layer3.sql</code>, best match first. Natural language ranks by relevance to the words given; boolean mode accepts <code>+required -excluded "exact phrase" prefix*</code>. Words shorter than 3 letters and common stopwords are not indexed.</div>', unsafe_allow_html=True)
+    ncol1, ncol2 = st.columns([3, 1])
+    notes_text = ncol1.text_input("Search notes for", value="transit photometry", key="notes_text")
+    notes_mode = ncol2.radio("Mode", ["natural", "boolean"], horizontal=True, key="notes_mode")
+    ncol3, ncol4, ncol5, ncol6 = st.columns(4)
+    notes_object = ncol3.number_input("Object ID (0 = any)", min_value=0, step=1, key="notes_object")
+    notes_telescope = ncol4.number_input("Telescope ID (0 = any)", min_value=0, step=1, key="notes_telescope")
+    notes_dates = ncol5.date_input("Session dates (optional)", value=(), key="notes_dates")
+    notes_page_size = ncol6.selectbox("Rows per page", [25, 50, 100], key="notes_page_size")
+    if st.button("Search Notes"):
+        date_from, date_to = (tuple(notes_dates) + (None, None))[:2]
+        st.session_state["notes_view"] = {
+            "params": dict(text=notes_text, mode=notes_mode, object_id=notes_object or None,
+                           telescope_id=notes_telescope or None, date_from=date_from, date_to=date_to or date_from),
+            "after": None, "before": None,
+        }
+    notes_view = st.session_state.get("notes_view")
+    if notes_view:
+        try:
+            notes_page = search_observation_notes(pool, **notes_view["params"], after=notes_view["after"],
+                                                  before=notes_view["before"], page_size=notes_page_size)
+        except ValueError as e:
+            st.warning(str(e))
+        except Error as e:
+            show_sql_error(e)
+        else:
+            if not notes_page["ranked"]:
+                st.caption("No FULLTEXT index on OBSERVATIONS (e.g. the partitioned schema): unranked word scan, every word must appear.")
+            if notes_page["rows"]:
+                st.dataframe(pd.DataFrame(notes_page["rows"], columns=notes_page["columns"]), use_container_width=True, hide_index=True)
+            else:
+                st.info("No observation notes match.")
+            ncol_prev, ncol_next = st.columns(2)
+            if ncol_prev.button("◀ Prev", key="notes_prev", disabled=not notes_page["has_prev"]):
+                notes_view.update(after=None, before=notes_page["first_key"])
+                rerun_section()
+            if ncol_next.button("Next ▶", key="notes_next", disabled=not notes_page["has_next"]):
+                notes_view.update(after=notes_page["last_key"], before=None)
+                rerun_section()
 
     st.divider()
     # -----------------------------
@@ -474,25 +891,54 @@ with tabs[1]:
     st.subheader("6️⃣ Telescope Utilization Hours")
     tel_id = st.number_input("Enter Telescope ID", min_value=1, step=1, key="util_tel_id")
     if st.button("Show Telescope Hours"):
-        # check telescope exists
-        check_sql = f"SELECT Name FROM TELESCOPES WHERE TelescopeID={tel_id}"
-        _, tel_rows = execute_sql(conn, check_sql, fetch=True)
-        if not tel_rows:
-            st.warning(f"TelescopeID {tel_id} not found.")
+        run_section("telescope_hours_job", f"TelescopeID {tel_id}", dashboard, "observations", telescope_hours_report, snapshot_telescope_hours, tel_id)
+
+    def _show_telescope_hours(result, label):
+        tel_name, hours = result
+        if tel_name is None:
+            st.warning(f"{label} not found.")
+        elif hours is not None:
+            st.success(f"Telescope '{tel_name}' has been used for {hours:.2f} hours.")
         else:
-            sql = f"SELECT get_telescope_utilization_hours({tel_id}) AS HoursUsed;"
-            cols, rows = execute_sql(conn, sql, fetch=True)
-            if rows:
-                st.success(f"Telescope '{tel_rows[0][0]}' has been used for {rows[0][0]:.2f} hours.")
+            st.warning("Calculation failed.")
+    show_section("telescope_hours_job", _show_telescope_hours)
+
+    st.divider()
+    st.markdown('<div class="info-box">Sections not answered from the snapshot or the DuckDB mirror run in the background: the page stays usable while they run, each one can be cancelled (<code>KILL QUERY</code>), and the server stops any of them that exceeds the timeout in the sidebar. This button starts all five at once with the current inputs, each on its own pooled connection.</div>', unsafe_allow_html=True)
+    if st.button("⚡ Run All Sections Concurrently"):
+        run_section("nested_job", f"Observers of {discoverer}", dashboard, None, observers_of_discoverer, None, discoverer)
+        run_section("telescope_agg_job", f"Telescopes with more than {min_obs} observations", dashboard, "observations", telescope_usage, snapshot_telescope_usage, min_obs)
+        run_section("distance_job", f"{distance_order} {obj_type_final}", dashboard, "objects", distance_extreme, snapshot_distance_extreme, obj_type_final, farthest=distance_order == "Farthest")
+        run_section("magnitude_job", f"{mag_order} object", dashboard, "objects", magnitude_extreme, snapshot_magnitude_extreme, brightest=mag_order == "Brightest")
+        run_section("telescope_hours_job", f"TelescopeID {tel_id}", dashboard, "observations", telescope_hours_report, snapshot_telescope_hours, tel_id)
+        rerun_section()
+
+    st.divider()
+    # -----------------------------
+    # Query Plan Report (EXPLAIN)
+    # -----------------------------
+    st.subheader("7️⃣ Query Plan Report (EXPLAIN)")
+    st.markdown('<div class="info-box">Runs <code>EXPLAIN</code> for every canned query and flags full table/index scans, filesorts and temporary tables. Apply <code>layer3.sql</code> for the secondary indexes. On the tiny sample data MySQL may still prefer a scan — re-check as data grows.</div>', unsafe_allow_html=True)
+    if st.button("Run EXPLAIN Report"):
+        try:
+            plan = pd.DataFrame(query_plan_report(pool))
+        except Error as e:
+            show_sql_error(e)
+        else:
+            flagged = plan[plan["flags"] != ""]
+            if flagged.empty:
+                st.success("✅ No full scans, filesorts or temporary tables in any canned query plan.")
             else:
-                st.warning("Calculation failed.")
+                st.warning(f"{flagged['query'].nunique()} quer(y/ies) have flagged plan steps.")
+            st.dataframe(plan, use_container_width=True)
 
 
 # ===================================================
 # TAB 3: Stored Procedures / Functions
 # ===================================================
 
-with tabs[2]:
+@app_section("Tab 3: Procedures / Functions")
+def routines_tab():
     st.header("⚙️ Stored Procedures and Functions")
     st.markdown(
         '<div class="info-box">Execute predefined stored procedures and SQL functions from the database to perform computations or updates.</div>',
@@ -506,24 +952,47 @@ with tabs[2]:
     rid_proc = st.number_input("Enter Researcher ID", min_value=1, step=1)
 
     if st.button("Run Procedure"):
-        # Pre-check if researcher exists
-        check_sql = f"SELECT 1 FROM RESEARCHERS WHERE ResearcherID = {rid_proc}"
-        _, rows_check = execute_sql(conn, check_sql, fetch=True)
-        
-        if not rows_check:
-            st.error(f"❌ Researcher ID {rid_proc} not found. Procedure not run.")
-        else:
-            sql = f"CALL update_researcher_total_time({rid_proc})"
-            if execute_sql(conn, sql):
+        try:
+            # Pre-check if researcher exists
+            if not record_exists(pool, "RESEARCHERS", rid_proc):
+                st.error(f"❌ Researcher ID {rid_proc} not found. Procedure not run.")
+            else:
+                update_researcher_total_time(pool, rid_proc)
                 st.success(f"✅ Researcher {rid_proc} stats updated!")
+        except Error as e:
+            show_sql_error(e)
 
     if st.button("Check Updated Stats"):
-        sql = f"SELECT Name, TotalObservationMinutes FROM RESEARCHERS WHERE ResearcherID = {rid_proc}"
-        cols, rows = execute_sql(conn, sql, fetch=True)
+        try:
+            cols, rows = researcher_stats(pool, rid_proc)
+        except Error as e:
+            show_sql_error(e)
+        else:
+            if rows:
+                st.dataframe(pd.DataFrame(rows, columns=cols), use_container_width=True)
+            else:
+                st.warning("Researcher not found.")
+
+    st.markdown('<div class="info-box">With <code>layer3.sql</code> applied, triggers keep every researcher\'s total current on each observation insert/update/delete; the procedure above is only needed for repairs. The consistency check compares the stored totals with a full re-aggregation.</div>', unsafe_allow_html=True)
+    col_check, col_rebuild = st.columns(2)
+    if col_check.button("🩺 Check Totals Consistency"):
+        submit_job("drift_job", "Totals consistency check", researcher_totals_drift)
+    if col_rebuild.button("🛠️ Rebuild All Totals"):
+        try:
+            rebuild_researcher_totals(pool)
+        except Error as e:
+            show_sql_error(e)
+        else:
+            st.success("✅ All researcher totals rebuilt.")
+
+    def _show_drift(result, label):
+        cols, rows = result
         if rows:
+            st.warning(f"{len(rows)} researcher total(s) out of sync:")
             st.dataframe(pd.DataFrame(rows, columns=cols), use_container_width=True)
         else:
-            st.warning("Researcher not found.")
+            st.success("✅ All researcher totals match the observation history.")
+    show_job("drift_job", _show_drift)
 
     st.divider()
 
@@ -538,30 +1007,60 @@ with tabs[2]:
 
     obs_id_input = st.number_input("Enter Observation ID", min_value=1, step=1, key="obs_effmag")
     if st.button("Calculate Effective Magnitude", key="calc_effmag_btn"):
-        # Step 1: Fetch magnitude & redshift for this observation
-        sql_fetch = """
-        SELECT CO.Magnitude, CO.Redshift
-        FROM CELESTIALOBJECTS AS CO
-        JOIN OBSERVATIONS AS O ON CO.ObjectID = O.ObjectID
-        WHERE O.ObservationID = %s;
-        """
-        cols, rows = execute_sql(conn, sql_fetch, params=(obs_id_input,), fetch=True)
+        try:
+            # Step 1: Fetch magnitude & redshift for this observation
+            mag_z = observation_magnitude(pool, obs_id_input)
+            if not mag_z:
+                st.warning(f"⚠️ Observation ID {obs_id_input} does not exist or has no linked celestial object.")
+            else:
+                mag, redshift = mag_z
+                st.info(f"📊 Magnitude: **{mag}**, Redshift: **{redshift}**")
 
-        if not rows:
-            st.warning(f"⚠️ Observation ID {obs_id_input} does not exist or has no linked celestial object.")
+                # Step 2: Calculate effective magnitude using the stored function
+                eff_mag = calculate_effective_magnitude(pool, mag, redshift)
+                if eff_mag is not None:
+                    st.success(f"🌟 Effective Magnitude = **{eff_mag:.3f}**")
+                else:
+                    st.error("❌ Calculation failed or returned NULL.")
+        except Error as e:
+            show_sql_error(e)
+
+    # -------------------------
+    # B2. Batch mode — whole filtered catalog in one pass
+    # -------------------------
+    st.markdown("**Batch mode — all observations in one query**")
+    st.markdown('<div class="info-box">Computes the effective magnitude for every observation matching the filters in a single query, applying the same formula vectorized with NumPy (or inline in SQL). The parity check compares the vectorized result with the stored function for every catalog object.</div>', unsafe_allow_html=True)
+    bcol1, bcol2, bcol3 = st.columns(3)
+    batch_type = bcol1.text_input("Object Type (blank = all)", key="effmag_batch_type")
+    batch_tel = bcol2.number_input("Telescope ID (0 = all)", min_value=0, step=1, key="effmag_batch_tel")
+    batch_engine = bcol3.radio("Engine", ["numpy", "sql"], horizontal=True, key="effmag_batch_engine")
+    if st.button("Calculate for All Matching Observations", key="effmag_batch_btn"):
+        submit_job(
+            "effmag_job", "Effective magnitudes", effective_magnitudes, engine=batch_engine,
+            object_type=batch_type.strip() or None, telescope_id=batch_tel or None,
+        )
+
+    def _show_effective_magnitudes(eff_df, label):
+        if eff_df.empty:
+            st.info("No observations match these filters.")
         else:
-            mag, redshift = rows[0]
-            st.info(f"📊 Magnitude: **{mag}**, Redshift: **{redshift}**")
+            st.dataframe(eff_df, use_container_width=True)
+            st.download_button(
+                "⬇️ Export CSV", eff_df.to_csv(index=False).encode("utf-8"),
+                file_name="effective_magnitudes.csv", mime="text/csv",
+            )
+    show_job("effmag_job", _show_effective_magnitudes)
 
-            # Step 2: Calculate effective magnitude using the stored function
-            sql_calc = f"SELECT calculate_effective_magnitude({mag}, {redshift}) AS EffectiveMagnitude;"
-            cols2, rows2 = execute_sql(conn, sql_calc, fetch=True)
+    if st.button("Check Parity with Stored Function", key="effmag_parity_btn"):
+        submit_job("parity_job", "Parity check", effective_magnitude_parity)
 
-            if rows2 and rows2[0][0] is not None:
-                eff_mag = rows2[0][0]
-                st.success(f"🌟 Effective Magnitude = **{eff_mag:.3f}**")
-            else:
-                st.error("❌ Calculation failed or returned NULL.")
+    def _show_parity(parity, label):
+        if parity["mismatches"]:
+            st.error(f"❌ {len(parity['mismatches'])} of {parity['checked']} objects differ from calculate_effective_magnitude().")
+            st.dataframe(pd.DataFrame(parity["mismatches"]), use_container_width=True)
+        else:
+            st.success(f"✅ Vectorized formula matches the stored function for all {parity['checked']} objects (max |diff| {parity['max_abs_diff']:.1e}).")
+    show_job("parity_job", _show_parity)
 
     st.divider()
 
@@ -570,30 +1069,93 @@ with tabs[2]:
     # ----------------------------
     st.subheader("C. SQL Function — Telescope Utilization Hours")
     st.markdown(
-        '<div class="info-box">Determines total hours a telescope has been active. SUM of DurationMinutes for the TelescopeID converted to hours.</div>',
+        '<div class="info-box">Determines total hours a telescope has been active. Reads the trigger-maintained TELESCOPE_UTILIZATION summary (one row per telescope) and shows the per-day breakdown from TELESCOPE_UTILIZATION_DAILY.</div>',
         unsafe_allow_html=True
     )
     tel_id = st.number_input("Enter Telescope ID", min_value=1, step=1, key="tel_usage")
 
     if st.button("Get Telescope Usage Hours"):
-        # Pre-check if telescope exists
-        check_sql = f"SELECT 1 FROM TELESCOPES WHERE TelescopeID = {tel_id}"
-        _, tel_rows = execute_sql(conn, check_sql, fetch=True)
-        if not tel_rows:
-            st.warning(f"❌ Telescope ID {tel_id} not found. Cannot calculate usage hours.")
+        try:
+            # Pre-check if telescope exists
+            if not record_exists(pool, "TELESCOPES", tel_id):
+                st.warning(f"❌ Telescope ID {tel_id} not found. Cannot calculate usage hours.")
+            else:
+                hours = telescope_hours(pool, tel_id)
+                if hours is not None:
+                    st.success(f"🛰️ Telescope {tel_id} has been used for {hours:.2f} hours.")
+                    cols_day, rows_day = telescope_daily_usage(pool, tel_id)
+                    if rows_day:
+                        daily = pd.DataFrame(rows_day, columns=cols_day).set_index("UsageDate")
+                        st.bar_chart(daily["Hours"].astype(float))
+                else:
+                    st.warning(f"No usage records found for Telescope ID {tel_id}.")
+        except Error as e:
+            show_sql_error(e)
+
+    st.divider()
+
+    # ----------------------------
+    # D. Procedure — Archive Old Observations
+    # ----------------------------
+    st.subheader("D. Procedure — Archive Old Observations")
+    st.markdown('<div class="info-box">Moves observations from sessions before the cutoff date with a quality rating below the threshold (and their audit log rows) into the partitioned archive tables. Each chunk is its own short transaction that also records the run\'s checkpoint, so a stopped run resumes where it left off when started again with the same cutoff and rating.</div>', unsafe_allow_html=True)
+    acol1, acol2, acol3, acol4 = st.columns(4)
+    archive_cutoff = acol1.date_input("Cutoff date", key="archive_cutoff")
+    archive_quality = acol2.number_input("Rating below", min_value=1, max_value=10, value=3, step=1, key="archive_quality")
+    archive_chunk = acol3.number_input("Rows per chunk", min_value=1, value=ARCHIVE_CHUNK_SIZE, step=100, key="archive_chunk")
+    archive_max_chunks = acol4.number_input("Max chunks (0 = all)", min_value=0, value=0, step=1, key="archive_max_chunks")
+
+    col_preview, col_run = st.columns(2)
+    if col_preview.button("🔎 Preview Archival", key="archive_preview_btn"):
+        try:
+            pending = pending_archive_count(pool, archive_cutoff, int(archive_quality))
+        except Error as e:
+            show_sql_error(e)
+        else:
+            st.info(f"{pending} observation(s) currently qualify for archival.")
+    if col_run.button("🗃️ Run / Resume Archival", key="archive_run_btn"):
+        archive_box = st.empty()
+
+        def _show_archive_progress(r):
+            archive_box.info(f"Run {r['run_id']}, chunk {r['chunks']}: {r['archived']} archived ({r['rows_per_sec']:.0f} rows/s)")
+
+        try:
+            archive_report = archive_observations(
+                pool, archive_cutoff, int(archive_quality),
+                chunk_size=int(archive_chunk), max_chunks=int(archive_max_chunks) or None,
+                progress=_show_archive_progress,
+            )
+        except Error as e:
+            st.error(f"❌ Archival stopped: {e}. Committed chunks are kept; run again to resume.")
+        else:
+            c1, c2, c3, c4 = st.columns(4)
+            c1.metric("Observations archived", archive_report["archived"])
+            c2.metric("Log rows archived", archive_report["log_rows_archived"])
+            c3.metric("Chunks", archive_report["chunks"])
+            c4.metric("Rows / sec", f"{archive_report['rows_per_sec']:.0f}")
+            verb = "resumed" if archive_report["resumed"] else "started"
+            if archive_report["status"] == "done":
+                st.success(f"✅ Run {archive_report['run_id']} ({verb}) finished in {archive_report['elapsed_s']:.2f}s.")
+            else:
+                st.warning(f"⏸️ Run {archive_report['run_id']} ({verb}) paused after {archive_report['chunks']} chunk(s); run again to resume.")
+
+    if st.button("📋 Show Recent Archival Runs", key="archive_runs_btn"):
+        try:
+            run_cols, run_rows = recent_archive_runs(pool)
+        except Error as e:
+            show_sql_error(e)
         else:
-            sql = f"SELECT get_telescope_utilization_hours({tel_id}) AS HoursUsed"
-            cols, rows = execute_sql(conn, sql, fetch=True)
-            if rows and rows[0][0] is not None:
-                st.success(f"🛰️ Telescope {tel_id} has been used for {rows[0][0]:.2f} hours.")
+            if run_rows:
+                st.dataframe(pd.DataFrame(run_rows, columns=run_cols), use_container_width=True)
             else:
-                st.warning(f"No usage records found for Telescope ID {tel_id}.")
+                st.info("No archival runs yet.")
 
 
 # ===================================================
 # TAB 4: DATA ENTRY — NEW OBSERVATION (robust with session_state)
 # ===================================================
-with tabs[3]:
+@app_section("Tab 4: Data Entry")
+def data_entry_tab():
     st.header("🛰️ Record New Observation")
     st.markdown('<div class="info-box">Insert a new observation session and observation. If referenced Telescope/Object records are missing, you can add them inline; the app will retry automatically.</div>', unsafe_allow_html=True)
 
@@ -622,55 +1184,39 @@ with tabs[3]:
     # Helper: try to perform the insert using data in dict `d`
     def _attempt_insert(d):
         try:
-            cursor = conn.cursor()
-            cursor.execute(
-                "INSERT INTO OBSERVATIONSESSIONS (SessionID, ResearcherID, TelescopeID, Date, WeatherCondition, SeeingCondition) "
-                "VALUES (%s, %s, %s, %s, 'Clear', 'Good')",
-                (d["session_id"], d["researcher_id"], d["telescope_id"], d["date"])
-            )
-            cursor.execute(
-                "INSERT INTO OBSERVATIONS (ObservationID, SessionID, ObjectID, DurationMinutes, DataQualityRating) "
-                "VALUES (%s, %s, %s, %s, %s)",
-                (d["obs_id"], d["session_id"], d["object_id"], d["duration"], d["quality"])
+            totals_error = insert_observation(
+                pool, d["session_id"], d["researcher_id"], d["telescope_id"], d["date"],
+                d["obs_id"], d["object_id"], d["duration"], d["quality"],
             )
-            conn.commit()
-            cursor.close()
-            # clear pending_obs on success
-            st.session_state.pending_obs = None
-            st.success(f"✅ Session {d['session_id']} and Observation {d['obs_id']} recorded successfully!")
-            # call stored procedure to update researcher stats
-            execute_commit(conn, f"CALL update_researcher_total_time({d['researcher_id']})")
-            return True, None
         except Error as e:
-            try:
-                conn.rollback()
-            except:
-                pass
             return False, e
+        # clear pending_obs on success
+        st.session_state.pending_obs = None
+        st.success(f"✅ Session {d['session_id']} and Observation {d['obs_id']} recorded successfully!")
+        if totals_error is not None:
+            st.warning(
+                f"Researcher {d['researcher_id']}'s total observation time could not be updated ({totals_error}). "
+                "Use \"Rebuild All Totals\" in Tab 3 to repair it."
+            )
+        return True, None
 
     # When user clicks Insert Observation — create pending_obs with validation
     if submitted:
-        problems = []
-        # quick existence checks
-        researcher_ok = record_exists(conn, "RESEARCHERS", "ResearcherID", researcher_id)
-        tel_ok = record_exists(conn, "TELESCOPES", "TelescopeID", telescope_id)
-        obj_ok = record_exists(conn, "CELESTIALOBJECTS", "ObjectID", object_id)
-        sess_dup = record_exists(conn, "OBSERVATIONSESSIONS", "SessionID", session_id)
-        obs_dup = record_exists(conn, "OBSERVATIONS", "ObservationID", obs_id)
-
-        if not researcher_ok:
-            problems.append(f"ResearcherID {researcher_id} does not exist.")
-        if not tel_ok:
-            problems.append(f"TelescopeID {telescope_id} does not exist.")
-        if not obj_ok:
-            problems.append(f"ObjectID {object_id} does not exist.")
-        if sess_dup:
-            problems.append(f"SessionID {session_id} already exists.")
-        if obs_dup:
-            problems.append(f"ObservationID {obs_id} already exists.")
-
-        if problems:
-            st.warning("Cannot insert due to: " + "; ".join(problems))
+        # quick existence checks — all five keys resolved in one round-trip
+        entry = {
+            "session_id": session_id, "researcher_id": researcher_id, "telescope_id": telescope_id,
+            "object_id": object_id, "obs_id": obs_id,
+        }
+        try:
+            report = validate_observation(pool, entry)
+        except Error as e:
+            show_sql_error(e)
+            report = None
+
+        if report is None:
+            pass
+        elif report["problems"]:
+            st.warning("Cannot insert due to: " + "; ".join(report["problems"]))
             # store pending_obs so the expanders appear persistently
             st.session_state.pending_obs = {
                 "session_id": session_id,
@@ -681,11 +1227,11 @@ with tabs[3]:
                 "object_id": object_id,
                 "duration": duration,
                 "quality": quality,
-                "tel_missing": not tel_ok,
-                "obj_missing": not obj_ok,
-                "researcher_missing": not researcher_ok,
-                "sess_dup": sess_dup,
-                "obs_dup": obs_dup,
+                "tel_missing": report["tel_missing"],
+                "obj_missing": report["obj_missing"],
+                "researcher_missing": report["researcher_missing"],
+                "sess_dup": report["sess_dup"],
+                "obs_dup": report["obs_dup"],
             }
             st.info("Use the inline forms below to add missing Telescope or Celestial Object. After successful addition the app will retry the insertion automatically.")
         else:
@@ -733,16 +1279,20 @@ with tabs[3]:
                 tel_mount = st.text_input("Mount Type", value="Equatorial", key="ss_tel_mount")
 
                 if st.button("Add Telescope", key="ss_add_tel_btn"):
-                    ok_tel, err_tel = insert_telescope(
-                        conn,
-                        d["telescope_id"],
-                        tel_name,
-                        tel_location,
-                        tel_aperture,
-                        tel_material,
-                        tel_mount
-                    )
-                    if ok_tel:
+                    try:
+                        insert_telescope(
+                            pool,
+                            d["telescope_id"],
+                            tel_name,
+                            tel_location,
+                            tel_aperture,
+                            tel_material,
+                            tel_mount
+                        )
+                        err_tel = None
+                    except Error as e:
+                        err_tel = e
+                    if err_tel is None:
                         st.success(f"Telescope {d['telescope_id']} added.")
                         st.session_state.pending_obs["tel_missing"] = False
                         if not st.session_state.pending_obs.get("obj_missing"):
@@ -765,6 +1315,13 @@ with tabs[3]:
                 obj_mag = st.number_input("Magnitude", value=0.0, step=0.1, key="obj_mag")
                 obj_ra = st.text_input("Right Ascension (e.g., 08h 00m 00s)", key="obj_ra")
                 obj_dec = st.text_input("Declination (e.g., +30d 00m 00s)", key="obj_dec")
+                try:
+                    if obj_ra:
+                        parse_ra(obj_ra)
+                    if obj_dec:
+                        parse_dec(obj_dec)
+                except ValueError as e:
+                    st.warning(f"{e} — the object can be saved but will not appear in sky searches.")
                 obj_lastobs = st.text_input("Last Observed Date (YYYY-MM-DD or leave blank)", key="obj_lastobs")
                 obj_dist = st.number_input("Distance (parsecs)", value=0.0, step=0.1, key="obj_dist")
                 obj_red = st.number_input("Redshift (z)", value=0.0, step=0.000001, key="obj_red")
@@ -772,21 +1329,25 @@ with tabs[3]:
                 obj_mass = st.number_input("Mass (in Solar Masses)", value=0.0, step=0.1, key="obj_mass")
 
                 if st.button("Add Celestial Object", key="add_obj_btn"):
-                    ok_obj, err_obj = insert_celestial_object(
-                        conn,
-                        object_id,
-                        obj_name,
-                        obj_type,
-                        obj_mag,
-                        obj_ra,
-                        obj_dec,
-                        obj_lastobs if obj_lastobs else None,
-                        obj_dist,
-                        obj_red,
-                        obj_diam,
-                        obj_mass
-                    )
-                    if ok_obj:
+                    try:
+                        insert_celestial_object(
+                            pool,
+                            object_id,
+                            obj_name,
+                            obj_type,
+                            obj_mag,
+                            obj_ra,
+                            obj_dec,
+                            obj_lastobs if obj_lastobs else None,
+                            obj_dist,
+                            obj_red,
+                            obj_diam,
+                            obj_mass
+                        )
+                        err_obj = None
+                    except Error as e:
+                        err_obj = e
+                    if err_obj is None:
                         st.success(f"Celestial Object {object_id} added successfully.")
                         obj_exists = True
                     else:
@@ -812,3 +1373,110 @@ with tabs[3]:
                 else:
                     st.error(f"Retry failed: {err_insert}")
 
+    st.divider()
+    st.header("📦 Bulk Import (CSV / Parquet)")
+    st.markdown('<div class="info-box">Load a nightly run in one go. Columns use the database names (SessionID, ResearcherID, TelescopeID, Date, WeatherCondition, SeeingCondition, ObservationID, ObjectID, DurationMinutes, Notes, AcquisitionTime, DataQualityRating). Rows are validated in bulk, inserted in chunks with one commit per chunk, and researcher totals are refreshed once per researcher at the end. Rows sharing a SessionID share one new session.</div>', unsafe_allow_html=True)
+
+    bulk_file = st.file_uploader("Observation file", type=["csv", "parquet"], key="bulk_obs_file")
+    bulk_chunk = st.number_input("Rows per chunk", min_value=1, value=DEFAULT_CHUNK_SIZE, step=100, key="bulk_chunk")
+    if st.button("🚚 Import Observations", key="bulk_import_btn", disabled=bulk_file is None):
+        progress_box = st.empty()
+
+        def _show_progress(r):
+            progress_box.info(f"Chunk {r['chunks']}: {r['inserted']} inserted, {r['rejected']} rejected ({r['rows_per_sec']:.0f} rows/s)")
+
+        try:
+            report = import_observations(pool, bulk_file, chunk_size=int(bulk_chunk), progress=_show_progress)
+        except (Error, ValueError, RuntimeError) as e:
+            st.error(f"❌ Import failed: {e}")
+        else:
+            c1, c2, c3, c4 = st.columns(4)
+            c1.metric("Rows read", report["rows_read"])
+            c2.metric("Inserted", report["inserted"])
+            c3.metric("Rejected", report["rejected"])
+            c4.metric("Rows / sec", f"{report['rows_per_sec']:.0f}")
+            st.success(f"✅ {report['sessions_created']} sessions created, {report['researchers_refreshed']} researcher totals refreshed in {report['elapsed_s']:.2f}s.")
+            if report["rejects"]:
+                st.warning("Some rows were rejected:")
+                st.dataframe(pd.DataFrame(report["rejects"]), use_container_width=True)
+
+
+# ===================================================
+# TAB 5: Performance (query latency metrics)
+# ===================================================
+@app_section("Tab 5: Performance")
+def performance_tab():
+    st.header("⏱️ Query Performance")
+    st.markdown('<div class="info-box">Every database call the app makes is timed under a query name. Latency percentiles are computed over the most recent executions of each query; cache hits are not database calls and are not counted here (see the Query Cache panel in the sidebar).</div>', unsafe_allow_html=True)
+
+    metrics = get_query_metrics()
+    summary = metrics.summary()
+    if summary:
+        perf_df = pd.DataFrame(summary).sort_values("p95_ms", ascending=False)
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Queries tracked", len(perf_df))
+        c2.metric("Executions", int(perf_df["calls"].sum()))
+        c3.metric("Errors", int(perf_df["errors"].sum()))
+        st.dataframe(perf_df, use_container_width=True, hide_index=True)
+        st.bar_chart(perf_df.set_index("query")[["p50_ms", "p95_ms", "p99_ms"]])
+
+        st.subheader("🐢 Slowest Recent Statements")
+        st.dataframe(pd.DataFrame(metrics.slowest(20)), use_container_width=True, hide_index=True)
+    else:
+        st.info("No queries recorded yet in this process. Use the other tabs, then come back.")
+
+    st.subheader("🔁 Rerun Timing")
+    mode = "each tab and the sidebar rerun on their own" if FRAGMENTS_ENABLED else "every interaction reruns the whole script (ASTRO_FRAGMENTS=0)"
+    st.markdown(f'<div class="info-box">Script time per interaction in this session; {mode}. Start the app once with ASTRO_FRAGMENTS=0 and once without, repeat the same clicks, and compare the averages below.</div>', unsafe_allow_html=True)
+    timings = st.session_state.get("rerun_timings", [])
+    if timings:
+        timing_df = pd.DataFrame(timings)
+        per_scope = timing_df.groupby("scope")["ms"].agg(["count", "mean", "median", "max"]).round(1).reset_index()
+        st.dataframe(per_scope.sort_values("mean", ascending=False), use_container_width=True, hide_index=True)
+        with st.expander(f"Last {len(timings)} reruns"):
+            st.dataframe(timing_df.iloc[::-1], use_container_width=True, hide_index=True)
+    else:
+        st.info("No reruns timed yet.")
+    if st.button("🔄 Refresh Timings", key="rerun_timing_refresh"):
+        rerun_section()
+
+    st.subheader("📤 Prometheus Export")
+    prom_text = metrics.prometheus_text()
+    prom_path = st.text_input("Metrics file", value=METRICS_FILE or "astro_metrics.prom", key="prom_path")
+    col_write, col_download, col_reset = st.columns(3)
+    if col_write.button("💾 Write Metrics File", key="prom_write_btn"):
+        try:
+            metrics.write_prometheus(prom_path)
+        except OSError as e:
+            st.error(f"❌ Could not write {prom_path}: {e}")
+        else:
+            st.success(f"✅ Metrics written to {prom_path}")
+    col_download.download_button("⬇️ Download .prom", prom_text.encode("utf-8"), file_name="astro_metrics.prom", mime="text/plain")
+    if col_reset.button("🧹 Reset Metrics", key="prom_reset_btn"):
+        metrics.reset()
+        rerun_section()
+    with st.expander("Preview"):
+        st.code(prom_text, language="text")
+
+# ===================================================
+# Render the sidebar and the tabs (each one reruns on its own when its widgets change)
+# ===================================================
+st.session_state["_full_run"] = True
+try:
+    with st.sidebar:
+        sidebar_panels()
+    for tab, render_tab in zip(tabs, (crud_tab, analytics_tab, routines_tab, data_entry_tab, performance_tab)):
+        with tab:
+            render_tab()
+finally:
+    # also when a section stops or fails the run, or later section reruns would pass for full runs
+    st.session_state["_full_run"] = False
+
+write_metrics_file()
+record_rerun("full app", time.perf_counter() - script_started)
+
+# keep polling while this session's background queries run; any interaction still goes through.
+# Jobs submitted from a section rerun are polled by that section alone (app_section).
+if jobs_in_flight():
+    time.sleep(JOB_POLL_INTERVAL)
+    st.rerun()
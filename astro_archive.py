@@ -0,0 +1,154 @@
+"""Chunked, resumable archival of old low-quality observations (see layer3.sql).
+
+Usage:
+    python astro_archive.py 2025-09-02 --min-quality 3 [--chunk-size 500] [--max-chunks 10]
+"""
+import argparse
+import sys
+import time
+
+from astro_db import ROUTINE_WRITES, get_pool, get_query_cache, with_trigger_effects
+from astro_metrics import get_query_metrics
+
+DEFAULT_CHUNK_SIZE = 500
+
+# Same row selection as archive_observation_chunk, counted for a preview
+ARCHIVE_PENDING_SQL = """
+SELECT COUNT(*)
+FROM OBSERVATIONS AS O
+JOIN OBSERVATIONSESSIONS AS OS ON O.SessionID = OS.SessionID
+WHERE OS.Date < %s AND O.DataQualityRating < %s
+"""
+
+ARCHIVE_RUNS_SQL = """
+SELECT RunID, CutoffDate, MinQualityRating, Status, RowsArchived, LogRowsArchived, Chunks,
+       LastObservationID, StartedAt, UpdatedAt, FinishedAt
+FROM ARCHIVE_RUNS
+ORDER BY RunID DESC
+LIMIT %s
+"""
+
+_OPEN_RUN_SQL = """
+SELECT MAX(RunID) FROM ARCHIVE_RUNS
+WHERE Status = 'running' AND CutoffDate = %s AND MinQualityRating = %s
+"""
+
+
+def pending_archive_count(pool, cutoff_date, min_quality):
+    """How many observations the given cutoff / quality would archive right now."""
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            with get_query_metrics().track("archive_pending", ARCHIVE_PENDING_SQL):
+                cursor.execute(ARCHIVE_PENDING_SQL, (cutoff_date, min_quality))
+                return cursor.fetchone()[0]
+        finally:
+            cursor.close()
+
+
+def open_archive_run(conn, cutoff_date, min_quality):
+    """Return (run_id, resumed): the unfinished run for these arguments, or a new one."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute(_OPEN_RUN_SQL, (cutoff_date, min_quality))
+        run_id = cursor.fetchone()[0]
+        if run_id is not None:
+            return run_id, True
+        cursor.execute(
+            "INSERT INTO ARCHIVE_RUNS (CutoffDate, MinQualityRating) VALUES (%s, %s)",
+            (cutoff_date, min_quality),
+        )
+        conn.commit()
+        return cursor.lastrowid, False
+    finally:
+        cursor.close()
+
+
+def archive_observations(pool, cutoff_date, min_quality, chunk_size=DEFAULT_CHUNK_SIZE,
+                         max_chunks=None, progress=None):
+    """Move qualifying observations to the archive tables one short transaction at a time.
+
+    Each chunk is one call of archive_observation_chunk, which commits its own
+    work and the run's checkpoint together; stopping between chunks (or after
+    ``max_chunks``) leaves a run that the next call with the same arguments
+    resumes. Returns a report dict with counts and throughput; ``progress`` is
+    an optional callback receiving the running report after every chunk.
+    """
+    started = time.perf_counter()
+    report = {
+        "run_id": None, "resumed": False, "status": "running",
+        "archived": 0, "log_rows_archived": 0, "chunks": 0,
+        "elapsed_s": 0.0, "rows_per_sec": 0.0,
+    }
+    try:
+        with pool.connection() as conn:
+            report["run_id"], report["resumed"] = open_archive_run(conn, cutoff_date, min_quality)
+            cursor = conn.cursor()
+            try:
+                while max_chunks is None or report["chunks"] < max_chunks:
+                    with get_query_metrics().track("archive_chunk", "CALL archive_observation_chunk()") as stat:
+                        result = cursor.callproc("archive_observation_chunk", (report["run_id"], chunk_size, 0, 0))
+                        moved, log_moved = result[2] or 0, result[3] or 0
+                        stat["rows"] = moved + log_moved
+                    report["archived"] += moved
+                    report["log_rows_archived"] += log_moved
+                    report["chunks"] += 1
+                    report["elapsed_s"] = time.perf_counter() - started
+                    report["rows_per_sec"] = report["archived"] / report["elapsed_s"] if report["elapsed_s"] else 0.0
+                    if progress:
+                        progress(report)
+                    if moved < chunk_size:
+                        report["status"] = "done"
+                        break
+            finally:
+                cursor.close()
+    finally:
+        if report["archived"]:
+            get_query_cache().invalidate_tables(with_trigger_effects(ROUTINE_WRITES["archive_observation_chunk"]))
+
+    report["elapsed_s"] = time.perf_counter() - started
+    report["rows_per_sec"] = report["archived"] / report["elapsed_s"] if report["elapsed_s"] else 0.0
+    return report
+
+
+def recent_archive_runs(pool, limit=10):
+    """(columns, rows) of the latest archival runs, newest first."""
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            with get_query_metrics().track("archive_runs", ARCHIVE_RUNS_SQL):
+                cursor.execute(ARCHIVE_RUNS_SQL, (limit,))
+            return [c[0] for c in cursor.description], cursor.fetchall()
+        finally:
+            cursor.close()
+
+
+# ===================================================
+# CLI
+# ===================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Archive old low-quality observations in resumable chunks.")
+    parser.add_argument("cutoff_date", help="archive observations from sessions before this date (YYYY-MM-DD)")
+    parser.add_argument("--min-quality", type=int, required=True, help="archive ratings below this value")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="observations per transaction")
+    parser.add_argument("--max-chunks", type=int, help="stop after this many chunks (rerun to resume)")
+    args = parser.parse_args(argv)
+
+    def progress(r):
+        print(f"  chunk {r['chunks']}: {r['archived']} archived, {r['log_rows_archived']} log rows, "
+              f"{r['rows_per_sec']:.0f} rows/s", file=sys.stderr)
+
+    report = archive_observations(
+        get_pool(), args.cutoff_date, args.min_quality,
+        chunk_size=args.chunk_size, max_chunks=args.max_chunks, progress=progress,
+    )
+    verb = "Resumed" if report["resumed"] else "Started"
+    print(f"{verb} run {report['run_id']}: {report['archived']} observations and "
+          f"{report['log_rows_archived']} log rows archived in {report['chunks']} chunks, "
+          f"{report['elapsed_s']:.2f}s ({report['rows_per_sec']:.0f} rows/s). Status: {report['status']}.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,693 @@
+"""Load benchmark: time every canned query, routine, trigger and the insert path at several data scales.
+
+Usage:
+    python astro_bench.py --scales 1e3,1e4,1e5 [--repeat 5] [--out bench_report.json]
+    python astro_bench.py --existing --out bench_now.json          # current data, no generation
+    python astro_bench.py --scales 1e4 --baseline bench_report.json  # flag regressions
+    python astro_bench.py --existing --case none --reuse-executions 1000  # statement reuse only
+    python astro_bench.py --existing --case none --reuse-executions 0 --columnar  # MySQL vs DuckDB mirror
+
+For every scale the synthetic dataset (astro_synth.py) is purged and regenerated,
+then each case runs once to warm up and ``--repeat`` times measured. Cases that
+write run inside a transaction that is rolled back, so every repetition sees the
+same data. The JSON report is meant to be kept and compared between commits.
+Cases listed in LATENCY_TARGETS (the notes search) fail the run when their
+median exceeds the target at any scale.
+
+Each scale also compares the per-input point lookups three ways: text protocol,
+a prepared statement re-prepared per call, and the app's cached prepared cursor.
+The server's Com_stmt_prepare counter shows the parse work per mode.
+
+With ``--columnar`` each scale also builds the DuckDB/Parquet mirror
+(astro_columnar.py) in a scratch directory, times a full and an incremental
+sync, and runs the mirrored Tab 2 queries on both engines side by side.
+
+``--last-observed-rows N`` bulk-inserts N observations of one object twice,
+rolled back each time: once with the per-row LastObservedDate trigger and once
+with it suspended plus the set-based refresh_last_observed_dates pass.
+
+``--rerate-rows N`` re-rates the first N observations twice, rolled back each
+time: once with one UPDATE per observation (the Tab 1 statement, audited by the
+trigger) and once as one staged chunk through apply_quality_rerate_chunk.
+"""
+import argparse
+import datetime
+import json
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from mysql.connector import Error
+
+from astro_columnar import MIRRORED_FUNCTIONS, ColumnarMirror, sync_mirror
+from astro_db import get_pool, get_statement_cache
+from astro_ingest import OBSERVATION_INSERT_SQL, SESSION_INSERT_SQL
+from astro_metrics import percentile
+from astro_notes import LATENCY_TARGET_MS as NOTES_LATENCY_TARGET_MS
+from astro_quality import STAGE_CREATE_SQL, STAGE_DROP_SQL, STAGE_ROWS_SQL
+from astro_queries import REBUILD_RESEARCHER_TOTALS_SQL, TELESCOPE_AGG_LIVE_SQL
+from astro_service import (
+    STATEMENTS, QueryResult, audit_log_page, calculate_effective_magnitude, distance_extreme, effective_magnitudes,
+    magnitude_extreme, observation_magnitude, observers_of_discoverer, researcher_totals_drift,
+    search_observation_notes, seeing_join_page,
+    sky_box_search, sky_cone_search, telescope_daily_usage, telescope_hours, telescope_hours_report, telescope_usage,
+    top_n_per_type, validate_observation,
+)
+from astro_snapshot import SNAPSHOT_SECTIONS
+from astro_synth import DEFAULT_SEED, DEFAULT_SKEW, SYNTHETIC_ID_BASE, generate, purge
+
+REPORT_VERSION = 1
+DEFAULT_REPEAT = 5
+DEFAULT_REGRESSION_TOLERANCE = 0.25   # flag cases whose median got >25% slower
+DEFAULT_REUSE_EXECUTIONS = 200
+DEFAULT_LAST_OBSERVED_ROWS = 5000
+DEFAULT_RERATE_ROWS = 5000
+
+# case name -> median latency (ms) it must stay under at every scale
+LATENCY_TARGETS = {
+    "notes_search_natural": NOTES_LATENCY_TARGET_MS,
+    "notes_search_boolean": NOTES_LATENCY_TARGET_MS,
+    "notes_search_filtered": NOTES_LATENCY_TARGET_MS,
+}
+
+COUNTED_TABLES = ("RESEARCHERS", "TELESCOPES", "CELESTIALOBJECTS", "OBSERVATIONSESSIONS", "OBSERVATIONS", "OBSERVATION_LOG")
+
+# IDs for the rolled-back insert-path case, far above the synthetic ranges
+_BENCH_SESSION_ID = 2100000000
+_BENCH_OBSERVATION_ID = 2100000000
+
+
+# ===================================================
+# Case builders
+# ===================================================
+
+def _read(sql, params=()):
+    """Case: run a SELECT / function call and fetch every row."""
+    def run(pool):
+        with pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(sql, params)
+                return len(cursor.fetchall())
+            finally:
+                cursor.close()
+    return run
+
+
+def _service(fn, *args, **kwargs):
+    """Case: call an astro_service function (query cache bypassed) and count its rows."""
+    def run(pool):
+        result = fn(pool, *args, **kwargs)
+        if isinstance(result, QueryResult):
+            return len(result.rows)
+        return 0 if result is None else 1
+    return run
+
+
+def _snapshot_build(pool):
+    """Case: build every dashboard snapshot section (not stored)."""
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            for _, build in SNAPSHOT_SECTIONS.values():
+                build(cursor)
+            return len(SNAPSHOT_SECTIONS)
+        finally:
+            cursor.close()
+
+
+def _rolled_back(*statements):
+    """Case: run write statements (firing their triggers) and roll them back."""
+    def run(pool):
+        with pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                affected = 0
+                for sql, params in statements:
+                    cursor.execute(sql, params)
+                    affected += max(cursor.rowcount, 0)
+                return affected
+            finally:
+                cursor.close()
+                conn.rollback()
+    return run
+
+
+def _insert_path(ctx):
+    """Case: TAB 4's submit path, batched validation then session + observation insert."""
+    entry = {
+        "session_id": _BENCH_SESSION_ID, "researcher_id": ctx["researcher_id"],
+        "telescope_id": ctx["telescope_id"], "object_id": ctx["object_id"], "obs_id": _BENCH_OBSERVATION_ID,
+    }
+    insert = _rolled_back(
+        (SESSION_INSERT_SQL, (_BENCH_SESSION_ID, ctx["date"], "Clear", "Good", ctx["researcher_id"], ctx["telescope_id"])),
+        (OBSERVATION_INSERT_SQL, (_BENCH_OBSERVATION_ID, _BENCH_SESSION_ID, ctx["object_id"], 30, None, None, 4)),
+    )
+
+    def run(pool):
+        if not validate_observation(pool, entry)["ok"]:
+            raise RuntimeError("validation rejected the benchmark entry")
+        return insert(pool)
+    return run
+
+
+def _effective_magnitude_single(ctx):
+    """Case: TAB 3 B, fetch magnitude/redshift then call the stored function."""
+    def run(pool):
+        magnitude, redshift = observation_magnitude(pool, ctx["observation_id"])
+        calculate_effective_magnitude(pool, magnitude, redshift)
+        return 2
+    return run
+
+
+def build_cases(ctx):
+    """(name, category, callable(pool) -> rows) for everything the app runs against the database."""
+    return (
+        # TAB 2
+        ("nested_discoverer", "tab2", _service(observers_of_discoverer, "Galileo Galilei", cached=False)),
+        ("seeing_join_page", "tab2", lambda pool: len(seeing_join_page(pool, "Good", page_size=50)["rows"])),
+        ("telescope_agg", "tab2", _service(telescope_usage, 5, cached=False)),
+        ("telescope_agg_live", "tab2", _read(TELESCOPE_AGG_LIVE_SQL, (5,))),
+        ("farthest_by_type", "tab2", _service(distance_extreme, "Galaxy", farthest=True, cached=False)),
+        ("nearest_by_type", "tab2", _service(distance_extreme, "Star", farthest=False, cached=False)),
+        ("brightest", "tab2", _service(magnitude_extreme, brightest=True, cached=False)),
+        ("dimmest", "tab2", _service(magnitude_extreme, brightest=False, cached=False)),
+        ("top_n_farthest_per_type", "tab2", _service(top_n_per_type, "distance", "farthest", 10, cached=False)),
+        ("top_n_highest_redshift_per_type", "tab2", _service(top_n_per_type, "redshift", "highest", 10, cached=False)),
+        ("sky_cone_1deg", "tab2", _service(sky_cone_search, 83.8, -5.4, 1.0)),
+        ("sky_cone_10deg", "tab2", _service(sky_cone_search, 83.8, -5.4, 10.0, limit=1000)),
+        ("sky_box_wrap", "tab2", _service(sky_box_search, 350.0, 10.0, -20.0, 20.0, limit=1000)),
+        ("notes_search_natural", "tab2",
+         lambda pool: len(search_observation_notes(pool, "transit photometry")["rows"])),
+        ("notes_search_boolean", "tab2",
+         lambda pool: len(search_observation_notes(pool, '+transit -clouds "excellent seeing"', mode="boolean")["rows"])),
+        ("notes_search_filtered", "tab2", lambda pool: len(search_observation_notes(
+            pool, "calibration", telescope_id=ctx["telescope_id"], date_from=datetime.date(2020, 1, 1))["rows"])),
+        ("telescope_hours", "tab2", _service(telescope_hours, ctx["telescope_id"], cached=False)),
+        ("dashboard_snapshot_build", "tab2", _snapshot_build),
+        # TAB 1
+        ("audit_log_page", "tab1", lambda pool: len(audit_log_page(pool, page_size=5)["rows"])),
+        # TAB 3
+        ("update_researcher_total_time", "routine",
+         _rolled_back(("CALL update_researcher_total_time(%s)", (ctx["researcher_id"],)))),
+        ("rebuild_all_researcher_totals", "routine", _rolled_back((REBUILD_RESEARCHER_TOTALS_SQL, ()))),
+        ("researcher_totals_drift", "tab3", _service(researcher_totals_drift)),
+        ("effective_magnitude_single", "routine", _effective_magnitude_single(ctx)),
+        ("effective_magnitude_batch", "tab3", lambda pool: len(effective_magnitudes(pool, object_type="Quasar"))),
+        ("telescope_daily_usage", "tab3", _service(telescope_daily_usage, ctx["telescope_id"], cached=False)),
+        # Triggers
+        ("trigger_quality_update", "trigger", _rolled_back((
+            "UPDATE OBSERVATIONS SET DataQualityRating = 6 - DataQualityRating WHERE ObservationID = %s",
+            (ctx["observation_id"],),
+        ))),
+        ("trigger_duration_update", "trigger", _rolled_back((
+            "UPDATE OBSERVATIONS SET DurationMinutes = DurationMinutes + 1 WHERE ObservationID = %s",
+            (ctx["observation_id"],),
+        ))),
+        # TAB 4
+        ("insert_observation_path", "tab4", _insert_path(ctx)),
+    )
+
+
+def bench_context(pool):
+    """Representative parameters: the busiest telescope / researcher and a real observation."""
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                "SELECT OS.TelescopeID, OS.ResearcherID, OS.Date, O.ObservationID, O.ObjectID "
+                "FROM OBSERVATIONS AS O JOIN OBSERVATIONSESSIONS AS OS ON O.SessionID = OS.SessionID "
+                "WHERE O.ObservationID >= %s ORDER BY O.ObservationID LIMIT 1",
+                (SYNTHETIC_ID_BASE["OBSERVATIONS"],),
+            )
+            row = cursor.fetchone()
+            if row is None:   # no synthetic data: fall back to the Table_Creation.sql sample rows
+                cursor.execute(
+                    "SELECT OS.TelescopeID, OS.ResearcherID, OS.Date, O.ObservationID, O.ObjectID "
+                    "FROM OBSERVATIONS AS O JOIN OBSERVATIONSESSIONS AS OS ON O.SessionID = OS.SessionID "
+                    "ORDER BY O.ObservationID LIMIT 1"
+                )
+                row = cursor.fetchone()
+        finally:
+            cursor.close()
+    if row is None:
+        raise RuntimeError("No observations in the database; generate data first")
+    keys = ("telescope_id", "researcher_id", "date", "observation_id", "object_id")
+    return dict(zip(keys, row))
+
+
+# ===================================================
+# Measurement
+# ===================================================
+
+def time_case(pool, run, repeat):
+    """Warm up once, then time ``repeat`` runs; returns latency stats in ms."""
+    rows = run(pool)
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = run(pool)
+        samples.append((time.perf_counter() - started) * 1000)
+    ordered = sorted(samples)
+    return {
+        "rows": rows,
+        "min_ms": round(ordered[0], 3),
+        "median_ms": round(statistics.median(ordered), 3),
+        "p95_ms": round(percentile(ordered, 95), 3),
+        "max_ms": round(ordered[-1], 3),
+        "mean_ms": round(statistics.fmean(ordered), 3),
+    }
+
+
+def _reuse_params(ctx):
+    """Registered statements the app runs once per user input, with representative params."""
+    return {
+        "telescope_name": (ctx["telescope_id"],),
+        "telescope_hours": (ctx["telescope_id"],),
+        "researcher_stats": (ctx["researcher_id"],),
+        "observation_magnitude": (ctx["observation_id"],),
+        "exists_observations": (ctx["observation_id"],),
+        "effective_magnitude": (12.5, 0.3),
+    }
+
+
+def _statement_runner(conn, sql, params, mode):
+    if mode == "cached":
+        statements = get_statement_cache()
+
+        def run():
+            with statements.execute(conn, sql, params) as cursor:
+                cursor.fetchall()
+        return run
+
+    def run():
+        cursor = conn.cursor(prepared=(mode == "reprepare"))
+        try:
+            cursor.execute(sql, params)
+            cursor.fetchall()
+        finally:
+            cursor.close()
+    return run
+
+
+def _prepare_count(cursor):
+    cursor.execute("SHOW SESSION STATUS LIKE 'Com_stmt_prepare'")
+    return int(cursor.fetchone()[1])
+
+
+def compare_statement_reuse(pool, ctx, executions=DEFAULT_REUSE_EXECUTIONS):
+    """Mean latency (us) and server-side prepares of each point lookup per execution mode.
+
+    ``text`` sends the interpolated SQL (parsed on every call), ``reprepare``
+    prepares and closes a statement per call, ``cached`` goes through the
+    app's StatementCache (prepared once per connection).
+    """
+    results = []
+    with pool.connection() as conn:
+        status = conn.cursor()
+        try:
+            for name, params in _reuse_params(ctx).items():
+                result = {"name": name, "executions": executions}
+                for mode in ("text", "reprepare", "cached"):
+                    run = _statement_runner(conn, STATEMENTS[name], params, mode)
+                    run()   # warm-up (the cached mode prepares here)
+                    prepares = _prepare_count(status)
+                    started = time.perf_counter()
+                    for _ in range(executions):
+                        run()
+                    elapsed = time.perf_counter() - started
+                    result[f"{mode}_us"] = round(elapsed / executions * 1e6, 1)
+                    result[f"{mode}_prepares"] = _prepare_count(status) - prepares
+                results.append(result)
+        finally:
+            status.close()
+    return results
+
+
+def _engine_cases(ctx):
+    """(name, astro_service function, args, kwargs) run on both MySQL and the columnar mirror."""
+    return (
+        ("nested_discoverer", observers_of_discoverer, ("Galileo Galilei",), {}),
+        ("seeing_join_page", seeing_join_page, ("Good",), {"page_size": 50}),
+        ("telescope_agg_live", telescope_usage, (5,), {}),
+        ("farthest_by_type", distance_extreme, ("Galaxy",), {"farthest": True}),
+        ("brightest", magnitude_extreme, (), {"brightest": True}),
+        ("top_n_farthest_per_type", top_n_per_type, ("distance", "farthest", 10), {}),
+        ("telescope_hours", telescope_hours_report, (ctx["telescope_id"],), {}),
+    )
+
+
+def _row_count(result):
+    if isinstance(result, QueryResult):
+        return len(result.rows)
+    if isinstance(result, dict):
+        return len(result["rows"])
+    return 0 if result is None else 1
+
+
+def compare_engines(pool, ctx, repeat=DEFAULT_REPEAT):
+    """Sync times plus MySQL vs DuckDB-mirror latency of the mirrored Tab 2 queries.
+
+    The mirror is built in a scratch directory so the app's own mirror is left alone.
+    The MySQL side bypasses the query cache; telescope_agg_live is compared against
+    the join query the mirror runs, not the trigger-maintained summary table.
+    """
+    directory = tempfile.mkdtemp(prefix="astro_columnar_bench_")
+    try:
+        started = time.perf_counter()
+        sync_mirror(pool, full=True, directory=directory)
+        full_ms = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        sync_mirror(pool, directory=directory)
+        incremental_ms = (time.perf_counter() - started) * 1000
+        mirror = ColumnarMirror(directory)
+        cases = []
+        for name, fn, args, kwargs in _engine_cases(ctx):
+            mirrored = MIRRORED_FUNCTIONS[fn.__name__]
+            live_kwargs = dict(kwargs) if fn is seeing_join_page else dict(kwargs, cached=False)
+            if fn is telescope_usage:
+                mysql_run = _read(TELESCOPE_AGG_LIVE_SQL, args)
+            else:
+                mysql_run = lambda p, fn=fn, args=args, kw=live_kwargs: _row_count(fn(p, *args, **kw))
+            mysql = time_case(pool, mysql_run, repeat)
+            duck = time_case(mirror, lambda m, f=mirrored, args=args, kw=kwargs: _row_count(f(m, *args, **kw)), repeat)
+            cases.append({
+                "name": name,
+                "mysql_median_ms": mysql["median_ms"], "duckdb_median_ms": duck["median_ms"],
+                "mysql_rows": mysql["rows"], "duckdb_rows": duck["rows"],
+                "speedup": round(mysql["median_ms"] / duck["median_ms"], 2) if duck["median_ms"] else None,
+            })
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return {"full_sync_ms": round(full_ms, 1), "incremental_sync_ms": round(incremental_ms, 1), "cases": cases}
+
+
+def _bulk_insert_ms(conn, ctx, rows, deferred):
+    """Insert a session plus ``rows`` observations of one object (rolled back); returns timings and the result."""
+    session = (_BENCH_SESSION_ID, datetime.date(2099, 12, 31), "Clear", "Good", ctx["researcher_id"], ctx["telescope_id"])
+    observations = [
+        (_BENCH_OBSERVATION_ID + i, _BENCH_SESSION_ID, ctx["object_id"], 30, None, None, 4) for i in range(rows)
+    ]
+    cursor = conn.cursor()
+    try:
+        cursor.execute(SESSION_INSERT_SQL, session)
+        if deferred:
+            cursor.execute("SET @astro_defer_last_observed = 1")
+        started = time.perf_counter()
+        cursor.executemany(OBSERVATION_INSERT_SQL, observations)
+        inserted = time.perf_counter()
+        if deferred:
+            cursor.execute("SET @astro_defer_last_observed = NULL")
+            cursor.execute("CALL refresh_last_observed_dates(%s, %s)",
+                           (_BENCH_OBSERVATION_ID, _BENCH_OBSERVATION_ID + rows - 1))
+        finished = time.perf_counter()
+        cursor.execute("SELECT LastObservedDate FROM CELESTIALOBJECTS WHERE ObjectID = %s", (ctx["object_id"],))
+        last_observed = cursor.fetchone()[0]
+    finally:
+        cursor.execute("SET @astro_defer_last_observed = NULL")
+        cursor.close()
+        conn.rollback()
+    return {
+        "insert_ms": round((inserted - started) * 1000, 1),
+        "refresh_ms": round((finished - inserted) * 1000, 1),
+        "total_ms": round((finished - started) * 1000, 1),
+        "last_observed": last_observed,
+    }
+
+
+def compare_last_observed(pool, ctx, rows=DEFAULT_LAST_OBSERVED_ROWS):
+    """Bulk insert cost with the per-row LastObservedDate trigger vs. the deferred set-based pass.
+
+    The other OBSERVATIONS triggers (researcher totals, telescope usage) fire in
+    both modes, so the difference is the trigger's own cost. Both modes must
+    leave the object with the same LastObservedDate.
+    """
+    with pool.connection() as conn:
+        per_row = _bulk_insert_ms(conn, ctx, rows, deferred=False)
+        deferred = _bulk_insert_ms(conn, ctx, rows, deferred=True)
+    return {
+        "rows": rows,
+        "per_row": per_row,
+        "deferred": deferred,
+        "speedup": round(per_row["total_ms"] / deferred["total_ms"], 2) if deferred["total_ms"] else None,
+        "consistent": per_row["last_observed"] == deferred["last_observed"],
+    }
+
+
+def _rerate_ms(conn, rows, batched):
+    """Re-rate the first ``rows`` observations (rolled back); returns the timing and the audit rows written."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT COALESCE(MAX(LogID), 0) FROM OBSERVATION_LOG")
+        last_log_id = cursor.fetchone()[0]
+        # every selected rating changes, so every row is audited
+        cursor.execute(
+            "SELECT ObservationID, COALESCE(DataQualityRating, 0) % 5 + 1 FROM OBSERVATIONS "
+            "ORDER BY ObservationID LIMIT %s", (rows,)
+        )
+        ratings = cursor.fetchall()
+        started = time.perf_counter()
+        if batched:
+            cursor.execute(STAGE_CREATE_SQL)
+            cursor.executemany(STAGE_ROWS_SQL, ratings)
+            cursor.callproc("apply_quality_rerate_chunk", (0,))
+        else:
+            for observation_id, rating in ratings:
+                cursor.execute(STATEMENTS["update_quality_rating"], (rating, observation_id))
+        finished = time.perf_counter()
+        cursor.execute(
+            "SELECT ObservationID, ChangeType, OldDataQuality FROM OBSERVATION_LOG WHERE LogID > %s "
+            "ORDER BY ObservationID", (last_log_id,)
+        )
+        audit = cursor.fetchall()
+    finally:
+        conn.rollback()
+        cursor.execute(STAGE_DROP_SQL)
+        cursor.close()
+    return {"total_ms": round((finished - started) * 1000, 1), "audit_rows": len(audit), "audit": audit}
+
+
+def compare_rerate(pool, rows=DEFAULT_RERATE_ROWS):
+    """Bulk re-rating cost: one UPDATE + trigger insert per observation vs. one staged set-based chunk.
+
+    Both modes must write the same audit rows.
+    """
+    with pool.connection() as conn:
+        per_row = _rerate_ms(conn, rows, batched=False)
+        batched = _rerate_ms(conn, rows, batched=True)
+    return {
+        "rows": rows,
+        "per_row_ms": per_row["total_ms"],
+        "batched_ms": batched["total_ms"],
+        "audit_rows": batched["audit_rows"],
+        "speedup": round(per_row["total_ms"] / batched["total_ms"], 2) if batched["total_ms"] else None,
+        "consistent": per_row["audit"] == batched["audit"],
+    }
+
+
+def table_counts(pool):
+    counts = {}
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            for table in COUNTED_TABLES:
+                cursor.execute(f"SELECT COUNT(*) FROM {table}")
+                counts[table] = cursor.fetchone()[0]
+        finally:
+            cursor.close()
+    return counts
+
+
+def run_cases(pool, repeat=DEFAULT_REPEAT, only=None, progress=None):
+    results = []
+    for name, category, run in build_cases(bench_context(pool)):
+        if only and name not in only:
+            continue
+        result = {"name": name, "category": category}
+        try:
+            result.update(time_case(pool, run, repeat), ok=True)
+        except (Error, RuntimeError) as err:
+            # e.g. layer3.sql routines not installed; keep going with the other cases
+            result.update(ok=False, error=str(err))
+        results.append(result)
+        if progress:
+            progress(result)
+    return results
+
+
+def _server_version(pool):
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("SELECT VERSION()")
+            return cursor.fetchone()[0]
+        finally:
+            cursor.close()
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def missed_targets(cases):
+    """Cases with a latency target (LATENCY_TARGETS) whose median exceeded it."""
+    return [
+        {"name": case["name"], "median_ms": case["median_ms"], "target_ms": LATENCY_TARGETS[case["name"]]}
+        for case in cases
+        if case.get("ok") and case["name"] in LATENCY_TARGETS and case["median_ms"] > LATENCY_TARGETS[case["name"]]
+    ]
+
+
+def compare_reports(current, baseline, tolerance=DEFAULT_REGRESSION_TOLERANCE):
+    """Cases whose median latency grew by more than ``tolerance`` at the same scale."""
+    old = {
+        (run["scale"], case["name"]): case["median_ms"]
+        for run in baseline.get("runs", ()) for case in run["cases"] if case.get("ok")
+    }
+    regressions = []
+    for run in current["runs"]:
+        for case in run["cases"]:
+            before = old.get((run["scale"], case["name"]))
+            if case.get("ok") and before and case["median_ms"] > before * (1 + tolerance):
+                regressions.append({
+                    "scale": run["scale"], "name": case["name"],
+                    "baseline_ms": before, "current_ms": case["median_ms"],
+                    "ratio": round(case["median_ms"] / before, 2),
+                })
+    return regressions
+
+
+# ===================================================
+# CLI
+# ===================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the app's SQL at several synthetic data scales.")
+    parser.add_argument("--scales", default="1e3,1e4,1e5", help="comma-separated observation counts (1e3 .. 1e7)")
+    parser.add_argument("--existing", action="store_true", help="benchmark the current data only, no generation")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="measured runs per case")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--skew", type=float, default=DEFAULT_SKEW)
+    parser.add_argument("--case", action="append", help="only run this case (repeatable)")
+    parser.add_argument("--keep", action="store_true", help="leave the last synthetic dataset in place")
+    parser.add_argument("--out", default="bench_report.json", help="JSON report path")
+    parser.add_argument("--baseline", help="earlier JSON report to compare medians against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_REGRESSION_TOLERANCE)
+    parser.add_argument("--reuse-executions", type=int, default=DEFAULT_REUSE_EXECUTIONS,
+                        help="executions per statement in the prepared-statement comparison (0 = skip)")
+    parser.add_argument("--last-observed-rows", type=int, default=DEFAULT_LAST_OBSERVED_ROWS,
+                        help="observations per bulk insert in the LastObservedDate trigger comparison (0 = skip)")
+    parser.add_argument("--rerate-rows", type=int, default=DEFAULT_RERATE_ROWS,
+                        help="observations in the per-row vs. batched re-rating comparison (0 = skip)")
+    parser.add_argument("--columnar", action="store_true",
+                        help="also compare the mirrored Tab 2 queries on MySQL and the DuckDB mirror")
+    args = parser.parse_args(argv)
+
+    pool = get_pool()
+    report = {
+        "report_version": REPORT_VERSION,
+        "started_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "host": platform.node(),
+        "python": platform.python_version(),
+        "server_version": _server_version(pool),
+        "repeat": args.repeat,
+        "seed": args.seed,
+        "skew": args.skew,
+        "runs": [],
+    }
+
+    def progress(result):
+        status = f"{result['median_ms']:.2f} ms median" if result["ok"] else f"FAILED: {result['error']}"
+        print(f"    {result['name']:<32} {status}", file=sys.stderr)
+
+    scales = ["existing"] if args.existing else [int(float(s)) for s in args.scales.split(",") if s.strip()]
+    for scale in scales:
+        run = {"scale": scale}
+        if scale != "existing":
+            print(f"Scale {scale}: generating...", file=sys.stderr)
+            purge(pool)
+            run["generation"] = generate(pool, scale, seed=args.seed, skew=args.skew)
+        run["dataset"] = table_counts(pool)
+        print(f"Scale {scale}: {run['dataset']['OBSERVATIONS']} observations", file=sys.stderr)
+        run["cases"] = run_cases(pool, args.repeat, only=args.case, progress=progress)
+        run["missed_targets"] = missed_targets(run["cases"])
+        for r in run["missed_targets"]:
+            print(f"    TARGET MISSED {r['name']}: {r['median_ms']} ms > {r['target_ms']} ms", file=sys.stderr)
+        if args.reuse_executions > 0:
+            try:
+                run["statement_reuse"] = compare_statement_reuse(pool, bench_context(pool), args.reuse_executions)
+            except Error as err:
+                run["statement_reuse"] = {"error": str(err)}
+                print(f"    statement reuse comparison FAILED: {err}", file=sys.stderr)
+            else:
+                for r in run["statement_reuse"]:
+                    print(f"    {r['name']:<32} text {r['text_us']} us, re-prepared {r['reprepare_us']} us "
+                          f"({r['reprepare_prepares']} prepares), cached {r['cached_us']} us "
+                          f"({r['cached_prepares']} prepares)", file=sys.stderr)
+        if args.last_observed_rows > 0:
+            try:
+                run["last_observed"] = compare_last_observed(pool, bench_context(pool), args.last_observed_rows)
+            except Error as err:   # e.g. layer3.sql's refresh_last_observed_dates not installed
+                run["last_observed"] = {"error": str(err)}
+                print(f"    LastObservedDate comparison FAILED: {err}", file=sys.stderr)
+            else:
+                lo = run["last_observed"]
+                print(f"    {'last_observed_bulk_' + str(lo['rows']):<32} per-row trigger {lo['per_row']['total_ms']} ms, "
+                      f"deferred {lo['deferred']['insert_ms']} + {lo['deferred']['refresh_ms']} ms "
+                      f"(x{lo['speedup']}{'' if lo['consistent'] else ', RESULTS DIFFER'})", file=sys.stderr)
+        if args.rerate_rows > 0:
+            try:
+                run["rerate"] = compare_rerate(pool, args.rerate_rows)
+            except Error as err:   # e.g. layer3.sql's apply_quality_rerate_chunk not installed
+                run["rerate"] = {"error": str(err)}
+                print(f"    re-rating comparison FAILED: {err}", file=sys.stderr)
+            else:
+                rr = run["rerate"]
+                print(f"    {'rerate_bulk_' + str(rr['rows']):<32} per-row {rr['per_row_ms']} ms, "
+                      f"batched {rr['batched_ms']} ms, {rr['audit_rows']} audit rows "
+                      f"(x{rr['speedup']}{'' if rr['consistent'] else ', AUDIT ROWS DIFFER'})", file=sys.stderr)
+        if args.columnar:
+            try:
+                run["engines"] = compare_engines(pool, bench_context(pool), args.repeat)
+            except (Error, RuntimeError) as err:
+                run["engines"] = {"error": str(err)}
+                print(f"    engine comparison FAILED: {err}", file=sys.stderr)
+            else:
+                engines = run["engines"]
+                print(f"    columnar mirror: full sync {engines['full_sync_ms']} ms, "
+                      f"incremental {engines['incremental_sync_ms']} ms", file=sys.stderr)
+                for r in engines["cases"]:
+                    print(f"    {r['name']:<32} MySQL {r['mysql_median_ms']:.2f} ms, DuckDB {r['duckdb_median_ms']:.2f} ms "
+                          f"(x{r['speedup']})", file=sys.stderr)
+        report["runs"].append(run)
+    if not args.existing and not args.keep:
+        purge(pool)
+
+    # a missed latency target fails the run like a regression does
+    exit_code = 1 if any(run["missed_targets"] for run in report["runs"]) else 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare_reports(report, json.load(f), args.tolerance)
+        report["regressions"] = regressions
+        for r in regressions:
+            print(f"REGRESSION scale={r['scale']} {r['name']}: {r['baseline_ms']} -> {r['current_ms']} ms "
+                  f"(x{r['ratio']})")
+        exit_code = 1 if regressions else exit_code
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"Report written to {args.out}")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,517 @@
+"""Columnar analytics mirror: Parquet copies of the catalog tables, queried with DuckDB.
+
+``sync_mirror`` copies CELESTIALOBJECTS, OBSERVATIONSESSIONS, OBSERVATIONS,
+TELESCOPES and OBJECTDISCOVERY (plus RESEARCHERS, for the names the nested
+discoverer query returns) into Parquet part files under
+``COLUMNAR_CONFIG['directory']``. Each run reads only the rows above the
+table's primary-key high-water mark and appends one part file per table. A
+table is re-extracted in full when rows at or below the mark were deleted
+(archiving) or inserted late (explicit lower IDs), and part files are
+compacted once there are too many. ``_manifest.json`` lists the live files
+and is replaced atomically, so readers never see a half-written sync.
+
+Updates to existing rows (DataQualityRating, LastObservedDate, ...) are not
+picked up incrementally; ``sync --full`` re-extracts everything. None of the
+mirrored Tab 2 queries read those columns.
+
+The Tab 2 functions mirrored in ``MIRRORED_FUNCTIONS`` take the mirror in
+place of the pool and return the same shapes as their astro_service
+counterparts. Reading the mirror never touches MySQL.
+
+Usage:
+    python astro_columnar.py sync [--full] [--every 600]
+    python astro_columnar.py status
+"""
+import argparse
+import datetime
+import decimal
+import json
+import os
+import sys
+import threading
+import time
+
+from mysql.connector.constants import FieldType
+
+from astro_db import get_pool
+from astro_metrics import get_query_metrics
+from astro_paging import MAX_PAGE_SIZE, SEEING_JOIN_PAGED, page_from_rows
+from astro_queries import (
+    DISTANCE_EXTREME_SQL, MAGNITUDE_EXTREME_SQL, NESTED_DISCOVERER_SQL, TELESCOPE_AGG_LIVE_SQL, TELESCOPE_NAME_SQL,
+    TOP_N_METRICS,
+)
+from astro_service import QueryResult
+
+# --- Columnar Mirror Configuration (override with environment variables) ---
+COLUMNAR_CONFIG = {
+    'directory': os.environ.get('ASTRO_COLUMNAR_DIR', 'columnar_mirror'),
+    # the app flags the mirror as stale after this many seconds without a sync
+    'max_age_seconds': float(os.environ.get('ASTRO_COLUMNAR_MAX_AGE', 900)),
+    # rows fetched per block while extracting (bounds client memory)
+    'batch_rows': int(os.environ.get('ASTRO_COLUMNAR_BATCH', 50000)),
+    # part files per table before they are compacted into one
+    'max_parts': int(os.environ.get('ASTRO_COLUMNAR_MAX_PARTS', 16)),
+}
+
+# table -> primary key (the high-water-mark column)
+MIRROR_TABLES = {
+    "TELESCOPES": "TelescopeID",
+    "RESEARCHERS": "ResearcherID",
+    "CELESTIALOBJECTS": "ObjectID",
+    "OBJECTDISCOVERY": "ObjectID",
+    "OBSERVATIONSESSIONS": "SessionID",
+    "OBSERVATIONS": "ObservationID",
+}
+
+MANIFEST_NAME = "_manifest.json"
+
+_INTEGER_TYPES = {FieldType.TINY, FieldType.SHORT, FieldType.LONG, FieldType.INT24, FieldType.LONGLONG,
+                  FieldType.YEAR, FieldType.BIT}
+_FLOAT_TYPES = {FieldType.FLOAT, FieldType.DOUBLE, FieldType.DECIMAL, FieldType.NEWDECIMAL}
+_DATE_TYPES = {FieldType.DATE, FieldType.NEWDATE}
+_DATETIME_TYPES = {FieldType.DATETIME, FieldType.TIMESTAMP}
+
+
+def _require_columnar():
+    try:
+        import duckdb
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("The columnar mirror needs duckdb and pyarrow: pip install duckdb pyarrow")
+    return duckdb, pyarrow, pyarrow.parquet
+
+
+# ===================================================
+# Manifest
+# ===================================================
+
+def _manifest_path(directory):
+    return os.path.join(directory, MANIFEST_NAME)
+
+
+def load_manifest(directory=None):
+    """The last completed sync ({} if the mirror was never built)."""
+    try:
+        with open(_manifest_path(directory or COLUMNAR_CONFIG['directory']), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _write_manifest(directory, manifest):
+    tmp = _manifest_path(directory) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, _manifest_path(directory))
+
+
+# ===================================================
+# Sync (MySQL -> Parquet)
+# ===================================================
+
+def _arrow_schema(pa, description):
+    fields = []
+    for column in description:
+        name, type_code = column[0], column[1]
+        if type_code in _INTEGER_TYPES:
+            arrow_type = pa.int64()
+        elif type_code in _FLOAT_TYPES:
+            arrow_type = pa.float64()
+        elif type_code in _DATE_TYPES:
+            arrow_type = pa.date32()
+        elif type_code in _DATETIME_TYPES:
+            arrow_type = pa.timestamp("us")
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(name, arrow_type))
+    return pa.schema(fields)
+
+
+def _arrow_value(value, arrow_type, pa):
+    if value is None:
+        return None
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if arrow_type == pa.string() and not isinstance(value, str):
+        return value.decode("utf-8") if isinstance(value, (bytes, bytearray)) else str(value)
+    return value
+
+
+def _write_part(pa, pq, cursor, path, batch_rows):
+    """Stream the cursor's result into one Parquet file; returns (rows written, last row)."""
+    schema = _arrow_schema(pa, cursor.description)
+    types = [field.type for field in schema]
+    written = 0
+    last_row = None
+    tmp = path + ".tmp"
+    with pq.ParquetWriter(tmp, schema) as writer:
+        while True:
+            rows = cursor.fetchmany(batch_rows)
+            if not rows:
+                break
+            columns = [
+                [_arrow_value(row[i], types[i], pa) for row in rows]
+                for i in range(len(types))
+            ]
+            writer.write_table(pa.Table.from_arrays([pa.array(c, type=t) for c, t in zip(columns, types)], schema=schema))
+            written += len(rows)
+            last_row = rows[-1]
+    os.replace(tmp, path)
+    return written, last_row
+
+
+def _sync_table(pa, pq, conn, directory, table, key, state, full, batch_rows):
+    """Extract one table's new rows (or all of them); returns its new manifest entry."""
+    hwm = None if full or not state else state["high_water_mark"]
+    cursor = conn.cursor()
+    try:
+        if hwm is not None:
+            # rows at or below the mark must still be exactly the ones already mirrored
+            cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE {key} <= %s", (hwm,))
+            if cursor.fetchone()[0] != state["rows"]:
+                hwm = None
+    finally:
+        cursor.close()
+
+    mode = "append" if hwm is not None else "rebuild"
+    table_dir = os.path.join(directory, table)
+    os.makedirs(table_dir, exist_ok=True)
+    path = os.path.join(table_dir, f"part-{time.time_ns()}.parquet")
+    cursor = conn.cursor(buffered=False)
+    try:
+        with get_query_metrics().track(f"columnar_extract_{table.lower()}") as stat:
+            if hwm is None:
+                cursor.execute(f"SELECT * FROM {table} ORDER BY {key}")
+            else:
+                cursor.execute(f"SELECT * FROM {table} WHERE {key} > %s ORDER BY {key}", (hwm,))
+            key_index = [c[0] for c in cursor.description].index(key)
+            if mode == "append":
+                rows = cursor.fetchmany(1)
+                if not rows:
+                    return dict(state, mode="unchanged", new_rows=0)
+                cursor_rows = _Prefetched(cursor, rows)
+            else:
+                cursor_rows = cursor
+            written, last_row = _write_part(pa, pq, cursor_rows, path, batch_rows)
+            stat["rows"] = written
+    finally:
+        if conn.unread_result:
+            conn.consume_results()
+        cursor.close()
+
+    files = ([] if mode == "rebuild" else list(state["files"])) + [os.path.relpath(path, directory)]
+    retired = list(state["files"]) if state and mode == "rebuild" else []
+    new_hwm = last_row[key_index] if last_row is not None else (hwm if mode == "append" else None)
+    return {
+        "key": key,
+        "high_water_mark": new_hwm,
+        "rows": (state["rows"] if mode == "append" else 0) + written,
+        "files": files,
+        "retired": retired,
+        "mode": mode,
+        "new_rows": written,
+    }
+
+
+class _Prefetched:
+    """Cursor stand-in that replays rows already fetched to peek at the result."""
+
+    def __init__(self, cursor, rows):
+        self.description = cursor.description
+        self._cursor = cursor
+        self._rows = rows
+
+    def fetchmany(self, size):
+        if self._rows:
+            rows, self._rows = self._rows, None
+            return rows + self._cursor.fetchmany(max(0, size - len(rows)))
+        return self._cursor.fetchmany(size)
+
+
+def _compact(duckdb, directory, table, entry):
+    """Merge a table's part files into one; the old files are retired, not deleted."""
+    path = os.path.join(directory, table, f"part-{time.time_ns()}.parquet")
+    sources = [os.path.join(directory, f) for f in entry["files"]]
+    con = duckdb.connect()
+    try:
+        con.execute(f"COPY (SELECT * FROM read_parquet(?)) TO '{path}.tmp' (FORMAT PARQUET)", [sources])
+    finally:
+        con.close()
+    os.replace(path + ".tmp", path)
+    entry["retired"] = entry.get("retired", []) + entry["files"]
+    entry["files"] = [os.path.relpath(path, directory)]
+
+
+def _delete_retired(directory, manifest):
+    """Remove files a previous sync retired; readers have switched to the newer manifest by now."""
+    for entry in manifest.get("tables", {}).values():
+        for name in entry.get("retired", ()):
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+
+
+def sync_mirror(pool, full=False, directory=None, tables=None):
+    """Bring the Parquet mirror up to date; returns {table: {"mode", "new_rows", "rows"}}.
+
+    All tables are read in one consistent-snapshot transaction, so the mirror
+    never holds an observation whose session is missing.
+    """
+    duckdb, pa, pq = _require_columnar()
+    directory = directory or COLUMNAR_CONFIG['directory']
+    os.makedirs(directory, exist_ok=True)
+    previous = load_manifest(directory)
+    _delete_retired(directory, previous)
+    old_tables = previous.get("tables", {})
+    new_tables = {}
+    started = time.time()
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT, READ ONLY")
+        finally:
+            cursor.close()
+        try:
+            for table, key in MIRROR_TABLES.items():
+                state = old_tables.get(table)
+                if tables and table not in tables and state:
+                    new_tables[table] = dict(state, retired=[], mode="skipped", new_rows=0)
+                    continue
+                new_tables[table] = _sync_table(pa, pq, conn, directory, table, key, state, full,
+                                                COLUMNAR_CONFIG['batch_rows'])
+        finally:
+            conn.rollback()
+    for table, entry in new_tables.items():
+        if len(entry["files"]) > COLUMNAR_CONFIG['max_parts']:
+            _compact(duckdb, directory, table, entry)
+            entry["mode"] += "+compact"
+    _write_manifest(directory, {
+        "synced_at": started,
+        "sync_seconds": round(time.time() - started, 3),
+        "tables": new_tables,
+    })
+    return {t: {"mode": e["mode"], "new_rows": e["new_rows"], "rows": e["rows"]} for t, e in new_tables.items()}
+
+
+def mirror_status(pool=None, directory=None):
+    """Age of the last sync and, with a pool, how many source rows each table is behind.
+
+    ``rows_behind`` counts rows above the high-water mark (new inserts); it is
+    a cheap index range count, not a full comparison.
+    """
+    manifest = load_manifest(directory)
+    if not manifest:
+        return {"synced": False, "tables": {}}
+    age = time.time() - manifest["synced_at"]
+    status = {
+        "synced": True,
+        "synced_at": datetime.datetime.fromtimestamp(manifest["synced_at"]),
+        "age_s": round(age, 1),
+        "stale": age > COLUMNAR_CONFIG['max_age_seconds'],
+        "tables": {t: {"rows": e["rows"], "high_water_mark": e["high_water_mark"]} for t, e in manifest["tables"].items()},
+    }
+    if pool is not None:
+        with pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                for table, entry in status["tables"].items():
+                    key = MIRROR_TABLES[table]
+                    if entry["high_water_mark"] is None:
+                        cursor.execute(f"SELECT COUNT(*) FROM {table}")
+                    else:
+                        cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE {key} > %s", (entry["high_water_mark"],))
+                    entry["rows_behind"] = cursor.fetchone()[0]
+            finally:
+                cursor.close()
+        status["rows_behind"] = sum(e["rows_behind"] for e in status["tables"].values())
+    return status
+
+
+# ===================================================
+# Reading the mirror (DuckDB)
+# ===================================================
+
+class ColumnarMirror:
+    """DuckDB views over the files the current manifest lists; re-pointed when a sync lands."""
+
+    def __init__(self, directory=None):
+        self.directory = directory or COLUMNAR_CONFIG['directory']
+        self._duckdb = _require_columnar()[0]
+        self._con = self._duckdb.connect()
+        self._manifest_mtime = None
+        self._lock = threading.Lock()
+
+    def _refresh(self):
+        try:
+            mtime = os.stat(_manifest_path(self.directory)).st_mtime_ns
+        except FileNotFoundError:
+            raise RuntimeError("The columnar mirror has not been built yet: python astro_columnar.py sync")
+        if mtime == self._manifest_mtime:
+            return
+        with self._lock:
+            if mtime == self._manifest_mtime:
+                return
+            manifest = load_manifest(self.directory)
+            for table, entry in manifest["tables"].items():
+                files = [os.path.join(self.directory, f) for f in entry["files"]]
+                listed = ", ".join("'" + f.replace("'", "''") + "'" for f in files)
+                self._con.execute(f"CREATE OR REPLACE VIEW {table} AS SELECT * FROM read_parquet([{listed}])")
+            self._manifest_mtime = mtime
+
+    def query(self, sql, params=(), name=None):
+        """Run MySQL-style SQL (``%s`` placeholders) on the mirror; returns a QueryResult.
+
+        DuckDB errors (e.g. a part file removed by hand) are raised as RuntimeError.
+        """
+        self._refresh()
+        sql = sql.strip().rstrip(";").replace("%s", "?")
+        cursor = self._con.cursor()   # one DuckDB connection per call: safe across Streamlit threads
+        try:
+            with get_query_metrics().track(f"columnar_{name}" if name else None, sql) as stat:
+                try:
+                    cursor.execute(sql, list(params))
+                    rows = cursor.fetchall()
+                except self._duckdb.Error as e:
+                    raise RuntimeError(f"Columnar mirror query failed: {e}") from e
+                stat["rows"] = len(rows)
+            return QueryResult([c[0] for c in cursor.description], rows)
+        finally:
+            cursor.close()
+
+
+_mirror = None
+_mirror_lock = threading.Lock()
+
+
+def get_columnar_mirror():
+    """Return the process-wide mirror reader."""
+    global _mirror
+    if _mirror is None:
+        with _mirror_lock:
+            if _mirror is None:
+                _mirror = ColumnarMirror()
+    return _mirror
+
+
+# ===================================================
+# Tab 2 queries on the mirror (same arguments and results as astro_service)
+# ===================================================
+
+TELESCOPE_HOURS_COLUMNAR_SQL = """
+SELECT SUM(O.DurationMinutes) / 60.0 AS HoursUsed
+FROM OBSERVATIONSESSIONS AS OS
+JOIN OBSERVATIONS AS O ON OS.SessionID = O.SessionID
+WHERE OS.TelescopeID = %s
+"""
+
+# The mirror has no per-type indexes to walk, so one window pass ranks every type
+TOP_N_COLUMNAR_SQL = {
+    (metric, extreme): f"""
+SELECT ObjectType, ObjectName, {column} AS Value
+FROM CELESTIALOBJECTS
+WHERE {column} IS NOT NULL AND (CAST(%s AS VARCHAR) IS NULL OR ObjectType = %s)
+QUALIFY ROW_NUMBER() OVER (PARTITION BY ObjectType ORDER BY {column} {order_dir}) <= %s
+ORDER BY ObjectType, Value {order_dir}
+"""
+    for metric, (column, extremes) in TOP_N_METRICS.items()
+    for extreme, order_dir in extremes.items()
+}
+
+
+def _first_row(result):
+    return result.rows[0] if result.rows else None
+
+
+def columnar_observers_of_discoverer(mirror, discoverer, cached=True):
+    return mirror.query(NESTED_DISCOVERER_SQL, (discoverer,), name="nested_discoverer")
+
+
+def columnar_telescope_usage(mirror, min_observations, cached=True):
+    return mirror.query(TELESCOPE_AGG_LIVE_SQL, (min_observations,), name="telescope_agg")
+
+
+def columnar_distance_extreme(mirror, object_type, farthest=True, cached=True):
+    sql = DISTANCE_EXTREME_SQL["DESC" if farthest else "ASC"]
+    return _first_row(mirror.query(sql, (object_type,), name="distance_extreme"))
+
+
+def columnar_magnitude_extreme(mirror, brightest=True, cached=True):
+    return _first_row(mirror.query(MAGNITUDE_EXTREME_SQL["ASC" if brightest else "DESC"], name="magnitude_extreme"))
+
+
+def columnar_top_n_per_type(mirror, metric="distance", extreme="farthest", n=5, object_type=None, cached=True):
+    if (metric, extreme) not in TOP_N_COLUMNAR_SQL:
+        raise ValueError(f"unknown top-N ranking {metric}/{extreme}")
+    result = mirror.query(TOP_N_COLUMNAR_SQL[metric, extreme], (object_type, object_type, int(n)), name=f"top_n_{metric}")
+    rows, rank, previous = [], 0, None
+    for obj_type, name, value in result.rows:
+        rank = rank + 1 if obj_type == previous else 1
+        previous = obj_type
+        rows.append((obj_type, rank, name, value))
+    return QueryResult(["ObjectType", "Rank", "ObjectName", TOP_N_METRICS[metric][0]], rows)
+
+
+def columnar_telescope_hours_report(mirror, telescope_id, cached=True):
+    row = _first_row(mirror.query(TELESCOPE_NAME_SQL, (telescope_id,), name="telescope_name"))
+    if row is None:
+        return None, None
+    hours = _first_row(mirror.query(TELESCOPE_HOURS_COLUMNAR_SQL, (telescope_id,), name="telescope_hours"))[0]
+    return row[0], float(hours) if hours is not None else 0.0
+
+
+def columnar_fetch_page(mirror, query, params=(), after=None, before=None, page_size=50):
+    """astro_paging.fetch_page over the mirror."""
+    page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+    sql, extra = query.render(after=after, before=before)
+    result = mirror.query(sql, tuple(params) + tuple(extra) + (page_size + 1,), name=query.name)
+    return page_from_rows(query, result.columns, result.rows, page_size, after, before)
+
+
+def columnar_seeing_join_page(mirror, seeing, after=None, before=None, page_size=50):
+    return columnar_fetch_page(mirror, SEEING_JOIN_PAGED, (seeing,), after=after, before=before, page_size=page_size)
+
+
+# astro_service function name -> mirror implementation
+MIRRORED_FUNCTIONS = {
+    "observers_of_discoverer": columnar_observers_of_discoverer,
+    "seeing_join_page": columnar_seeing_join_page,
+    "telescope_usage": columnar_telescope_usage,
+    "distance_extreme": columnar_distance_extreme,
+    "magnitude_extreme": columnar_magnitude_extreme,
+    "top_n_per_type": columnar_top_n_per_type,
+    "telescope_hours_report": columnar_telescope_hours_report,
+}
+
+
+# ===================================================
+# CLI
+# ===================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or inspect the columnar (Parquet + DuckDB) analytics mirror.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sync = sub.add_parser("sync", help="copy new rows into the mirror")
+    sync.add_argument("--full", action="store_true", help="re-extract every table")
+    sync.add_argument("--every", type=float, help="keep syncing every N seconds")
+    sub.add_parser("status", help="print the mirror's age and how far it is behind")
+    args = parser.parse_args(argv)
+
+    pool = get_pool()
+    if args.command == "status":
+        print(json.dumps(mirror_status(pool), indent=2, default=str))
+        return 0
+    while True:
+        started = time.perf_counter()
+        report = sync_mirror(pool, full=args.full)
+        summary = ", ".join(f"{t} {r['mode']} +{r['new_rows']}" for t, r in report.items())
+        print(f"{time.strftime('%H:%M:%S')} mirror synced in {time.perf_counter() - started:.1f}s: {summary}",
+              file=sys.stderr)
+        if not args.every:
+            return 0
+        time.sleep(args.every)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
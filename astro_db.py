@@ -0,0 +1,561 @@
+import os
+import queue
+import re
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import mysql.connector
+from mysql.connector import Error
+from mysql.connector.errors import PoolError
+
+# --- Database Configuration ---
+DB_CONFIG = {
+    'host': 'localhost',
+    'database': 'astro_observatory',
+    'user': 'root',
+    'password': 'password'  # change this to your MySQL password
+}
+
+# --- Pool Configuration (override with environment variables) ---
+POOL_CONFIG = {
+    'pool_size': int(os.environ.get('ASTRO_DB_POOL_SIZE', 5)),
+    'checkout_timeout': float(os.environ.get('ASTRO_DB_POOL_TIMEOUT', 10)),
+    # connections idle longer than this (seconds) are pinged before reuse
+    'health_check_interval': float(os.environ.get('ASTRO_DB_HEALTH_CHECK', 30)),
+}
+
+# --- Query Result Cache Configuration ---
+CACHE_CONFIG = {
+    'max_entries': int(os.environ.get('ASTRO_QUERY_CACHE_SIZE', 256)),
+    'ttl_seconds': float(os.environ.get('ASTRO_QUERY_CACHE_TTL', 300)),
+}
+
+# --- Prepared Statement Configuration ---
+STATEMENT_CONFIG = {
+    # ASTRO_PREPARED_STATEMENTS=0 falls back to client-side interpolation (text protocol)
+    'enabled': os.environ.get('ASTRO_PREPARED_STATEMENTS', '1') != '0',
+    # statements kept prepared per connection; the server caps the total at max_prepared_stmt_count
+    'max_per_connection': int(os.environ.get('ASTRO_PREPARED_PER_CONNECTION', 64)),
+}
+
+
+class PoolTimeout(PoolError):
+    """Raised when no pooled connection frees up within the checkout timeout"""
+
+
+# ===================================================
+# Connection Pool
+# ===================================================
+
+class ConnectionPool:
+    """Fixed-size pool of MySQL connections shared by the whole process.
+
+    Connections are opened lazily up to ``pool_size``. A checkout that finds
+    the pool exhausted waits up to ``checkout_timeout`` seconds and then
+    raises ``PoolTimeout``. Connections that sat idle for longer than
+    ``health_check_interval`` are pinged (and reconnected if stale) before
+    being handed out.
+    """
+
+    SLOT_POLL_INTERVAL = 0.1
+
+    def __init__(self, db_config, pool_size=5, checkout_timeout=10.0, health_check_interval=30.0):
+        self.db_config = dict(db_config)
+        self.pool_size = max(1, int(pool_size))
+        self.checkout_timeout = checkout_timeout
+        self.health_check_interval = health_check_interval
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+        self._metrics = {
+            'checkouts': 0,
+            'waits': 0,
+            'timeouts': 0,
+            'health_checks': 0,
+            'reconnects': 0,
+            'discarded': 0,
+        }
+
+    # --- internal helpers ---
+    def _connect(self):
+        return mysql.connector.connect(**self.db_config)
+
+    def _bump(self, key, amount=1):
+        with self._lock:
+            self._metrics[key] += amount
+
+    def _reserve_slot(self):
+        """Claim the right to open a new connection if the pool is not full."""
+        with self._lock:
+            if self._created < self.pool_size:
+                self._created += 1
+                return True
+            return False
+
+    def _release_slot(self):
+        with self._lock:
+            self._created -= 1
+
+    def _open_reserved(self):
+        """Open the connection for a slot claimed with ``_reserve_slot``; frees the slot on failure."""
+        try:
+            return self._connect(), time.monotonic()
+        except Error:
+            self._release_slot()
+            raise
+
+    def _wait_for_connection(self):
+        """Block for an idle connection, or for a slot freed by a discarded one.
+
+        Discarding a connection does not put anything on the idle queue, so
+        waiters wake up every ``SLOT_POLL_INTERVAL`` seconds to claim a freed slot.
+        """
+        deadline = time.monotonic() + self.checkout_timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._bump('timeouts')
+                raise PoolTimeout(
+                    msg=f"No database connection available after {self.checkout_timeout}s "
+                        f"(pool size {self.pool_size})"
+                )
+            try:
+                return self._idle.get(timeout=min(remaining, self.SLOT_POLL_INTERVAL))
+            except queue.Empty:
+                if self._reserve_slot():
+                    return self._open_reserved()
+
+    def _ensure_healthy(self, conn, last_used):
+        if time.monotonic() - last_used < self.health_check_interval:
+            return conn
+        self._bump('health_checks')
+        try:
+            conn.ping(reconnect=False)
+            return conn
+        except Error:
+            pass
+        # stale (server timeout, restart, network blip) -> replace it
+        self._bump('reconnects')
+        try:
+            conn.close()
+        except Error:
+            pass
+        return self._connect()
+
+    # --- public API ---
+    def acquire(self):
+        """Check out a live connection; callers must hand it back with ``release``."""
+        try:
+            conn, last_used = self._idle.get_nowait()
+        except queue.Empty:
+            if self._reserve_slot():
+                conn, last_used = self._open_reserved()
+            else:
+                self._bump('waits')
+                conn, last_used = self._wait_for_connection()
+        try:
+            conn = self._ensure_healthy(conn, last_used)
+        except Error:
+            self._release_slot()
+            raise
+        with self._lock:
+            self._in_use += 1
+            self._metrics['checkouts'] += 1
+        return conn
+
+    def release(self, conn):
+        """Return a connection to the pool, rolling back any open transaction."""
+        with self._lock:
+            self._in_use -= 1
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put((conn, time.monotonic()))
+        except Error:
+            self._bump('discarded')
+            self._release_slot()
+            try:
+                conn.close()
+            except Error:
+                pass
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._metrics)
+            stats.update({
+                'pool_size': self.pool_size,
+                'open': self._created,
+                'in_use': self._in_use,
+                'idle': self._idle.qsize(),
+            })
+        return stats
+
+    def close_all(self):
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                conn.close()
+            except Error:
+                pass
+            self._release_slot()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_trigger_cache = {}
+_routine_cache = {}
+
+
+def get_pool():
+    """Return the process-wide pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DB_CONFIG, **POOL_CONFIG)
+    return _pool
+
+
+# ===================================================
+# Table Dependency Tracking
+# ===================================================
+
+KNOWN_TABLES = (
+    'RESEARCHERS', 'TELESCOPES', 'CELESTIALOBJECTS', 'RESEARCHERPHONES',
+    'OBJECTDISCOVERY', 'INSTRUMENTS', 'OBSERVATIONSESSIONS',
+    'RESEARCHERINSTRUMENTS', 'RESEARCHSTUDIES', 'OBSERVATIONS', 'OBSERVATION_LOG',
+    'TELESCOPE_UTILIZATION', 'TELESCOPE_UTILIZATION_DAILY',
+    'OBSERVATIONS_ARCHIVE', 'OBSERVATION_LOG_ARCHIVE', 'ARCHIVE_RUNS',
+)
+
+# Tables read / written by the stored routines in layer2.sql / layer3.sql (not visible in the SQL text)
+ROUTINE_READS = {
+    'get_telescope_utilization_hours': ('TELESCOPE_UTILIZATION',),
+    'update_researcher_total_time': ('OBSERVATIONSESSIONS', 'OBSERVATIONS'),
+    'archive_old_observations': ('OBSERVATIONSESSIONS', 'OBSERVATIONS', 'OBSERVATION_LOG', 'ARCHIVE_RUNS'),
+    'archive_observation_chunk': ('OBSERVATIONSESSIONS', 'OBSERVATIONS', 'OBSERVATION_LOG', 'ARCHIVE_RUNS'),
+    'refresh_last_observed_dates': ('OBSERVATIONSESSIONS', 'OBSERVATIONS'),
+    'apply_quality_rerate_chunk': ('OBSERVATIONS',),
+}
+ROUTINE_WRITES = {
+    'update_researcher_total_time': ('RESEARCHERS',),
+    'refresh_last_observed_dates': ('CELESTIALOBJECTS',),
+    'apply_quality_rerate_chunk': ('OBSERVATIONS', 'OBSERVATION_LOG'),
+    'rebuild_all_researcher_totals': ('RESEARCHERS',),
+    'rebuild_telescope_utilization': ('TELESCOPE_UTILIZATION', 'TELESCOPE_UTILIZATION_DAILY'),
+    'archive_old_observations': ('OBSERVATIONS', 'OBSERVATION_LOG', 'OBSERVATIONS_ARCHIVE',
+                                 'OBSERVATION_LOG_ARCHIVE', 'ARCHIVE_RUNS'),
+    'archive_observation_chunk': ('OBSERVATIONS', 'OBSERVATION_LOG', 'OBSERVATIONS_ARCHIVE',
+                                  'OBSERVATION_LOG_ARCHIVE', 'ARCHIVE_RUNS'),
+    # Table_Partitioning.sql: retiring partitions removes rows and rebuilds the summaries
+    'maintain_observation_partitions': ('OBSERVATIONSESSIONS', 'OBSERVATIONS', 'OBSERVATION_LOG', 'RESEARCHERS',
+                                        'TELESCOPE_UTILIZATION', 'TELESCOPE_UTILIZATION_DAILY'),
+}
+# Tables changed as a side effect of triggers on the key table (layer2.sql + layer3.sql)
+TRIGGER_WRITES = {
+    'OBSERVATIONS': ('CELESTIALOBJECTS', 'OBSERVATION_LOG', 'RESEARCHERS',
+                     'TELESCOPE_UTILIZATION', 'TELESCOPE_UTILIZATION_DAILY'),
+    'OBSERVATIONSESSIONS': ('RESEARCHERS', 'TELESCOPE_UTILIZATION', 'TELESCOPE_UTILIZATION_DAILY'),
+}
+
+_READ_RE = re.compile(r'\b(?:FROM|JOIN)\s+`?(\w+)`?', re.IGNORECASE)
+_WRITE_RE = re.compile(r'\b(?:INSERT\s+(?:IGNORE\s+)?INTO|UPDATE|DELETE\s+FROM|REPLACE\s+INTO)\s+`?(\w+)`?', re.IGNORECASE)
+_CALL_RE = re.compile(r'\b(\w+)\s*\(')
+
+
+def _routines_in(sql):
+    return {name.lower() for name in _CALL_RE.findall(sql)}
+
+
+def with_trigger_effects(tables):
+    """Add the tables that triggers modify when ``tables`` are written."""
+    tables = {t.upper() for t in tables}
+    for table in list(tables):
+        tables.update(TRIGGER_WRITES.get(table, ()))
+    return tables
+
+
+def tables_read(sql):
+    tables = {t.upper() for t in _READ_RE.findall(sql)}
+    for routine in _routines_in(sql):
+        tables.update(ROUTINE_READS.get(routine, ()))
+    return tables & set(KNOWN_TABLES)
+
+
+def tables_written(sql):
+    tables = {t.upper() for t in _WRITE_RE.findall(sql)}
+    for routine in _routines_in(sql):
+        tables.update(ROUTINE_WRITES.get(routine, ()))
+    return with_trigger_effects(tables) & set(KNOWN_TABLES)
+
+
+# ===================================================
+# Query Result Cache
+# ===================================================
+
+class QueryCache:
+    """LRU + TTL cache of read query results keyed on (SQL text, params).
+
+    Each entry remembers the tables it was computed from; writing to any of
+    those tables through the app drops the entry. A per-table version counter
+    stops a read that raced with a write from caching its (stale) result.
+    """
+
+    def __init__(self, max_entries=256, ttl_seconds=300.0):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._table_versions = {}
+        self._lock = threading.Lock()
+        self._metrics = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0, 'invalidations': 0}
+
+    @staticmethod
+    def make_key(sql, params):
+        return ' '.join(sql.split()), tuple(params) if params else ()
+
+    def table_versions(self, tables):
+        with self._lock:
+            return {t: self._table_versions.get(t, 0) for t in tables}
+
+    def get(self, sql, params=None):
+        """Return ``(hit, value)``."""
+        key = self.make_key(sql, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._metrics['misses'] += 1
+                return False, None
+            value, tables, stored_at = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self._metrics['expired'] += 1
+                self._metrics['misses'] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self._metrics['hits'] += 1
+            return True, value
+
+    def put(self, sql, params, value, tables, versions=None):
+        key = self.make_key(sql, params)
+        with self._lock:
+            if versions is not None and any(
+                self._table_versions.get(t, 0) != v for t, v in versions.items()
+            ):
+                return
+            self._entries[key] = (value, frozenset(tables), time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._metrics['evictions'] += 1
+
+    def invalidate_tables(self, tables):
+        tables = with_trigger_effects(tables)
+        if not tables:
+            return
+        with self._lock:
+            for table in tables:
+                self._table_versions[table] = self._table_versions.get(table, 0) + 1
+            stale = [k for k, (_, deps, _) in self._entries.items() if deps & tables]
+            for key in stale:
+                del self._entries[key]
+            self._metrics['invalidations'] += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._metrics)
+            lookups = stats['hits'] + stats['misses']
+            stats.update({
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hit_ratio': round(stats['hits'] / lookups, 3) if lookups else 0.0,
+            })
+        return stats
+
+
+_query_cache = None
+
+
+def get_query_cache():
+    """Return the process-wide query result cache."""
+    global _query_cache
+    if _query_cache is None:
+        with _pool_lock:
+            if _query_cache is None:
+                _query_cache = QueryCache(**CACHE_CONFIG)
+    return _query_cache
+
+
+# ===================================================
+# Prepared Statement Cache
+# ===================================================
+
+class StatementCache:
+    """Server-side prepared statements kept open per pooled connection.
+
+    mysql.connector only skips the re-prepare when a prepared cursor executes
+    the very same string object it executed last, so every statement text gets
+    its own cursor per connection and is always executed with the cached copy
+    of the text. A statement is parsed once per connection; later executions
+    send only the statement id and the binary parameters. Connections are held
+    weakly: a connection the pool closes or replaces takes its cursors with it.
+    """
+
+    def __init__(self, enabled=True, max_per_connection=64):
+        self.enabled = enabled
+        self.max_per_connection = max(1, int(max_per_connection))
+        self._connections = weakref.WeakKeyDictionary()   # conn -> OrderedDict(sql -> (sql, cursor))
+        self._lock = threading.Lock()
+        self._metrics = {'prepares': 0, 'reuses': 0, 'evictions': 0, 'discarded': 0}
+
+    def _checkout(self, conn, sql):
+        with self._lock:
+            statements = self._connections.get(conn)
+            if statements is None:
+                statements = self._connections[conn] = OrderedDict()
+            entry = statements.get(sql)
+            if entry is not None:
+                statements.move_to_end(sql)
+                self._metrics['reuses'] += 1
+                return entry
+            evicted = []
+            while len(statements) >= self.max_per_connection:
+                evicted.append(statements.popitem(last=False)[1][1])
+                self._metrics['evictions'] += 1
+            entry = statements[sql] = (sql, conn.cursor(prepared=True))
+            self._metrics['prepares'] += 1
+        for cursor in evicted:   # deallocates the server-side statement
+            cursor.close()
+        return entry
+
+    def _discard(self, conn, sql):
+        with self._lock:
+            entry = self._connections.get(conn, {}).pop(sql, None)
+            self._metrics['discarded'] += entry is not None
+        if entry is not None:
+            try:
+                entry[1].close()
+            except Error:
+                pass
+
+    @contextmanager
+    def execute(self, conn, sql, params=()):
+        """Execute ``sql`` on ``conn`` and yield the cursor holding its result.
+
+        The cursor stays open (and the statement prepared) after the block;
+        callers must read the result inside it and must not close the cursor.
+        """
+        if not self.enabled:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(sql, tuple(params))
+                yield cursor
+            finally:
+                cursor.close()
+            return
+        sql, cursor = self._checkout(conn, sql)
+        try:
+            cursor.execute(sql, tuple(params))
+            yield cursor
+        except Error:
+            # the statement may be gone with the session (KILL, reconnect); prepare it afresh next time
+            self._discard(conn, sql)
+            raise
+        finally:
+            try:
+                if conn.unread_result:   # a caller that stopped reading early
+                    conn.consume_results()
+            except Error:
+                pass
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._metrics)
+            stats.update({
+                'enabled': self.enabled,
+                'connections': len(self._connections),
+                'prepared': sum(len(s) for s in self._connections.values()),
+                'max_per_connection': self.max_per_connection,
+            })
+        return stats
+
+
+_statement_cache = None
+
+
+def get_statement_cache():
+    """Return the process-wide prepared statement cache."""
+    global _statement_cache
+    if _statement_cache is None:
+        with _pool_lock:
+            if _statement_cache is None:
+                _statement_cache = StatementCache(**STATEMENT_CONFIG)
+    return _statement_cache
+
+
+def has_trigger(pool, trigger_name):
+    """True if the trigger is installed in the current schema (checked once per process)."""
+    if trigger_name not in _trigger_cache:
+        with pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(
+                    "SELECT 1 FROM information_schema.TRIGGERS "
+                    "WHERE TRIGGER_SCHEMA = DATABASE() AND TRIGGER_NAME = %s",
+                    (trigger_name,)
+                )
+                _trigger_cache[trigger_name] = bool(cursor.fetchall())
+            finally:
+                cursor.close()
+    return _trigger_cache[trigger_name]
+
+
+def has_routine(pool, routine_name):
+    """True if the stored procedure/function is installed in the current schema (checked once per process)."""
+    if routine_name not in _routine_cache:
+        with pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(
+                    "SELECT 1 FROM information_schema.ROUTINES "
+                    "WHERE ROUTINE_SCHEMA = DATABASE() AND ROUTINE_NAME = %s",
+                    (routine_name,)
+                )
+                _routine_cache[routine_name] = bool(cursor.fetchall())
+            finally:
+                cursor.close()
+    return _routine_cache[routine_name]
+
+
+def incremental_totals_enabled(pool):
+    """Researcher totals are kept current by the layer3.sql triggers."""
+    return has_trigger(pool, 'trg_researcher_minutes_insert')
+
+
+def deferred_last_observed_enabled(pool):
+    """The layer3.sql LastObservedDate trigger can be suspended and the dates recomputed afterwards."""
+    return has_routine(pool, 'refresh_last_observed_dates')
+
+
+def batched_audit_enabled(pool):
+    """Bulk re-ratings can write their OBSERVATION_LOG rows in one statement per chunk (layer3.sql)."""
+    return has_routine(pool, 'apply_quality_rerate_chunk')
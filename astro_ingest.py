@@ -0,0 +1,388 @@
+"""Bulk observation ingestion (CSV / Parquet -> OBSERVATIONSESSIONS + OBSERVATIONS).
+
+With layer3.sql installed the per-row LastObservedDate trigger is suspended
+while chunks are inserted, and the touched objects' dates are recomputed in
+one set-based pass at the end of the import.
+
+Usage:
+    python astro_ingest.py nightly_run.csv [--chunk-size 1000] [--rejects rejects.csv]
+"""
+import argparse
+import csv
+import datetime
+import io
+import itertools
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+from mysql.connector import Error
+
+from astro_db import deferred_last_observed_enabled, get_pool, get_query_cache, incremental_totals_enabled
+from astro_metrics import get_query_metrics
+from astro_validation import PROBLEM_MESSAGES, validate_observations
+
+DEFAULT_CHUNK_SIZE = 1000
+
+# File column (as exported from the DB) -> entry key used by the app / validator
+COLUMN_MAP = {
+    "sessionid": "session_id",
+    "researcherid": "researcher_id",
+    "telescopeid": "telescope_id",
+    "date": "date",
+    "weathercondition": "weather",
+    "seeingcondition": "seeing",
+    "observationid": "obs_id",
+    "objectid": "object_id",
+    "durationminutes": "duration",
+    "notes": "notes",
+    "acquisitiontime": "acquisition_time",
+    "dataqualityrating": "quality",
+}
+REQUIRED_KEYS = ("session_id", "researcher_id", "telescope_id", "date", "obs_id", "object_id", "duration")
+
+SESSION_INSERT_SQL = (
+    "INSERT INTO OBSERVATIONSESSIONS (SessionID, Date, WeatherCondition, SeeingCondition, ResearcherID, TelescopeID) "
+    "VALUES (%s, %s, %s, %s, %s, %s)"
+)
+OBSERVATION_INSERT_SQL = (
+    "INSERT INTO OBSERVATIONS (ObservationID, SessionID, ObjectID, DurationMinutes, Notes, AcquisitionTime, DataQualityRating) "
+    "VALUES (%s, %s, %s, %s, %s, %s, %s)"
+)
+
+# problem flags from validate_observations that always reject the row
+REJECTING_FLAGS = ("researcher_missing", "tel_missing", "obj_missing", "obs_dup", "obs_batch_dup")
+
+
+# ===================================================
+# Reading
+# ===================================================
+
+def iter_source_rows(source, file_format=None, batch_size=DEFAULT_CHUNK_SIZE):
+    """Stream raw row dicts from a CSV/Parquet path or binary file object."""
+    name = source if isinstance(source, str) else getattr(source, "name", "")
+    file_format = (file_format or os.path.splitext(name)[1].lstrip(".") or "csv").lower()
+    if file_format == "parquet":
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet ingestion needs pyarrow: pip install pyarrow")
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=batch_size):
+            yield from batch.to_pylist()
+    elif file_format == "csv":
+        if isinstance(source, str):
+            with open(source, newline="", encoding="utf-8") as f:
+                yield from csv.DictReader(f)
+        else:
+            yield from csv.DictReader(io.TextIOWrapper(source, encoding="utf-8", newline=""))
+    else:
+        raise ValueError(f"Unsupported file format '{file_format}' (expected csv or parquet)")
+
+
+def _as_int(value):
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return int(str(value).strip())
+
+
+def _as_date(value):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.date.fromisoformat(str(value).strip())
+
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and value.strip() == "")
+
+
+def coerce_row(raw):
+    """Map a raw file row onto an entry dict; raises ValueError with a reason."""
+    entry = {}
+    for column, value in raw.items():
+        key = COLUMN_MAP.get(str(column).strip().lower().replace("_", ""), column)
+        entry[key] = None if _blank(value) else value
+    missing = [k for k in REQUIRED_KEYS if entry.get(k) is None]
+    if missing:
+        raise ValueError(f"missing required field(s): {', '.join(missing)}")
+    for key in ("session_id", "researcher_id", "telescope_id", "obs_id", "object_id", "duration"):
+        try:
+            entry[key] = _as_int(entry[key])
+        except ValueError:
+            raise ValueError(f"{key} is not an integer: {entry[key]!r}")
+    if entry["duration"] <= 0:
+        raise ValueError("DurationMinutes must be > 0")
+    if entry.get("quality") is not None:
+        entry["quality"] = _as_int(entry["quality"])
+        if not 1 <= entry["quality"] <= 5:
+            raise ValueError("DataQualityRating must be between 1 and 5")
+    try:
+        entry["date"] = _as_date(entry["date"])
+    except ValueError:
+        raise ValueError(f"date is not YYYY-MM-DD: {entry['date']!r}")
+    entry.setdefault("weather", None)
+    entry.setdefault("seeing", None)
+    entry.setdefault("notes", None)
+    entry.setdefault("acquisition_time", None)
+    entry.setdefault("quality", None)
+    return entry
+
+
+# ===================================================
+# Writing
+# ===================================================
+
+def _session_params(e):
+    return (e["session_id"], e["date"], e["weather"], e["seeing"], e["researcher_id"], e["telescope_id"])
+
+
+def _observation_params(e):
+    return (e["obs_id"], e["session_id"], e["object_id"], e["duration"], e["notes"], e["acquisition_time"], e["quality"])
+
+
+def _session_key(e):
+    return (e["researcher_id"], e["telescope_id"], e["date"])
+
+
+def _insert_chunk(conn, new_sessions, entries):
+    cursor = conn.cursor()
+    try:
+        with get_query_metrics().track("ingest_chunk", OBSERVATION_INSERT_SQL) as stat:
+            if new_sessions:
+                cursor.executemany(SESSION_INSERT_SQL, [_session_params(e) for e in new_sessions])
+            cursor.executemany(OBSERVATION_INSERT_SQL, [_observation_params(e) for e in entries])
+            conn.commit()
+            stat["rows"] = len(new_sessions) + len(entries)
+    finally:
+        cursor.close()
+
+
+def _insert_rows_individually(conn, new_sessions, entries, reject):
+    """Fallback after a failed chunk: isolate the bad rows, keep the good ones."""
+    pending_sessions = {e["session_id"]: e for e in new_sessions}
+    inserted, created = [], set()
+    for e in entries:
+        cursor = conn.cursor()
+        try:
+            session = pending_sessions.get(e["session_id"])
+            with get_query_metrics().track("ingest_row", OBSERVATION_INSERT_SQL):
+                if session is not None and e["session_id"] not in created:
+                    cursor.execute(SESSION_INSERT_SQL, _session_params(session))
+                cursor.execute(OBSERVATION_INSERT_SQL, _observation_params(e))
+                conn.commit()
+            if session is not None:
+                created.add(e["session_id"])
+            inserted.append(e)
+        except Error as err:
+            conn.rollback()
+            reject(e, str(err))
+        finally:
+            cursor.close()
+    return inserted, created
+
+
+@contextmanager
+def last_observed_deferred(conn, enabled=True):
+    """Suspend trg_update_last_observed_date for this connection only; always re-armed on exit."""
+    if not enabled:
+        yield
+        return
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SET @astro_defer_last_observed = 1")
+        yield
+    finally:
+        # pooled connections are reused: never hand one back with the trigger off
+        cursor.execute("SET @astro_defer_last_observed = NULL")
+        cursor.close()
+
+
+def refresh_last_observed_dates(pool, first_observation_id=None, last_observation_id=None):
+    """Set-based LastObservedDate pass over an ObservationID range (None = open ended); returns objects updated."""
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            with get_query_metrics().track("refresh_last_observed_dates") as stat:
+                cursor.execute("CALL refresh_last_observed_dates(%s, %s)", (first_observation_id, last_observation_id))
+                stat["rows"] = max(cursor.rowcount, 0)
+            conn.commit()
+        finally:
+            cursor.close()
+    if stat["rows"]:
+        get_query_cache().invalidate_tables({"CELESTIALOBJECTS"})
+    return stat["rows"]
+
+
+def refresh_researcher_totals(pool, researcher_ids):
+    """Recompute TotalObservationMinutes once per affected researcher."""
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            for rid in sorted(researcher_ids):
+                with get_query_metrics().track("update_researcher_total_time"):
+                    cursor.execute("CALL update_researcher_total_time(%s)", (rid,))
+            conn.commit()
+        finally:
+            cursor.close()
+
+
+def ingest_observations(pool, rows, chunk_size=DEFAULT_CHUNK_SIZE, progress=None, defer_last_observed=True):
+    """Validate and insert observation rows in chunks, one commit per chunk.
+
+    ``rows`` is any iterable of raw row dicts (see ``iter_source_rows``).
+    Returns a report dict with counts, throughput and a list of rejects
+    ``{"row": n, "obs_id": id, "reason": text}``. ``progress`` is an optional
+    callback receiving the running report after every chunk.
+    ``defer_last_observed=False`` keeps the per-row LastObservedDate trigger.
+    """
+    started = time.perf_counter()
+    report = {
+        "rows_read": 0, "inserted": 0, "sessions_created": 0, "rejected": 0,
+        "chunks": 0, "elapsed_s": 0.0, "rows_per_sec": 0.0, "rejects": [],
+    }
+    created_sessions = {}   # session_id -> (researcher, telescope, date) created by this run
+    affected_researchers = set()
+    inserted_ids = []       # (min, max) ObservationID per chunk, for the deferred LastObservedDate pass
+    defer_last_observed = defer_last_observed and deferred_last_observed_enabled(pool)
+
+    def reject(entry, reason, row_no=None):
+        report["rejected"] += 1
+        report["rejects"].append({
+            "row": row_no if row_no is not None else entry.get("_row"),
+            "obs_id": entry.get("obs_id"),
+            "reason": reason,
+        })
+
+    try:
+        numbered = enumerate(rows, start=1)
+        while True:
+            raw_chunk = list(itertools.islice(numbered, chunk_size))
+            if not raw_chunk:
+                break
+            report["rows_read"] += len(raw_chunk)
+
+            entries = []
+            for row_no, raw in raw_chunk:
+                try:
+                    entry = coerce_row(raw)
+                except ValueError as err:
+                    reject({"obs_id": raw.get("ObservationID")}, str(err), row_no)
+                    continue
+                entry["_row"] = row_no
+                entries.append(entry)
+
+            accepted, new_sessions = [], []
+            if entries:
+                for entry, checks in zip(entries, validate_observations(pool, entries)):
+                    failed = [flag for flag in REJECTING_FLAGS if checks[flag]]
+                    if failed:
+                        reject(entry, " ".join(PROBLEM_MESSAGES[flag].format(**entry) for flag in failed))
+                        continue
+                    sid = entry["session_id"]
+                    if sid in created_sessions:
+                        if created_sessions[sid] != _session_key(entry):
+                            reject(entry, f"SessionID {sid} conflicts with an earlier row (researcher/telescope/date differ).")
+                            continue
+                    elif checks["sess_dup"]:
+                        reject(entry, f"SessionID {sid} already exists.")
+                        continue
+                    else:
+                        created_sessions[sid] = _session_key(entry)
+                        new_sessions.append(entry)
+                    accepted.append(entry)
+
+            if accepted:
+                # recorded before inserting: rows committed before a failure mid-chunk still get reconciled
+                ids = [e["obs_id"] for e in accepted]
+                inserted_ids.append((min(ids), max(ids)))
+                affected_researchers.update(e["researcher_id"] for e in accepted)
+                with pool.connection() as conn, last_observed_deferred(conn, defer_last_observed):
+                    try:
+                        _insert_chunk(conn, new_sessions, accepted)
+                        inserted, created = accepted, {e["session_id"] for e in new_sessions}
+                    except Error:
+                        conn.rollback()
+                        inserted, created = _insert_rows_individually(conn, new_sessions, accepted, reject)
+                for e in new_sessions:
+                    if e["session_id"] not in created:
+                        created_sessions.pop(e["session_id"], None)
+                report["inserted"] += len(inserted)
+                report["sessions_created"] += len(created)
+
+            report["chunks"] += 1
+            report["elapsed_s"] = time.perf_counter() - started
+            report["rows_per_sec"] = report["rows_read"] / report["elapsed_s"] if report["elapsed_s"] else 0.0
+            if progress:
+                progress(report)
+    finally:
+        # committed chunks are reconciled even when a later chunk or the source fails
+        # (inserted_ids / affected_researchers also cover a chunk that failed part-way)
+        report["last_observed_updated"] = None
+        report["researchers_refreshed"] = 0
+        if inserted_ids:
+            get_query_cache().invalidate_tables({"OBSERVATIONSESSIONS", "OBSERVATIONS", "RESEARCHERS"})
+        if defer_last_observed and inserted_ids:
+            # one pass over the whole ID span; observations inside it that this run did not insert are harmless
+            report["last_observed_updated"] = refresh_last_observed_dates(
+                pool, min(lo for lo, _ in inserted_ids), max(hi for _, hi in inserted_ids))
+        # with the layer3.sql triggers the totals were already maintained row by row
+        if affected_researchers and not incremental_totals_enabled(pool):
+            refresh_researcher_totals(pool, affected_researchers)
+            report["researchers_refreshed"] = len(affected_researchers)
+
+    report["elapsed_s"] = time.perf_counter() - started
+    report["rows_per_sec"] = report["rows_read"] / report["elapsed_s"] if report["elapsed_s"] else 0.0
+    return report
+
+
+def write_rejects(rejects, path):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=["row", "obs_id", "reason"])
+        writer.writeheader()
+        writer.writerows(rejects)
+
+
+# ===================================================
+# CLI
+# ===================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk-load observations from a CSV or Parquet file.")
+    parser.add_argument("path", help="CSV or Parquet file with one observation per row")
+    parser.add_argument("--format", choices=["csv", "parquet"], help="override format detection by extension")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="rows per INSERT batch / commit")
+    parser.add_argument("--rejects", help="write rejected rows with reasons to this CSV file")
+    parser.add_argument("--per-row-last-observed", action="store_true",
+                        help="keep the LastObservedDate trigger on instead of one pass after the load")
+    args = parser.parse_args(argv)
+
+    def progress(r):
+        print(f"  chunk {r['chunks']}: {r['inserted']} inserted, {r['rejected']} rejected, "
+              f"{r['rows_per_sec']:.0f} rows/s", file=sys.stderr)
+
+    report = ingest_observations(
+        get_pool(), iter_source_rows(args.path, args.format, args.chunk_size),
+        chunk_size=args.chunk_size, progress=progress, defer_last_observed=not args.per_row_last_observed,
+    )
+    print(f"Read {report['rows_read']} rows in {report['elapsed_s']:.2f}s ({report['rows_per_sec']:.0f} rows/s): "
+          f"{report['inserted']} inserted, {report['sessions_created']} sessions created, "
+          f"{report['rejected']} rejected, {report['researchers_refreshed']} researcher totals refreshed.")
+    if report["last_observed_updated"] is not None:
+        print(f"LastObservedDate recomputed in one pass: {report['last_observed_updated']} objects updated.")
+    if args.rejects and report["rejects"]:
+        write_rejects(report["rejects"], args.rejects)
+        print(f"Rejects written to {args.rejects}")
+    elif report["rejects"]:
+        for r in report["rejects"][:20]:
+            print(f"  row {r['row']} (obs {r['obs_id']}): {r['reason']}")
+        if len(report["rejects"]) > 20:
+            print(f"  ... {len(report['rejects']) - 20} more (use --rejects FILE)")
+    return 0 if not report["rejected"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+"""Background execution of analytics queries, with server-side timeouts and cancellation.
+
+A job is any astro_service-style function ``fn(pool, *args)``. It runs on a
+worker thread with one pooled connection pinned to it, so independent jobs
+run concurrently on separate connections. Before the job starts, the session's
+``MAX_EXECUTION_TIME`` is set, so MySQL aborts any SELECT that runs too long.
+``cancel()`` issues ``KILL QUERY`` for the job's connection from a separate
+short-lived connection, which still works when the pool is exhausted.
+
+The Streamlit app keeps only job ids in ``st.session_state`` and polls
+``get()`` on each rerun; workers never touch Streamlit.
+"""
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import mysql.connector
+from mysql.connector import Error
+
+from astro_db import POOL_CONFIG, get_pool
+
+# --- Background Job Configuration (override with environment variables) ---
+JOB_CONFIG = {
+    # one connection stays free for the UI thread by default
+    'workers': int(os.environ.get('ASTRO_JOB_WORKERS', max(1, POOL_CONFIG['pool_size'] - 1))),
+    # server-side limit for each SELECT a job runs, in ms (0 = no limit)
+    'timeout_ms': int(os.environ.get('ASTRO_QUERY_TIMEOUT_MS', 30000)),
+    # finished jobs remembered for polling
+    'history': int(os.environ.get('ASTRO_JOB_HISTORY', 200)),
+}
+
+ACTIVE_STATES = ('queued', 'running')
+
+ER_QUERY_INTERRUPTED = 1317     # KILL QUERY
+ER_QUERY_TIMEOUT = 3024         # MAX_EXECUTION_TIME exceeded
+
+
+class _PinnedPool:
+    """Pool stand-in that hands the job's own connection to every checkout."""
+
+    def __init__(self, pool, conn):
+        self.db_config = pool.db_config
+        self._conn = conn
+
+    @contextmanager
+    def connection(self):
+        yield self._conn
+
+
+class QueryJobRunner:
+    """Thread-pool executor for query jobs; job state is kept here, keyed by job id."""
+
+    def __init__(self, pool, workers=4, timeout_ms=30000, history=200):
+        self.pool = pool
+        self.workers = max(1, int(workers))
+        self.timeout_ms = int(timeout_ms)
+        self.history = max(1, int(history))
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='astro-job')
+        self._jobs = OrderedDict()
+        self._futures = {}
+        # held while a KILL QUERY is in flight and while a job gives up its connection,
+        # so a kill never reaches a connection that is already back in the pool
+        self._kill_locks = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def submit(self, label, fn, *args, timeout_ms=None, **kwargs):
+        """Queue ``fn(pool, *args, **kwargs)``; returns the job id."""
+        job_id = next(self._ids)
+        job = {
+            'id': job_id, 'label': label, 'status': 'queued',
+            'timeout_ms': self.timeout_ms if timeout_ms is None else int(timeout_ms),
+            'submitted_at': time.time(), 'started_at': None, 'finished_at': None,
+            'connection_id': None, 'cancel_requested': False,
+            'result': None, 'error': None,
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            self._kill_locks[job_id] = threading.Lock()
+            self._trim()
+            self._futures[job_id] = self._executor.submit(self._run, job, fn, args, kwargs)
+        return job_id
+
+    def _trim(self):
+        finished = [jid for jid, j in self._jobs.items() if j['status'] not in ACTIVE_STATES]
+        for jid in finished[:max(0, len(self._jobs) - self.history)]:
+            del self._jobs[jid]
+            self._futures.pop(jid, None)
+            self._kill_locks.pop(jid, None)
+
+    def _set(self, job, **changes):
+        with self._lock:
+            job.update(changes)
+
+    def _run(self, job, fn, args, kwargs):
+        with self._lock:
+            kill_lock = self._kill_locks[job['id']]
+        if job['cancel_requested']:
+            self._set(job, status='cancelled', finished_at=time.time())
+            return
+        try:
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+                try:
+                    cursor.execute("SELECT CONNECTION_ID()")
+                    connection_id = cursor.fetchone()[0]
+                    cursor.execute("SET SESSION MAX_EXECUTION_TIME = %s", (job['timeout_ms'],))
+                finally:
+                    cursor.close()
+                self._set(job, status='running', started_at=time.time(), connection_id=connection_id)
+                if job['cancel_requested']:   # cancelled while the connection was being set up
+                    with kill_lock:
+                        self._set(job, status='cancelled', connection_id=None, finished_at=time.time())
+                    self._reset_session(conn)
+                    return
+                try:
+                    result = fn(_PinnedPool(self.pool, conn), *args, **kwargs)
+                finally:
+                    # waits for a kill already under way before the connection can be reused
+                    with kill_lock:
+                        self._set(job, connection_id=None)
+                    self._reset_session(conn)
+        except Error as e:
+            if job['cancel_requested'] or e.errno == ER_QUERY_INTERRUPTED:
+                status = 'cancelled'
+            elif e.errno == ER_QUERY_TIMEOUT:
+                status = 'timeout'
+            else:
+                status = 'failed'
+            self._set(job, status=status, error=e, finished_at=time.time())
+        except Exception as e:   # keep the worker alive; the UI shows the error
+            self._set(job, status='failed', error=e, finished_at=time.time())
+        else:
+            with self._lock:
+                # cancelled between two statements: nothing was running to kill
+                status = 'cancelled' if job['cancel_requested'] else 'done'
+                job.update(status=status, result=result if status == 'done' else None, finished_at=time.time())
+
+    @staticmethod
+    def _reset_session(conn):
+        """Hand the connection back with the server default timeout and nothing left unread."""
+        try:
+            if conn.unread_result:
+                conn.consume_results()
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SET SESSION MAX_EXECUTION_TIME = DEFAULT")
+            finally:
+                cursor.close()
+        except Error:
+            pass
+
+    def cancel(self, job_id):
+        """Stop a job: drop it if still queued, else KILL QUERY its running statement."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job['status'] not in ACTIVE_STATES:
+                return False
+            job['cancel_requested'] = True
+            future = self._futures.get(job_id)
+            kill_lock = self._kill_locks.get(job_id)
+        if future is not None and future.cancel():
+            self._set(job, status='cancelled', finished_at=time.time())
+            return True
+        if kill_lock is None:
+            return True
+        with kill_lock:
+            # read under the kill lock: once the job has released its connection this is None
+            with self._lock:
+                connection_id = job['connection_id']
+            if connection_id is not None:
+                kill_query(self.pool, connection_id)
+        return True
+
+    def get(self, job_id):
+        """Snapshot of one job (None if unknown or already forgotten)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def wait(self, job_ids, timeout=None):
+        """Block until the given jobs finish (or ``timeout`` seconds pass); returns their snapshots."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for job_id in job_ids:
+            with self._lock:
+                future = self._futures.get(job_id)
+            if future is None:
+                continue
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            try:
+                future.exception(timeout=remaining)
+            except Exception:   # TimeoutError / CancelledError: the snapshot says which
+                pass
+        return [self.get(job_id) for job_id in job_ids]
+
+    def stats(self):
+        with self._lock:
+            statuses = [j['status'] for j in self._jobs.values()]
+        stats = {status: statuses.count(status) for status in
+                 ('queued', 'running', 'done', 'failed', 'timeout', 'cancelled')}
+        stats.update({'workers': self.workers, 'timeout_ms': self.timeout_ms})
+        return stats
+
+
+def kill_query(pool, connection_id):
+    """Abort the statement running on ``connection_id`` (the connection itself stays open)."""
+    conn = mysql.connector.connect(**pool.db_config)
+    try:
+        cursor = conn.cursor()
+        try:
+            cursor.execute(f"KILL QUERY {int(connection_id)}")
+        finally:
+            cursor.close()
+    except Error as e:
+        if e.errno != 1094:   # unknown thread id: the statement already finished
+            raise
+    finally:
+        conn.close()
+
+
+_job_runner = None
+_job_runner_lock = threading.Lock()
+
+
+def get_job_runner():
+    """Return the process-wide background query runner."""
+    global _job_runner
+    if _job_runner is None:
+        with _job_runner_lock:
+            if _job_runner is None:
+                _job_runner = QueryJobRunner(get_pool(), **JOB_CONFIG)
+    return _job_runner
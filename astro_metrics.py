@@ -0,0 +1,188 @@
+"""Per-query latency, row and error metrics for every database call the app makes.
+
+Call sites wrap their statement in ``get_query_metrics().track(name, sql)``;
+the Performance tab reads ``summary()`` / ``slowest()`` and
+``prometheus_text()`` renders everything in the Prometheus text format.
+"""
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# --- Metrics Configuration (override with environment variables) ---
+METRICS_CONFIG = {
+    # latency samples kept per query for the percentiles
+    'samples_per_query': int(os.environ.get('ASTRO_METRICS_SAMPLES', 1000)),
+    # most recent statements kept for the "slowest recent" list
+    'recent_statements': int(os.environ.get('ASTRO_METRICS_RECENT', 500)),
+}
+# when set, the app rewrites this Prometheus text file after every rerun
+METRICS_FILE = os.environ.get('ASTRO_METRICS_FILE')
+
+# Histogram bucket upper bounds in seconds (Prometheus client defaults)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_VERB_RE = re.compile(r'^\s*(\w+)', re.IGNORECASE)
+_TABLE_RE = re.compile(r'\b(?:FROM|INTO|UPDATE|JOIN)\s+`?(\w+)`?', re.IGNORECASE)
+_ROUTINE_RE = re.compile(r'\b(\w+)\s*\(')
+
+
+def statement_name(sql):
+    """Fallback query name for unnamed statements, e.g. 'select_researchers', 'call_rebuild_all_researcher_totals'."""
+    verb_match = _VERB_RE.match(sql)
+    verb = verb_match.group(1).lower() if verb_match else 'sql'
+    target = _ROUTINE_RE.search(sql) if verb == 'call' else _TABLE_RE.search(sql)
+    if target is None and verb == 'select':
+        target = _ROUTINE_RE.search(sql)
+    return f"{verb}_{target.group(1).lower()}" if target else verb
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list (q in 0..100)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * q // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class QueryMetrics:
+    """Thread-safe latency histograms and counters keyed by query name."""
+
+    def __init__(self, samples_per_query=1000, recent_statements=500, buckets=LATENCY_BUCKETS):
+        self.samples_per_query = max(1, int(samples_per_query))
+        self.buckets = tuple(buckets)
+        self._queries = {}
+        self._recent = deque(maxlen=max(1, int(recent_statements)))
+        self._lock = threading.Lock()
+
+    def _new_query(self):
+        return {
+            'calls': 0, 'errors': 0, 'rows': 0, 'seconds': 0.0, 'max_seconds': 0.0,
+            'buckets': [0] * len(self.buckets),
+            'samples': deque(maxlen=self.samples_per_query),
+        }
+
+    def observe(self, name, seconds, rows=0, error=False, sql=None):
+        with self._lock:
+            stats = self._queries.get(name)
+            if stats is None:
+                stats = self._queries[name] = self._new_query()
+            stats['calls'] += 1
+            stats['errors'] += bool(error)
+            stats['rows'] += rows or 0
+            stats['seconds'] += seconds
+            stats['max_seconds'] = max(stats['max_seconds'], seconds)
+            stats['samples'].append(seconds)
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    stats['buckets'][i] += 1
+                    break
+            self._recent.append({
+                'query': name,
+                'ms': round(seconds * 1000, 3),
+                'rows': rows or 0,
+                'error': bool(error),
+                'at': time.strftime('%H:%M:%S'),
+                'sql': ' '.join(sql.split())[:300] if sql else '',
+            })
+
+    @contextmanager
+    def track(self, name, sql=None):
+        """Time the enclosed statement; set ``stat['rows']`` inside the block.
+
+        Exceptions are counted as errors for ``name`` and re-raised.
+        """
+        name = name or (statement_name(sql) if sql else 'sql')
+        stat = {'rows': 0}
+        started = time.perf_counter()
+        try:
+            yield stat
+        except Exception:
+            self.observe(name, time.perf_counter() - started, stat['rows'], True, sql)
+            raise
+        self.observe(name, time.perf_counter() - started, stat['rows'], False, sql)
+
+    def summary(self):
+        """One dict per query: calls, errors, rows and latency percentiles in ms."""
+        with self._lock:
+            snapshot = {name: (dict(s), sorted(s['samples'])) for name, s in self._queries.items()}
+        report = []
+        for name, (stats, samples) in sorted(snapshot.items()):
+            report.append({
+                'query': name,
+                'calls': stats['calls'],
+                'errors': stats['errors'],
+                'rows': stats['rows'],
+                'avg_ms': round(stats['seconds'] / stats['calls'] * 1000, 3),
+                'p50_ms': round(percentile(samples, 50) * 1000, 3),
+                'p95_ms': round(percentile(samples, 95) * 1000, 3),
+                'p99_ms': round(percentile(samples, 99) * 1000, 3),
+                'max_ms': round(stats['max_seconds'] * 1000, 3),
+            })
+        return report
+
+    def slowest(self, limit=20):
+        """Slowest statements among the most recent ones, slowest first."""
+        with self._lock:
+            recent = list(self._recent)
+        return sorted(recent, key=lambda r: r['ms'], reverse=True)[:limit]
+
+    def reset(self):
+        with self._lock:
+            self._queries.clear()
+            self._recent.clear()
+
+    def prometheus_text(self, prefix='astro_query'):
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            snapshot = {name: dict(s, buckets=list(s['buckets'])) for name, s in self._queries.items()}
+        lines = [
+            f"# HELP {prefix}_duration_seconds Latency of named database queries.",
+            f"# TYPE {prefix}_duration_seconds histogram",
+        ]
+        for name, stats in sorted(snapshot.items()):
+            label = f'query="{_label(name)}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets, stats['buckets']):
+                cumulative += count
+                lines.append(f'{prefix}_duration_seconds_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f'{prefix}_duration_seconds_bucket{{{label},le="+Inf"}} {stats["calls"]}')
+            lines.append(f"{prefix}_duration_seconds_sum{{{label}}} {stats['seconds']:.6f}")
+            lines.append(f"{prefix}_duration_seconds_count{{{label}}} {stats['calls']}")
+        for metric, key, help_text in (
+            ('rows_total', 'rows', 'Rows returned or affected by named database queries.'),
+            ('errors_total', 'errors', 'Failed executions of named database queries.'),
+        ):
+            lines.append(f"# HELP {prefix}_{metric} {help_text}")
+            lines.append(f"# TYPE {prefix}_{metric} counter")
+            for name, stats in sorted(snapshot.items()):
+                lines.append(f'{prefix}_{metric}{{query="{_label(name)}"}} {stats[key]}')
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        """Write the text format atomically (safe for node_exporter's textfile collector)."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+        return path
+
+
+_query_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_query_metrics():
+    """Return the process-wide query metrics registry."""
+    global _query_metrics
+    if _query_metrics is None:
+        with _metrics_lock:
+            if _query_metrics is None:
+                _query_metrics = QueryMetrics(**METRICS_CONFIG)
+    return _query_metrics
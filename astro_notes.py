@@ -0,0 +1,137 @@
+"""Ranked full-text search over OBSERVATIONS.Notes.
+
+layer3.sql adds the FULLTEXT index ``ft_observations_notes``. A search is either
+natural-language (free text, ranked by InnoDB's relevance score) or boolean
+(``+required -excluded "exact phrase" prefix*``). It can be narrowed by object,
+telescope and session date range. Pages are keyed by (Relevance, ObservationID)
+like astro_paging's keyset views, so Next/Prev read only one page. The score of a
+row does not change between requests as long as the index does not.
+
+The partitioned schema (Table_Partitioning.sql) cannot carry a FULLTEXT index,
+since MySQL does not support FULLTEXT on partitioned tables. There the same calls
+fall back to a LIKE scan, where every word of the query must appear and results
+are unranked. Pages are then ordered by ObservationID and the result says
+``"ranked": False``.
+"""
+import re
+
+from astro_db import get_statement_cache
+from astro_metrics import get_query_metrics
+from astro_paging import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+
+NOTES_FULLTEXT_INDEX = "ft_observations_notes"
+SEARCH_MODES = {"natural": "IN NATURAL LANGUAGE MODE", "boolean": "IN BOOLEAN MODE"}
+# what bench cases notes_search_* are checked against (median ms per page)
+LATENCY_TARGET_MS = 100
+
+_WORD_RE = re.compile(r'\w+')
+
+_MATCH = "MATCH(O.Notes) AGAINST (%s {mode})"
+
+NOTES_SEARCH_SQL = """
+SELECT O.ObservationID, {relevance} AS Relevance, CO.ObjectName, OS.Date, T.Name AS TelescopeName, O.Notes
+FROM OBSERVATIONS AS O
+JOIN OBSERVATIONSESSIONS AS OS ON O.SessionID = OS.SessionID
+JOIN TELESCOPES AS T ON OS.TelescopeID = T.TelescopeID
+JOIN CELESTIALOBJECTS AS CO ON O.ObjectID = CO.ObjectID
+WHERE {search}
+  AND (%s IS NULL OR O.ObjectID = %s)
+  AND (%s IS NULL OR OS.TelescopeID = %s)
+  AND (%s IS NULL OR OS.Date >= %s)
+  AND (%s IS NULL OR OS.Date <= %s)
+  {keyset}
+ORDER BY Relevance {order}, O.ObservationID {id_order}
+LIMIT %s
+"""
+
+_fulltext_available = {}
+
+
+def fulltext_available(pool):
+    """True if OBSERVATIONS has the notes FULLTEXT index (checked once per process)."""
+    if "notes" not in _fulltext_available:
+        with pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(
+                    "SELECT 1 FROM information_schema.STATISTICS "
+                    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'OBSERVATIONS' AND INDEX_NAME = %s",
+                    (NOTES_FULLTEXT_INDEX,)
+                )
+                _fulltext_available["notes"] = bool(cursor.fetchall())
+            finally:
+                cursor.close()
+    return _fulltext_available["notes"]
+
+
+def notes_query(text, mode="natural", object_id=None, telescope_id=None, date_from=None, date_to=None,
+                after=None, before=None, page_size=DEFAULT_PAGE_SIZE, fulltext=True):
+    """(sql, params) for one page; ``after`` / ``before`` are the (relevance, id) keys of the last / first row shown."""
+    text = (text or "").strip()
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode '{mode}' (expected {' or '.join(SEARCH_MODES)})")
+    words = _WORD_RE.findall(text)
+    if not words:
+        raise ValueError("Enter at least one word to search the notes for")
+    forward = before is None
+    key = after if forward else before
+
+    if fulltext:
+        match = _MATCH.format(mode=SEARCH_MODES[mode])
+        relevance, relevance_params = match, [text]
+        search, search_params = match, [text]
+        keyset, keyset_params = "", []
+        if key is not None:
+            # best first: the next page has a lower score, or the same score and a higher ID
+            worse, later = ("<", ">") if forward else (">", "<")
+            keyset = f"AND ({match} {worse} %s OR ({match} = %s AND O.ObservationID {later} %s))"
+            keyset_params = [text, key[0], text, key[0], key[1]]
+    else:
+        relevance, relevance_params = "0", []
+        search = " AND ".join("O.Notes LIKE %s" for _ in words)
+        search_params = [f"%{w}%" for w in words]
+        keyset, keyset_params = "", []
+        if key is not None:
+            keyset = f"AND O.ObservationID {'>' if forward else '<'} %s"
+            keyset_params = [key[1]]
+
+    sql = NOTES_SEARCH_SQL.format(
+        relevance=relevance, search=search, keyset=keyset,
+        order="DESC" if forward else "ASC", id_order="ASC" if forward else "DESC",
+    )
+    page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+    params = [*relevance_params, *search_params,
+              object_id, object_id, telescope_id, telescope_id, date_from, date_from, date_to, date_to,
+              *keyset_params, page_size + 1]
+    return sql, params
+
+
+def search_notes_page(pool, text, mode="natural", object_id=None, telescope_id=None, date_from=None, date_to=None,
+                      after=None, before=None, page_size=DEFAULT_PAGE_SIZE):
+    """One page of matching observations, best match first.
+
+    Returns the same dict as astro_paging.fetch_page (columns, rows, first_key,
+    last_key, has_next, has_prev) plus ``ranked``; keys are (Relevance, ObservationID).
+    """
+    fulltext = fulltext_available(pool)
+    page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+    sql, params = notes_query(text, mode, object_id, telescope_id, date_from, date_to, after, before, page_size, fulltext)
+    with pool.connection() as conn:
+        with get_query_metrics().track(f"notes_search_{mode}" if fulltext else "notes_search_scan", sql) as stat:
+            with get_statement_cache().execute(conn, sql, params) as cursor:
+                rows = cursor.fetchall()
+                columns = [c[0] for c in cursor.description]
+            stat["rows"] = len(rows)
+    more = len(rows) > page_size
+    rows = list(rows[:page_size])
+    if before is not None:
+        rows.reverse()
+    return {
+        "columns": columns,
+        "rows": rows,
+        "first_key": (rows[0][1], rows[0][0]) if rows else None,
+        "last_key": (rows[-1][1], rows[-1][0]) if rows else None,
+        "has_next": more if before is None else True,
+        "has_prev": (after is not None) if before is None else more,
+        "ranked": fulltext,
+    }
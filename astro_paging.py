@@ -0,0 +1,233 @@
+"""Keyset-paginated views and streaming exports for large query results.
+
+Usage:
+    python astro_paging.py seeing_join --param Good --out seeing_good.parquet
+    python astro_paging.py audit_log --param "2025-01-01 00:00:00" --param "2025-12-31 23:59:59" --out audit.csv
+"""
+import argparse
+import csv
+import os
+import sys
+
+from astro_db import get_pool, get_statement_cache
+from astro_metrics import get_query_metrics
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000          # memory ceiling for one rendered page
+DEFAULT_BLOCK_SIZE = 5000     # rows held in memory at once while exporting
+
+
+class KeysetQuery:
+    """A SELECT that can be paged by a unique, indexed key column.
+
+    ``sql`` must contain three placeholders filled in per request:
+    ``{keyset}`` (an ``AND key > %s``-style condition or nothing),
+    ``{order}`` (ASC/DESC) and ``{limit}`` (``LIMIT %s`` or nothing).
+    ``key_index`` is the position of the key column in the result rows.
+    For a key made of several columns (e.g. a timestamp plus an ID to break
+    ties), pass tuples for both; page keys are then tuples too, and the SQL
+    must apply ``{order}`` to every ORDER BY column.
+    """
+
+    def __init__(self, name, sql, key_column, key_index=0, descending=False):
+        self.name = name
+        self.sql = sql
+        self.key_column = key_column
+        self.key_index = key_index
+        self.descending = descending
+
+    def render(self, after=None, before=None, limit=True):
+        """SQL + extra params for the page after/before the given key."""
+        forward = before is None
+        # a descending view walks the key downwards when moving "forward"
+        ascending = forward != self.descending
+        extra = []
+        keyset = ""
+        if after is not None or before is not None:
+            op = ">" if ascending else "<"
+            key = after if forward else before
+            if isinstance(self.key_column, tuple):
+                # (a, b) > (x, y)  ==>  a > x OR (a = x AND b > y), which MySQL can range-scan
+                terms = []
+                for i, column in enumerate(self.key_column):
+                    terms.append(" AND ".join([f"{c} = %s" for c in self.key_column[:i]] + [f"{column} {op} %s"]))
+                    extra.extend(key[:i + 1])
+                keyset = "AND (" + " OR ".join(f"({t})" for t in terms) + ")"
+            else:
+                keyset = f"AND {self.key_column} {op} %s"
+                extra.append(key)
+        sql = self.sql.format(
+            keyset=keyset,
+            order="ASC" if ascending else "DESC",
+            limit="LIMIT %s" if limit else "",
+        )
+        return sql, extra
+
+    def full_sql(self):
+        return self.sql.format(keyset="", order="DESC" if self.descending else "ASC", limit="")
+
+
+def fetch_page(pool, query, params=(), after=None, before=None, page_size=DEFAULT_PAGE_SIZE):
+    """Fetch one page of ``query``; pass the previous page's last/first key as after/before.
+
+    Returns a dict with columns, rows (in display order), first_key, last_key,
+    has_next and has_prev. Only ``page_size + 1`` rows are ever read. Each
+    rendered variant (first page, after, before) stays prepared per connection.
+    """
+    page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+    sql, extra = query.render(after=after, before=before)
+    with pool.connection() as conn:
+        with get_query_metrics().track(query.name, sql) as stat:
+            with get_statement_cache().execute(conn, sql, tuple(params) + tuple(extra) + (page_size + 1,)) as cursor:
+                rows = cursor.fetchall()
+                columns = [c[0] for c in cursor.description]
+            stat["rows"] = len(rows)
+    return page_from_rows(query, columns, rows, page_size, after, before)
+
+
+def page_from_rows(query, columns, rows, page_size, after=None, before=None):
+    """Turn the ``page_size + 1`` rows read for a rendered page into fetch_page's result dict."""
+    more = len(rows) > page_size
+    rows = list(rows[:page_size])
+    if before is not None:
+        rows.reverse()
+    if isinstance(query.key_index, tuple):
+        first_key = tuple(rows[0][i] for i in query.key_index) if rows else None
+        last_key = tuple(rows[-1][i] for i in query.key_index) if rows else None
+    else:
+        first_key = rows[0][query.key_index] if rows else None
+        last_key = rows[-1][query.key_index] if rows else None
+    return {
+        "columns": columns,
+        "rows": rows,
+        "first_key": first_key,
+        "last_key": last_key,
+        # going backwards, "more" means there are still earlier pages
+        "has_next": more if before is None else True,
+        "has_prev": (after is not None) if before is None else more,
+    }
+
+
+def stream_rows(pool, sql, params=(), block_size=DEFAULT_BLOCK_SIZE, name="export"):
+    """Yield (columns, rows_block) pairs from an unbuffered cursor via fetchmany.
+
+    The server streams the result, so at most ``block_size`` rows are held in
+    client memory no matter how large the result is. The recorded latency is
+    the time to first row; ``name + "_stream"`` covers the whole read.
+    """
+    metrics = get_query_metrics()
+    with pool.connection() as conn:
+        cursor = conn.cursor(buffered=False)
+        try:
+            with metrics.track(name, sql):
+                cursor.execute(sql, tuple(params))
+            columns = [c[0] for c in cursor.description]
+            with metrics.track(f"{name}_stream", sql) as stat:
+                while True:
+                    rows = cursor.fetchmany(block_size)
+                    if not rows:
+                        break
+                    stat["rows"] += len(rows)
+                    yield columns, rows
+        finally:
+            # an abandoned generator leaves unread rows on the wire; drain them
+            # so the connection goes back to the pool in a usable state
+            if conn.unread_result:
+                conn.consume_results()
+            cursor.close()
+
+
+def export_rows(pool, sql, params, out, file_format=None, block_size=DEFAULT_BLOCK_SIZE, name="export"):
+    """Stream a query result into a CSV or Parquet file; returns the row count."""
+    file_format = (file_format or os.path.splitext(out)[1].lstrip(".") or "csv").lower()
+    written = 0
+    if file_format == "parquet":
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet export needs pyarrow: pip install pyarrow")
+        writer = None
+        try:
+            for columns, rows in stream_rows(pool, sql, params, block_size, name):
+                table = pa.Table.from_pylist([dict(zip(columns, r)) for r in rows])
+                if writer is None:
+                    writer = pq.ParquetWriter(out, table.schema)
+                writer.write_table(table.cast(writer.schema))
+                written += len(rows)
+        finally:
+            if writer is not None:
+                writer.close()
+    elif file_format == "csv":
+        with open(out, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            header_written = False
+            for columns, rows in stream_rows(pool, sql, params, block_size, name):
+                if not header_written:
+                    writer.writerow(columns)
+                    header_written = True
+                writer.writerows(rows)
+                written += len(rows)
+    else:
+        raise ValueError(f"Unsupported export format '{file_format}' (expected csv or parquet)")
+    return written
+
+
+# ===================================================
+# Paged views used by the app
+# ===================================================
+
+SEEING_JOIN_PAGED = KeysetQuery(
+    "seeing_join",
+    """
+SELECT O.ObservationID, CO.ObjectName, OS.Date, T.Name AS TelescopeName, OS.SeeingCondition
+FROM OBSERVATIONS AS O
+JOIN OBSERVATIONSESSIONS AS OS ON O.SessionID = OS.SessionID
+JOIN TELESCOPES AS T ON OS.TelescopeID = T.TelescopeID
+JOIN CELESTIALOBJECTS AS CO ON O.ObjectID = CO.ObjectID
+WHERE OS.SeeingCondition = %s {keyset}
+ORDER BY O.ObservationID {order}
+{limit}
+""",
+    key_column="O.ObservationID",
+)
+
+# Whole DATETIME range, for an audit-log time filter left open at either end
+AUDIT_LOG_OPEN_RANGE = ("1000-01-01 00:00:00", "9999-12-31 23:59:59")
+
+# Params: (since, until), both inclusive. Paged on (ChangeTimestamp, LogID) so each
+# page is one range read of idx_log_timestamp (layer3.sql), however old the range.
+AUDIT_LOG_PAGED = KeysetQuery(
+    "audit_log",
+    """
+SELECT LogID, ObservationID, ChangeType, OldDataQuality, ChangeTimestamp
+FROM OBSERVATION_LOG
+WHERE ChangeTimestamp BETWEEN %s AND %s {keyset}
+ORDER BY ChangeTimestamp {order}, LogID {order}
+{limit}
+""",
+    key_column=("ChangeTimestamp", "LogID"),
+    key_index=(4, 0),
+    descending=True,
+)
+
+PAGED_VIEWS = {q.name: q for q in (SEEING_JOIN_PAGED, AUDIT_LOG_PAGED)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream a large app view to CSV/Parquet without loading it into memory.")
+    parser.add_argument("view", choices=sorted(PAGED_VIEWS))
+    parser.add_argument("--param", action="append", default=[], help="query parameter (repeat in order)")
+    parser.add_argument("--out", required=True, help="output file (.csv or .parquet)")
+    parser.add_argument("--block-size", type=int, default=DEFAULT_BLOCK_SIZE)
+    args = parser.parse_args(argv)
+
+    query = PAGED_VIEWS[args.view]
+    count = export_rows(get_pool(), query.full_sql(), args.param, args.out, block_size=args.block_size,
+                        name=f"{query.name}_export")
+    print(f"Wrote {count} rows to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
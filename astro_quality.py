@@ -0,0 +1,374 @@
+"""Bulk data-quality re-rating with batched audit logging (see layer3.sql).
+
+A re-rating comes from a file of (ObservationID, DataQualityRating) rows (CSV or
+Parquet, e.g. the output of a calibration run) or from a rule such as "every
+observation from a session with Poor seeing, one step down". It is applied one
+chunk at a time:
+
+1. the chunk's new ratings are staged in a per-connection temporary table
+   (one multi-row INSERT, or one INSERT ... SELECT for a rule);
+2. apply_quality_rerate_chunk writes the audit rows for every rating that
+   actually changes with one INSERT ... SELECT into OBSERVATION_LOG, then
+   applies the ratings with one UPDATE ... JOIN, with the per-row audit trigger
+   switched off for that statement only;
+3. the chunk commits.
+
+The audit rows are the same ones trg_log_data_quality_update writes
+(ObservationID, 'UPDATE', old rating). Without layer3.sql the procedure is
+missing; the UPDATE ... JOIN then runs on its own and the trigger logs each row.
+Both compare ratings with "<>" like the trigger, so unrated (NULL) observations
+are left as they are and every change counted has its audit row.
+
+Usage:
+    python astro_quality.py file ratings.csv [--chunk-size 1000]
+    python astro_quality.py rule --seeing Poor --adjust -1 [--dry-run]
+    python astro_quality.py rule --telescope 103 --date-from 2025-09-01 --rating 2
+"""
+import argparse
+import sys
+import time
+
+from mysql.connector import Error
+
+from astro_db import ROUTINE_WRITES, batched_audit_enabled, get_pool, get_query_cache, with_trigger_effects
+from astro_ingest import COLUMN_MAP, _as_int, _blank, iter_source_rows
+from astro_metrics import get_query_metrics
+
+DEFAULT_CHUNK_SIZE = 1000
+# the rating scale the app offers (Tab 1 / Tab 4)
+RATING_MIN, RATING_MAX = 1, 5
+
+STAGE_TABLE = "quality_rerate_chunk"
+STAGE_CREATE_SQL = (
+    f"CREATE TEMPORARY TABLE IF NOT EXISTS {STAGE_TABLE} "
+    "(ObservationID INT PRIMARY KEY, NewRating INT) ENGINE = MEMORY"
+)
+_STAGE_CLEAR_SQL = f"DELETE FROM {STAGE_TABLE}"
+STAGE_DROP_SQL = f"DROP TEMPORARY TABLE IF EXISTS {STAGE_TABLE}"
+STAGE_ROWS_SQL = f"INSERT INTO {STAGE_TABLE} (ObservationID, NewRating) VALUES (%s, %s)"
+_STAGE_EXTENT_SQL = f"SELECT COUNT(*), MAX(ObservationID) FROM {STAGE_TABLE}"
+_STAGE_UNKNOWN_SQL = f"""
+SELECT C.ObservationID
+FROM {STAGE_TABLE} AS C
+LEFT JOIN OBSERVATIONS AS O ON O.ObservationID = C.ObservationID
+WHERE O.ObservationID IS NULL
+"""
+# What the procedure does when layer3.sql is not installed; the layer2.sql trigger logs each row
+_APPLY_WITH_TRIGGER_SQL = f"""
+UPDATE OBSERVATIONS AS O
+JOIN {STAGE_TABLE} AS C ON C.ObservationID = O.ObservationID
+SET O.DataQualityRating = C.NewRating
+WHERE O.DataQualityRating <> C.NewRating
+"""
+
+# Rule filters: name -> (condition, needs the CELESTIALOBJECTS join)
+RULE_FILTERS = {
+    "seeing": ("OS.SeeingCondition = %s", False),
+    "weather": ("OS.WeatherCondition = %s", False),
+    "telescope_id": ("OS.TelescopeID = %s", False),
+    "researcher_id": ("OS.ResearcherID = %s", False),
+    "date_from": ("OS.Date >= %s", False),
+    "date_to": ("OS.Date <= %s", False),
+    "object_type": ("CO.ObjectType = %s", True),
+    "min_rating": ("O.DataQualityRating >= %s", False),
+    "max_rating": ("O.DataQualityRating <= %s", False),
+}
+
+RULE_SQL = """
+SELECT O.ObservationID, {new_rating} AS NewRating
+FROM OBSERVATIONS AS O
+JOIN OBSERVATIONSESSIONS AS OS ON O.SessionID = OS.SessionID{object_join}
+WHERE O.ObservationID > %s{filters}
+ORDER BY O.ObservationID
+LIMIT %s
+"""
+
+RULE_PREVIEW_SQL = """
+SELECT COUNT(*), COALESCE(SUM(O.DataQualityRating <> {new_rating}), 0)
+FROM OBSERVATIONS AS O
+JOIN OBSERVATIONSESSIONS AS OS ON O.SessionID = OS.SessionID{object_join}
+WHERE 1 = 1{filters}
+"""
+
+
+def _check_rating(rating):
+    if not RATING_MIN <= rating <= RATING_MAX:
+        raise ValueError(f"DataQualityRating must be between {RATING_MIN} and {RATING_MAX}")
+    return rating
+
+
+def coerce_rating_row(raw):
+    """(obs_id, rating) from a raw file row (same header spellings as astro_ingest); raises ValueError with a reason."""
+    entry = {COLUMN_MAP.get(str(column).strip().lower().replace("_", ""), column): value for column, value in raw.items()}
+    missing = [k for k in ("obs_id", "quality") if _blank(entry.get(k))]
+    if missing:
+        raise ValueError(f"missing required field(s): {', '.join(missing)}")
+    values = []
+    for key in ("obs_id", "quality"):
+        try:
+            values.append(_as_int(entry[key]))
+        except ValueError:
+            raise ValueError(f"{key} is not an integer: {entry[key]!r}")
+    return values[0], _check_rating(values[1])
+
+
+def _rule_parts(rating, adjust, filters):
+    """(new_rating expr, its params, object join, filter SQL, filter params) for a rule."""
+    if (rating is None) == (adjust is None):
+        raise ValueError("Give exactly one of a new rating or an adjustment")
+    unknown = set(filters) - set(RULE_FILTERS)
+    if unknown:
+        raise ValueError(f"Unknown rule filter(s): {', '.join(sorted(unknown))}")
+    if rating is not None:
+        new_rating, rating_params = "%s", [_check_rating(int(rating))]
+    else:
+        # unrated observations stay unrated: NULL + n is NULL, which counts as unchanged
+        new_rating = f"LEAST(GREATEST(O.DataQualityRating + %s, {RATING_MIN}), {RATING_MAX})"
+        rating_params = [int(adjust)]
+    conditions, params, needs_object = [], [], False
+    for name, value in filters.items():
+        if value is None:
+            continue
+        condition, joins_object = RULE_FILTERS[name]
+        conditions.append(f"\n  AND {condition}")
+        params.append(value)
+        needs_object = needs_object or joins_object
+    object_join = "\nJOIN CELESTIALOBJECTS AS CO ON O.ObjectID = CO.ObjectID" if needs_object else ""
+    return new_rating, rating_params, object_join, "".join(conditions), params
+
+
+def rule_query(rating=None, adjust=None, after_id=0, chunk_size=DEFAULT_CHUNK_SIZE, **filters):
+    """(sql, params) selecting the next chunk of (ObservationID, NewRating) a rule re-rates.
+
+    ``rating`` sets an absolute rating, ``adjust`` moves the current one by that
+    many steps (kept within RATING_MIN..RATING_MAX). ``filters`` are RULE_FILTERS
+    names; None values are ignored.
+    """
+    new_rating, rating_params, object_join, conditions, params = _rule_parts(rating, adjust, filters)
+    sql = RULE_SQL.format(new_rating=new_rating, object_join=object_join, filters=conditions)
+    return sql, [*rating_params, after_id, *params, int(chunk_size)]
+
+
+def rerate_preview(pool, rating=None, adjust=None, **filters):
+    """How many observations a rule selects and how many of those it would actually change."""
+    new_rating, rating_params, object_join, conditions, params = _rule_parts(rating, adjust, filters)
+    sql = RULE_PREVIEW_SQL.format(new_rating=new_rating, object_join=object_join, filters=conditions)
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            with get_query_metrics().track("rerate_preview", sql):
+                cursor.execute(sql, (*rating_params, *params))
+                matched, changes = cursor.fetchone()
+        finally:
+            cursor.close()
+    return {"matched": int(matched), "would_change": int(changes)}
+
+
+# ===================================================
+# Chunked apply
+# ===================================================
+
+def _apply_staged(cursor, batched):
+    """Apply the staged chunk; returns how many ratings changed (= audit rows written)."""
+    if batched:
+        return cursor.callproc("apply_quality_rerate_chunk", (0,))[0] or 0
+    cursor.execute(_APPLY_WITH_TRIGGER_SQL)
+    return max(cursor.rowcount, 0)
+
+
+def _new_report(batched):
+    return {
+        "audit": "batched" if batched else "per-row trigger",
+        "staged": 0, "changed": 0, "unchanged": 0, "rejected": 0, "rejects": [],
+        "chunks": 0, "elapsed_s": 0.0, "rows_per_sec": 0.0,
+    }
+
+
+def _finish_chunk(report, staged, changed, started, progress):
+    report["staged"] += staged
+    report["changed"] += changed
+    report["unchanged"] += staged - changed
+    report["chunks"] += 1
+    report["elapsed_s"] = time.perf_counter() - started
+    report["rows_per_sec"] = report["staged"] / report["elapsed_s"] if report["elapsed_s"] else 0.0
+    if progress:
+        progress(report)
+
+
+def _reject(report, row_number, observation_id, reason):
+    report["rejected"] += 1
+    report["rejects"].append({"row": row_number, "obs_id": observation_id, "reason": reason})
+
+
+def _run_chunks(pool, report, next_chunk):
+    """Stage, apply and commit chunks on one connection until ``next_chunk`` returns None.
+
+    ``next_chunk(cursor)`` stages the next chunk and returns its row count. A
+    failed chunk is rolled back and raised; the chunks before it stay committed.
+    """
+    batched = report["audit"] == "batched"
+    try:
+        with pool.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(STAGE_CREATE_SQL)
+                while True:
+                    try:
+                        cursor.execute(_STAGE_CLEAR_SQL)
+                        staged = next_chunk(cursor)
+                        if staged is None:
+                            break
+                        with get_query_metrics().track("rerate_chunk", "CALL apply_quality_rerate_chunk()") as stat:
+                            changed = _apply_staged(cursor, batched) if staged else 0
+                            stat["rows"] = changed
+                        conn.commit()
+                    except Error:
+                        conn.rollback()
+                        raise
+                    yield staged, changed
+            finally:
+                # pooled connections are reused: never hand one back with the staging table
+                try:
+                    cursor.execute(STAGE_DROP_SQL)
+                except Error:
+                    pass  # a dead connection took the table with it; don't mask the original error
+                cursor.close()
+    finally:
+        if report["changed"]:
+            get_query_cache().invalidate_tables(with_trigger_effects(ROUTINE_WRITES["apply_quality_rerate_chunk"]))
+
+
+def rerate_by_rule(pool, rating=None, adjust=None, chunk_size=DEFAULT_CHUNK_SIZE, progress=None, **filters):
+    """Re-rate every observation a rule selects, ``chunk_size`` observations per transaction.
+
+    Observations are taken in ObservationID order, so each one is re-rated once
+    even when ``adjust`` is used. Returns a report dict (staged, changed,
+    unchanged, chunks, rows_per_sec, ...); ``progress`` receives it after every chunk.
+    """
+    started = time.perf_counter()
+    report = _new_report(batched_audit_enabled(pool))
+    report["last_observation_id"] = 0
+    done = False
+
+    def next_chunk(cursor):
+        nonlocal done
+        if done:
+            return None
+        sql, params = rule_query(rating, adjust, report["last_observation_id"], chunk_size, **filters)
+        stage_sql = f"INSERT INTO {STAGE_TABLE} (ObservationID, NewRating)" + sql
+        with get_query_metrics().track("rerate_stage_rule", stage_sql):
+            cursor.execute(stage_sql, params)
+        cursor.execute(_STAGE_EXTENT_SQL)
+        staged, last_id = cursor.fetchone()
+        if not staged:
+            return None
+        report["last_observation_id"] = last_id
+        # a short chunk means nothing selected is left after the checkpoint
+        done = staged < chunk_size
+        return staged
+
+    for staged, changed in _run_chunks(pool, report, next_chunk):
+        _finish_chunk(report, staged, changed, started, progress)
+    report["elapsed_s"] = time.perf_counter() - started
+    report["rows_per_sec"] = report["staged"] / report["elapsed_s"] if report["elapsed_s"] else 0.0
+    return report
+
+
+def rerate_from_file(pool, source, file_format=None, chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """Apply a CSV / Parquet file (path or file object) of ObservationID, DataQualityRating rows.
+
+    Rows with a missing or out-of-range rating and IDs that do not exist are
+    rejected with a reason; the rest are applied in chunks. If an ID appears
+    twice in one chunk, the later row wins. Returns the same report as
+    rerate_by_rule.
+    """
+    started = time.perf_counter()
+    report = _new_report(batched_audit_enabled(pool))
+    rows = enumerate(iter_source_rows(source, file_format=file_format, batch_size=chunk_size), start=1)
+
+    def next_chunk(cursor):
+        chunk = {}
+        for row_number, raw in rows:
+            try:
+                observation_id, rating = coerce_rating_row(raw)
+            except ValueError as err:
+                _reject(report, row_number, raw.get("ObservationID"), str(err))
+                continue
+            chunk[observation_id] = (rating, row_number)
+            if len(chunk) >= chunk_size:
+                break
+        if not chunk:
+            return None
+        with get_query_metrics().track("rerate_stage_file", STAGE_ROWS_SQL) as stat:
+            cursor.executemany(STAGE_ROWS_SQL, [(oid, rating) for oid, (rating, _) in chunk.items()])
+            stat["rows"] = len(chunk)
+        cursor.execute(_STAGE_UNKNOWN_SQL)
+        unknown = [oid for (oid,) in cursor.fetchall()]
+        for oid in unknown:
+            _reject(report, chunk[oid][1], oid, f"ObservationID {oid} does not exist.")
+        return len(chunk) - len(unknown)
+
+    for staged, changed in _run_chunks(pool, report, next_chunk):
+        _finish_chunk(report, staged, changed, started, progress)
+    report["elapsed_s"] = time.perf_counter() - started
+    report["rows_per_sec"] = report["staged"] / report["elapsed_s"] if report["elapsed_s"] else 0.0
+    return report
+
+
+# ===================================================
+# CLI
+# ===================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-rate observations in bulk, with one audit row per changed rating.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    file_parser = sub.add_parser("file", help="apply ObservationID, DataQualityRating rows from a CSV/Parquet file")
+    file_parser.add_argument("path")
+    file_parser.add_argument("--format", choices=["csv", "parquet"], help="default: from the file extension")
+    rule_parser = sub.add_parser("rule", help="re-rate every observation matching the filters")
+    action = rule_parser.add_mutually_exclusive_group(required=True)
+    action.add_argument("--rating", type=int, help=f"set this rating ({RATING_MIN}–{RATING_MAX})")
+    action.add_argument("--adjust", type=int, help="move the current rating by this many steps")
+    rule_parser.add_argument("--seeing", help="session SeeingCondition, e.g. Poor")
+    rule_parser.add_argument("--weather", help="session WeatherCondition")
+    rule_parser.add_argument("--telescope", type=int, dest="telescope_id")
+    rule_parser.add_argument("--researcher", type=int, dest="researcher_id")
+    rule_parser.add_argument("--date-from", help="sessions on or after this date (YYYY-MM-DD)")
+    rule_parser.add_argument("--date-to", help="sessions on or before this date (YYYY-MM-DD)")
+    rule_parser.add_argument("--object-type", help="e.g. Galaxy")
+    rule_parser.add_argument("--min-rating", type=int, help="only observations currently rated at least this")
+    rule_parser.add_argument("--max-rating", type=int, help="only observations currently rated at most this")
+    rule_parser.add_argument("--dry-run", action="store_true", help="only count what the rule would change")
+    for p in (file_parser, rule_parser):
+        p.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="observations per transaction")
+    args = parser.parse_args(argv)
+
+    def progress(r):
+        print(f"  chunk {r['chunks']}: {r['staged']} staged, {r['changed']} changed, "
+              f"{r['rows_per_sec']:.0f} rows/s", file=sys.stderr)
+
+    pool = get_pool()
+    try:
+        if args.command == "file":
+            report = rerate_from_file(pool, args.path, args.format, args.chunk_size, progress)
+        else:
+            filters = {name: getattr(args, name) for name in RULE_FILTERS}
+            if args.dry_run:
+                preview = rerate_preview(pool, args.rating, args.adjust, **filters)
+                print(f"{preview['matched']} observations match; {preview['would_change']} ratings would change.")
+                return 0
+            report = rerate_by_rule(pool, args.rating, args.adjust, args.chunk_size, progress, **filters)
+    except (Error, ValueError, RuntimeError) as e:
+        print(f"Re-rating failed: {e}", file=sys.stderr)
+        return 1
+
+    print(f"{report['changed']} ratings changed, {report['unchanged']} already had the new rating, "
+          f"{report['rejected']} rows rejected; {report['chunks']} chunks in {report['elapsed_s']:.2f}s "
+          f"({report['rows_per_sec']:.0f} rows/s, audit: {report['audit']}).")
+    for reject in report["rejects"]:
+        print(f"  row {reject['row']} (obs {reject['obs_id']}): {reject['reason']}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,210 @@
+from astro_metrics import get_query_metrics
+from astro_notes import notes_query
+from astro_paging import AUDIT_LOG_OPEN_RANGE, AUDIT_LOG_PAGED, SEEING_JOIN_PAGED
+from astro_quality import rule_query
+from astro_sky import box_query, cone_query
+
+# ===================================================
+# Canned Queries (shared by the Streamlit tabs and the EXPLAIN report)
+# ===================================================
+
+NESTED_DISCOVERER_SQL = """
+SELECT R.Name FROM RESEARCHERS AS R
+WHERE R.ResearcherID IN (
+    SELECT OS.ResearcherID FROM OBSERVATIONSESSIONS AS OS
+    JOIN OBSERVATIONS AS O ON OS.SessionID = O.SessionID
+    WHERE O.ObjectID IN (
+        SELECT OD.ObjectID FROM OBJECTDISCOVERY AS OD
+        WHERE OD.DiscovererName = %s
+    )
+);"""
+
+SEEING_JOIN_SQL = """
+SELECT CO.ObjectName, OS.Date, T.Name AS TelescopeName, OS.SeeingCondition
+FROM OBSERVATIONS AS O
+JOIN OBSERVATIONSESSIONS AS OS ON O.SessionID = OS.SessionID
+JOIN TELESCOPES AS T ON OS.TelescopeID = T.TelescopeID
+JOIN CELESTIALOBJECTS AS CO ON O.ObjectID = CO.ObjectID
+WHERE OS.SeeingCondition = %s;
+"""
+
+# Reads the trigger-maintained TELESCOPE_UTILIZATION summary (layer3.sql): one row per telescope.
+# Divides by TimedCount (observations with a duration) so NULL durations are skipped like AVG().
+TELESCOPE_AGG_SQL = """
+SELECT T.Name, SUM(U.TotalMinutes) / SUM(U.TimedCount) AS AvgDuration, SUM(U.ObservationCount) AS ObsCount
+FROM TELESCOPES AS T
+JOIN TELESCOPE_UTILIZATION AS U ON U.TelescopeID = T.TelescopeID
+GROUP BY T.Name
+HAVING SUM(U.ObservationCount) > %s;
+"""
+
+# Original join-based form, kept to cross-check the summary table
+TELESCOPE_AGG_LIVE_SQL = """
+SELECT T.Name, AVG(O.DurationMinutes) AS AvgDuration, COUNT(O.ObservationID) AS ObsCount
+FROM TELESCOPES AS T
+JOIN OBSERVATIONSESSIONS AS OS ON T.TelescopeID = OS.TelescopeID
+JOIN OBSERVATIONS AS O ON OS.SessionID = O.SessionID
+GROUP BY T.Name
+HAVING COUNT(O.ObservationID) > %s;
+"""
+
+# ORDER BY direction cannot be a bind parameter, so keep one statement per direction.
+# NULLs always sort last so MySQL, the DuckDB mirror and the snapshot pick the same row.
+DISTANCE_EXTREME_SQL = {
+    order_dir: f"""
+SELECT ObjectName, Distance_Parsecs
+FROM CELESTIALOBJECTS
+WHERE ObjectType = %s
+ORDER BY Distance_Parsecs IS NULL, Distance_Parsecs {order_dir}
+LIMIT 1;
+"""
+    for order_dir in ("ASC", "DESC")
+}
+
+MAGNITUDE_EXTREME_SQL = {
+    order_dir: f"""
+SELECT ObjectName, Magnitude
+FROM CELESTIALOBJECTS
+ORDER BY Magnitude IS NULL, Magnitude {order_dir}
+LIMIT 1;
+"""
+    for order_dir in ("ASC", "DESC")
+}
+
+# Top-N per object type: metric -> (column, {extreme: ORDER BY direction})
+TOP_N_METRICS = {
+    "distance": ("Distance_Parsecs", {"farthest": "DESC", "nearest": "ASC"}),
+    "magnitude": ("Magnitude", {"brightest": "ASC", "dimmest": "DESC"}),
+    "redshift": ("Redshift", {"highest": "DESC", "lowest": "ASC"}),
+}
+
+# The distinct types come from a loose scan of the (ObjectType, <metric>, ObjectName) index and
+# the LATERAL branch reads only the first N index entries of each type (MySQL 8.0.14+).
+# Params: (object type or NULL for all, same again, N). Objects without a value are skipped.
+TOP_N_PER_TYPE_SQL = {
+    (metric, extreme): f"""
+SELECT T.ObjectType, X.ObjectName, X.Value
+FROM (
+    SELECT DISTINCT ObjectType FROM CELESTIALOBJECTS
+    WHERE %s IS NULL OR ObjectType = %s
+) AS T
+JOIN LATERAL (
+    SELECT C.ObjectName, C.{column} AS Value
+    FROM CELESTIALOBJECTS AS C
+    WHERE C.ObjectType = T.ObjectType AND C.{column} IS NOT NULL
+    ORDER BY C.{column} {order_dir}
+    LIMIT %s
+) AS X ON TRUE
+ORDER BY T.ObjectType, X.Value {order_dir};
+"""
+    for metric, (column, extremes) in TOP_N_METRICS.items()
+    for extreme, order_dir in extremes.items()
+}
+
+TELESCOPE_NAME_SQL = "SELECT Name FROM TELESCOPES WHERE TelescopeID = %s"
+
+TELESCOPE_HOURS_SQL = "SELECT get_telescope_utilization_hours(%s) AS HoursUsed;"
+
+TELESCOPE_DAILY_USAGE_SQL = """
+SELECT UsageDate, ObservationCount, TotalMinutes / 60.0 AS Hours
+FROM TELESCOPE_UTILIZATION_DAILY
+WHERE TelescopeID = %s AND ObservationCount > 0
+ORDER BY UsageDate;
+"""
+
+# Same row selection archive_old_observations() performs (layer2.sql)
+ARCHIVE_CANDIDATES_SQL = """
+SELECT O.ObservationID
+FROM OBSERVATIONS AS O
+JOIN OBSERVATIONSESSIONS AS OS ON O.SessionID = OS.SessionID
+WHERE OS.Date < %s AND O.DataQualityRating < %s;
+"""
+
+AUDIT_LOG_SQL = "SELECT LogID, ObservationID, OldDataQuality, ChangeTimestamp FROM OBSERVATION_LOG ORDER BY LogID DESC LIMIT 5"
+
+# Researchers whose stored TotalObservationMinutes differs from a full re-aggregation
+RESEARCHER_TOTALS_DRIFT_SQL = """
+SELECT R.ResearcherID, R.Name, R.TotalObservationMinutes AS StoredMinutes, IFNULL(T.Minutes, 0) AS ComputedMinutes
+FROM RESEARCHERS AS R
+LEFT JOIN (
+    SELECT OS.ResearcherID, SUM(O.DurationMinutes) AS Minutes
+    FROM OBSERVATIONS AS O
+    JOIN OBSERVATIONSESSIONS AS OS ON O.SessionID = OS.SessionID
+    GROUP BY OS.ResearcherID
+) AS T ON T.ResearcherID = R.ResearcherID
+WHERE NOT (IFNULL(R.TotalObservationMinutes, 0) <=> IFNULL(T.Minutes, 0));
+"""
+
+REBUILD_RESEARCHER_TOTALS_SQL = "CALL rebuild_all_researcher_totals()"
+
+
+# ===================================================
+# EXPLAIN Report (index advisor)
+# ===================================================
+
+# (name, sql, sample params) — one entry per canned access path
+EXPLAIN_CASES = (
+    ("nested_discoverer", NESTED_DISCOVERER_SQL, ("Galileo Galilei",)),
+    ("seeing_join", SEEING_JOIN_PAGED.render()[0], ("Good", 51)),
+    ("telescope_agg", TELESCOPE_AGG_SQL, (5,)),
+    ("farthest_by_type", DISTANCE_EXTREME_SQL["DESC"], ("Galaxy",)),
+    ("nearest_by_type", DISTANCE_EXTREME_SQL["ASC"], ("Star",)),
+    ("brightest", MAGNITUDE_EXTREME_SQL["ASC"], ()),
+    ("dimmest", MAGNITUDE_EXTREME_SQL["DESC"], ()),
+    ("top_n_farthest", TOP_N_PER_TYPE_SQL["distance", "farthest"], (None, None, 5)),
+    ("top_n_brightest", TOP_N_PER_TYPE_SQL["magnitude", "brightest"], (None, None, 5)),
+    ("top_n_highest_redshift", TOP_N_PER_TYPE_SQL["redshift", "highest"], ("Galaxy", "Galaxy", 5)),
+    ("sky_cone", *cone_query("00h 42m 44s", "+41d 16m 09s", 2.0)),
+    ("sky_box", *box_query(80.0, 90.0, -10.0, 25.0)),
+    ("notes_search", *notes_query("transit photometry")),
+    ("archive_candidates", ARCHIVE_CANDIDATES_SQL, ("2025-09-02", 3)),
+    ("audit_log_recent", AUDIT_LOG_PAGED.render()[0], (*AUDIT_LOG_OPEN_RANGE, 6)),
+    ("audit_log_range", AUDIT_LOG_PAGED.render(after=("2025-09-30 00:00:00", 500))[0],
+     ("2025-09-01 00:00:00", "2025-09-30 23:59:59", "2025-09-30 00:00:00", "2025-09-30 00:00:00", 500, 51)),
+    ("rerate_rule", *rule_query(adjust=-1, seeing="Poor")),
+)
+
+# EXPLAIN access types that read a whole table / index
+FULL_SCAN_TYPES = {"ALL": "full table scan", "index": "full index scan"}
+EXTRA_WARNINGS = ("Using filesort", "Using temporary")
+
+
+def explain_query(conn, sql, params=()):
+    """Run EXPLAIN for one statement and return its plan rows as dicts."""
+    cursor = conn.cursor(dictionary=True)
+    try:
+        with get_query_metrics().track("explain", sql):
+            cursor.execute("EXPLAIN " + sql.strip().rstrip(";"), params)
+            return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def plan_flags(plan_row):
+    """Human-readable warnings for one EXPLAIN row (empty list if the plan looks fine)."""
+    flags = []
+    access = plan_row.get("type")
+    if access in FULL_SCAN_TYPES and plan_row.get("table"):
+        flags.append(FULL_SCAN_TYPES[access])
+    extra = plan_row.get("Extra") or ""
+    flags.extend(w for w in EXTRA_WARNINGS if w in extra)
+    return flags
+
+
+def explain_report(pool, cases=EXPLAIN_CASES):
+    """EXPLAIN every canned query; one flat row per (query, plan step)."""
+    report = []
+    with pool.connection() as conn:
+        for name, sql, params in cases:
+            for step in explain_query(conn, sql, params):
+                flags = plan_flags(step)
+                report.append({
+                    "query": name,
+                    "table": step.get("table"),
+                    "type": step.get("type"),
+                    "key": step.get("key"),
+                    "rows": step.get("rows"),
+                    "extra": step.get("Extra"),
+                    "flags": ", ".join(flags),
+                })
+    return report
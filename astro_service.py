@@ -0,0 +1,478 @@
+"""Headless data-access layer: every query, procedure and insert the app runs, without Streamlit.
+
+The Streamlit app, the benchmark harness and batch jobs all call these
+functions with a pool from ``astro_db.get_pool()``. Every statement they run is
+registered by name in ``STATEMENTS`` and executed as a server-side prepared
+statement that stays prepared on its pooled connection (astro_db.StatementCache). Database errors are raised
+as ``mysql.connector.Error``; showing them is the caller's job. pandas / NumPy
+are only imported by the analytics wrappers that need them, so importing this
+module (or running its CLI) stays fast.
+
+Usage:
+    python astro_service.py --list
+    python astro_service.py --statements
+    python astro_service.py telescope_hours 3
+    python astro_service.py distance_extreme Galaxy farthest=False
+"""
+import argparse
+import ast
+import inspect
+import json
+import sys
+from typing import Any, Callable, NamedTuple, Optional, Sequence
+
+from mysql.connector import Error
+
+from astro_archive import archive_observations, pending_archive_count, recent_archive_runs
+from astro_db import (
+    get_pool, get_query_cache, get_statement_cache, incremental_totals_enabled, tables_read, tables_written,
+)
+from astro_ingest import (
+    DEFAULT_CHUNK_SIZE as INGEST_CHUNK_SIZE, OBSERVATION_INSERT_SQL, SESSION_INSERT_SQL,
+    ingest_observations, iter_source_rows, refresh_last_observed_dates,
+)
+from astro_metrics import get_query_metrics
+from astro_notes import search_notes_page
+from astro_paging import AUDIT_LOG_OPEN_RANGE, AUDIT_LOG_PAGED, DEFAULT_PAGE_SIZE, SEEING_JOIN_PAGED, fetch_page
+from astro_quality import rerate_by_rule, rerate_from_file, rerate_preview
+from astro_queries import (
+    DISTANCE_EXTREME_SQL, MAGNITUDE_EXTREME_SQL, NESTED_DISCOVERER_SQL, REBUILD_RESEARCHER_TOTALS_SQL,
+    RESEARCHER_TOTALS_DRIFT_SQL, TELESCOPE_AGG_SQL, TELESCOPE_DAILY_USAGE_SQL, TELESCOPE_HOURS_SQL,
+    TELESCOPE_NAME_SQL, TOP_N_METRICS, TOP_N_PER_TYPE_SQL, explain_report,
+)
+from astro_sky import DEFAULT_SKY_LIMIT, box_search, cone_search
+from astro_validation import validate_observations
+
+RESEARCHER_INSERT_SQL = (
+    "INSERT INTO RESEARCHERS (ResearcherID, Name, Email, Institution, DOB, InitialExperience) "
+    "VALUES (%s, %s, %s, %s, %s, %s)"
+)
+TELESCOPE_INSERT_SQL = (
+    "INSERT INTO TELESCOPES (TelescopeID, Name, Location, ApertureSize, PrimaryMirrorMaterial, MountType) "
+    "VALUES (%s, %s, %s, %s, %s, %s)"
+)
+CELESTIAL_OBJECT_INSERT_SQL = (
+    "INSERT INTO CELESTIALOBJECTS (ObjectID, ObjectName, ObjectType, Magnitude, RightAscension, Declination, "
+    "LastObservedDate, Distance_Parsecs, Redshift, Diameter_km, Mass_SolarMass) "
+    "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"
+)
+QUALITY_UPDATE_SQL = "UPDATE OBSERVATIONS SET DataQualityRating = %s WHERE ObservationID = %s"
+UPDATE_RESEARCHER_TOTAL_SQL = "CALL update_researcher_total_time(%s)"
+RESEARCHER_STATS_SQL = "SELECT Name, TotalObservationMinutes FROM RESEARCHERS WHERE ResearcherID = %s"
+OBSERVATION_MAGNITUDE_SQL = """
+SELECT CO.Magnitude, CO.Redshift
+FROM CELESTIALOBJECTS AS CO
+JOIN OBSERVATIONS AS O ON CO.ObjectID = O.ObjectID
+WHERE O.ObservationID = %s;
+"""
+EFFECTIVE_MAGNITUDE_SQL = "SELECT calculate_effective_magnitude(%s, %s) AS EffectiveMagnitude"
+
+# Existence checks the UI runs before a procedure / insert (table, key column)
+_EXISTENCE_KEYS = {
+    "RESEARCHERS": "ResearcherID",
+    "TELESCOPES": "TelescopeID",
+    "CELESTIALOBJECTS": "ObjectID",
+    "OBSERVATIONS": "ObservationID",
+}
+
+# Every statement the service runs, by name (the name is also its metrics label).
+# Inputs are always bind parameters; ORDER BY directions and table names are part
+# of the registered text, so each variant is its own statement.
+STATEMENTS = {
+    "insert_researcher": RESEARCHER_INSERT_SQL,
+    "update_quality_rating": QUALITY_UPDATE_SQL,
+    "nested_discoverer": NESTED_DISCOVERER_SQL,
+    "telescope_agg": TELESCOPE_AGG_SQL,
+    "farthest_by_type": DISTANCE_EXTREME_SQL["DESC"],
+    "nearest_by_type": DISTANCE_EXTREME_SQL["ASC"],
+    "brightest": MAGNITUDE_EXTREME_SQL["ASC"],
+    "dimmest": MAGNITUDE_EXTREME_SQL["DESC"],
+    "telescope_name": TELESCOPE_NAME_SQL,
+    "telescope_hours": TELESCOPE_HOURS_SQL,
+    "update_researcher_total_time": UPDATE_RESEARCHER_TOTAL_SQL,
+    "researcher_stats": RESEARCHER_STATS_SQL,
+    "researcher_totals_drift": RESEARCHER_TOTALS_DRIFT_SQL,
+    "rebuild_researcher_totals": REBUILD_RESEARCHER_TOTALS_SQL,
+    "observation_magnitude": OBSERVATION_MAGNITUDE_SQL,
+    "effective_magnitude": EFFECTIVE_MAGNITUDE_SQL,
+    "telescope_daily_usage": TELESCOPE_DAILY_USAGE_SQL,
+    "insert_session": SESSION_INSERT_SQL,
+    "insert_observation": OBSERVATION_INSERT_SQL,
+    "insert_telescope": TELESCOPE_INSERT_SQL,
+    "insert_celestial_object": CELESTIAL_OBJECT_INSERT_SQL,
+}
+STATEMENTS.update({
+    f"exists_{table.lower()}": f"SELECT 1 FROM {table} WHERE {column} = %s LIMIT 1"
+    for table, column in _EXISTENCE_KEYS.items()
+})
+STATEMENTS.update({
+    f"top_n_{metric}_{extreme}": sql for (metric, extreme), sql in TOP_N_PER_TYPE_SQL.items()
+})
+
+
+class QueryResult(NamedTuple):
+    """Column names and rows of a SELECT; unpacks as ``columns, rows``."""
+    columns: list
+    rows: list
+
+
+# ===================================================
+# Core helpers
+# ===================================================
+
+def run_query(pool, statement: str, params: Sequence = (), cached: bool = False) -> QueryResult:
+    """Run a registered SELECT / function call and fetch every row, through the query cache if ``cached``."""
+    sql = STATEMENTS[statement]
+    query_cache = get_query_cache()
+    if cached:
+        hit, result = query_cache.get(sql, params)
+        if hit:
+            return result
+        read_tables = tables_read(sql)
+        versions = query_cache.table_versions(read_tables)
+    with pool.connection() as conn:
+        with get_query_metrics().track(statement, sql) as stat:
+            with get_statement_cache().execute(conn, sql, params) as cursor:
+                rows = cursor.fetchall()
+                columns = [c[0] for c in cursor.description]
+            stat["rows"] = len(rows)
+    result = QueryResult(columns, rows)
+    if cached:
+        query_cache.put(sql, params, result, read_tables, versions)
+    return result
+
+
+def run_write(pool, statement: str, params: Sequence = ()) -> int:
+    """Run and commit one registered write / CALL; returns the affected row count."""
+    sql = STATEMENTS[statement]
+    with pool.connection() as conn:
+        with get_query_metrics().track(statement, sql) as stat:
+            with get_statement_cache().execute(conn, sql, params) as cursor:
+                affected = max(cursor.rowcount, 0)
+            conn.commit()
+            stat["rows"] = affected
+    get_query_cache().invalidate_tables(tables_written(sql))
+    return affected
+
+
+def _first_row(result: QueryResult) -> Optional[tuple]:
+    return result.rows[0] if result.rows else None
+
+
+def record_exists(pool, table: str, key) -> bool:
+    """True if ``table`` has a row with this primary key (RESEARCHERS, TELESCOPES, CELESTIALOBJECTS, OBSERVATIONS)."""
+    if table not in _EXISTENCE_KEYS:
+        raise KeyError(table)
+    return bool(run_query(pool, f"exists_{table.lower()}", (key,)).rows)
+
+
+# ===================================================
+# TAB 1: CRUD & Trigger
+# ===================================================
+
+def create_researcher(pool, researcher_id, name: str, email: str, institution: Optional[str] = None,
+                      dob: Optional[str] = None, experience: int = 0) -> None:
+    run_write(pool, "insert_researcher", (researcher_id, name, email, institution, dob, experience))
+
+
+def update_quality_rating(pool, observation_id: int, rating: int) -> int:
+    """Re-rate one observation (fires the audit trigger); returns 0 if it does not exist."""
+    return run_write(pool, "update_quality_rating", (rating, observation_id))
+
+
+def audit_log_page(pool, since=None, until=None, after=None, before=None,
+                   page_size: int = DEFAULT_PAGE_SIZE) -> dict:
+    """One keyset page of OBSERVATION_LOG between ``since`` and ``until`` (inclusive, None = open), newest first.
+
+    Page keys are (ChangeTimestamp, LogID) tuples; see astro_paging.fetch_page.
+    """
+    params = (since or AUDIT_LOG_OPEN_RANGE[0], until or AUDIT_LOG_OPEN_RANGE[1])
+    return fetch_page(pool, AUDIT_LOG_PAGED, params, after=after, before=before, page_size=page_size)
+
+
+# rerate_by_rule, rerate_from_file and rerate_preview (astro_quality) are the bulk
+# counterparts of update_quality_rating and are re-exported unchanged.
+
+
+# ===================================================
+# TAB 2: Analytical Queries
+# ===================================================
+
+def observers_of_discoverer(pool, discoverer: str, cached: bool = True) -> QueryResult:
+    return run_query(pool, "nested_discoverer", (discoverer,), cached=cached)
+
+
+def seeing_join_page(pool, seeing: str, after=None, before=None, page_size: int = DEFAULT_PAGE_SIZE) -> dict:
+    return fetch_page(pool, SEEING_JOIN_PAGED, (seeing,), after=after, before=before, page_size=page_size)
+
+
+def telescope_usage(pool, min_observations: int, cached: bool = True) -> QueryResult:
+    """Telescopes with more than ``min_observations`` observations and their average duration."""
+    return run_query(pool, "telescope_agg", (min_observations,), cached=cached)
+
+
+def distance_extreme(pool, object_type: str, farthest: bool = True, cached: bool = True) -> Optional[tuple]:
+    """(ObjectName, Distance_Parsecs) of the farthest / nearest object of a type, or None."""
+    statement = "farthest_by_type" if farthest else "nearest_by_type"
+    return _first_row(run_query(pool, statement, (object_type,), cached=cached))
+
+
+def magnitude_extreme(pool, brightest: bool = True, cached: bool = True) -> Optional[tuple]:
+    """(ObjectName, Magnitude) of the brightest / dimmest object, or None."""
+    return _first_row(run_query(pool, "brightest" if brightest else "dimmest", cached=cached))
+
+
+def top_n_per_type(pool, metric: str = "distance", extreme: str = "farthest", n: int = 5,
+                   object_type: Optional[str] = None, cached: bool = True) -> QueryResult:
+    """The ``n`` most extreme objects of every type (or just ``object_type``) by distance, magnitude or redshift.
+
+    ``extreme`` is farthest/nearest, brightest/dimmest or highest/lowest (see TOP_N_METRICS).
+    Rows are (ObjectType, Rank, ObjectName, Value), best first within each type.
+    """
+    if (metric, extreme) not in TOP_N_PER_TYPE_SQL:
+        raise ValueError(f"unknown top-N ranking {metric}/{extreme}; choose from " +
+                         ", ".join(f"{m}/{e}" for m, e in TOP_N_PER_TYPE_SQL))
+    result = run_query(pool, f"top_n_{metric}_{extreme}", (object_type, object_type, int(n)), cached=cached)
+    rows, rank, previous = [], 0, None
+    for obj_type, name, value in result.rows:
+        rank = rank + 1 if obj_type == previous else 1
+        previous = obj_type
+        rows.append((obj_type, rank, name, value))
+    return QueryResult(["ObjectType", "Rank", "ObjectName", TOP_N_METRICS[metric][0]], rows)
+
+
+def sky_cone_search(pool, ra, dec, radius_deg: float, object_type: Optional[str] = None,
+                    limit: int = DEFAULT_SKY_LIMIT) -> QueryResult:
+    """Objects within ``radius_deg`` of a pointing, nearest first (see astro_sky).
+
+    ``ra`` / ``dec`` are degrees or catalog text ("05h 34m 31s", "+22d 00m 52s").
+    """
+    return QueryResult(*cone_search(pool, ra, dec, radius_deg, object_type, limit))
+
+
+def sky_box_search(pool, ra_min, ra_max, dec_min, dec_max, object_type: Optional[str] = None,
+                   limit: int = DEFAULT_SKY_LIMIT) -> QueryResult:
+    """Objects inside an RA/Dec box; ``ra_min > ra_max`` wraps through 0h."""
+    return QueryResult(*box_search(pool, ra_min, ra_max, dec_min, dec_max, object_type, limit))
+
+
+def search_observation_notes(pool, text: str, mode: str = "natural", object_id: Optional[int] = None,
+                             telescope_id: Optional[int] = None, date_from=None, date_to=None,
+                             after: Optional[tuple] = None, before: Optional[tuple] = None,
+                             page_size: int = DEFAULT_PAGE_SIZE) -> dict:
+    """One ranked page of observations whose notes match ``text`` (see astro_notes).
+
+    ``mode`` is "natural" or "boolean"; pass the previous page's last_key / first_key as after / before.
+    """
+    return search_notes_page(pool, text, mode, object_id, telescope_id, date_from, date_to,
+                             after=after, before=before, page_size=page_size)
+
+
+def telescope_name(pool, telescope_id: int, cached: bool = True) -> Optional[str]:
+    row = _first_row(run_query(pool, "telescope_name", (telescope_id,), cached=cached))
+    return row[0] if row else None
+
+
+def telescope_hours(pool, telescope_id: int, cached: bool = True) -> Optional[float]:
+    """get_telescope_utilization_hours(); None when the telescope has no usage."""
+    row = _first_row(run_query(pool, "telescope_hours", (telescope_id,), cached=cached))
+    return float(row[0]) if row and row[0] is not None else None
+
+
+def telescope_hours_report(pool, telescope_id: int, cached: bool = True) -> tuple:
+    """(Name, hours used) of a telescope; (None, None) if it does not exist."""
+    name = telescope_name(pool, telescope_id, cached=cached)
+    if name is None:
+        return None, None
+    return name, telescope_hours(pool, telescope_id, cached=cached)
+
+
+def query_plan_report(pool) -> list:
+    """EXPLAIN every canned query; one dict per (query, plan step) with its flags."""
+    return explain_report(pool)
+
+
+# ===================================================
+# TAB 3: Stored Procedures / Functions
+# ===================================================
+
+def update_researcher_total_time(pool, researcher_id: int) -> None:
+    run_write(pool, "update_researcher_total_time", (researcher_id,))
+
+
+def researcher_stats(pool, researcher_id: int) -> QueryResult:
+    return run_query(pool, "researcher_stats", (researcher_id,))
+
+
+def researcher_totals_drift(pool) -> QueryResult:
+    """Researchers whose stored total differs from a full re-aggregation (empty when consistent)."""
+    return run_query(pool, "researcher_totals_drift")
+
+
+def rebuild_researcher_totals(pool) -> None:
+    run_write(pool, "rebuild_researcher_totals")
+
+
+def observation_magnitude(pool, observation_id: int) -> Optional[tuple]:
+    """(Magnitude, Redshift) of the object behind an observation, or None."""
+    return _first_row(run_query(pool, "observation_magnitude", (observation_id,)))
+
+
+def calculate_effective_magnitude(pool, magnitude, redshift) -> Optional[float]:
+    """The stored calculate_effective_magnitude(M, z); None when it returns NULL."""
+    row = _first_row(run_query(pool, "effective_magnitude", (magnitude, redshift)))
+    return float(row[0]) if row and row[0] is not None else None
+
+
+def effective_magnitudes(pool, engine: str = "numpy", **filters):
+    """DataFrame of effective magnitudes for every matching observation (see astro_analytics)."""
+    from astro_analytics import compute_effective_magnitudes
+    return compute_effective_magnitudes(pool, engine=engine, **filters)
+
+
+def effective_magnitude_parity(pool, **kwargs) -> dict:
+    from astro_analytics import check_effective_magnitude_parity
+    return check_effective_magnitude_parity(pool, **kwargs)
+
+
+def telescope_daily_usage(pool, telescope_id: int, cached: bool = True) -> QueryResult:
+    return run_query(pool, "telescope_daily_usage", (telescope_id,), cached=cached)
+
+
+# archive_observations, pending_archive_count and recent_archive_runs (astro_archive)
+# are already headless and are re-exported unchanged.
+
+
+# ===================================================
+# TAB 4: Data Entry
+# ===================================================
+
+def validate_observation(pool, entry: dict) -> dict:
+    """Key / duplicate report for one pending observation (see astro_validation)."""
+    return validate_observations(pool, [entry])[0]
+
+
+def insert_observation(pool, session_id: int, researcher_id: int, telescope_id: int, date, obs_id: int,
+                       object_id: int, duration: int, quality: Optional[int] = None,
+                       weather: str = "Clear", seeing: str = "Good") -> Optional[Error]:
+    """Insert a new session and its observation in one transaction.
+
+    Researcher totals are kept current by the layer3.sql triggers; without
+    them the researcher's total is recomputed afterwards. The observation is
+    already committed by then, so a failed recompute does not raise: its
+    error is returned (None on success) for the caller to report, and
+    rebuild_researcher_totals repairs the total later.
+    """
+    recompute_totals = not incremental_totals_enabled(pool)
+    statements = get_statement_cache()
+    with pool.connection() as conn:
+        with get_query_metrics().track("insert_observation") as stat:
+            with statements.execute(conn, STATEMENTS["insert_session"],
+                                    (session_id, date, weather, seeing, researcher_id, telescope_id)):
+                pass
+            with statements.execute(conn, STATEMENTS["insert_observation"],
+                                    (obs_id, session_id, object_id, duration, None, None, quality)):
+                pass
+            conn.commit()
+            stat["rows"] = 2
+    get_query_cache().invalidate_tables({"OBSERVATIONSESSIONS", "OBSERVATIONS"})
+    if recompute_totals:
+        try:
+            update_researcher_total_time(pool, researcher_id)
+        except Error as e:
+            return e
+    return None
+
+
+def insert_telescope(pool, telescope_id: int, name: str, location: str, aperture_size: float,
+                     material: str, mount_type: str) -> None:
+    run_write(pool, "insert_telescope", (telescope_id, name, location, aperture_size, material, mount_type))
+
+
+def insert_celestial_object(pool, object_id: int, name: str, obj_type: str, magnitude: float, ra: str, dec: str,
+                            last_observed=None, distance_parsecs: Optional[float] = None,
+                            redshift: Optional[float] = None, diameter_km: Optional[float] = None,
+                            mass_solar: Optional[float] = None) -> None:
+    run_write(pool, "insert_celestial_object",
+              (object_id, name, obj_type, magnitude, ra, dec, last_observed, distance_parsecs, redshift,
+               diameter_km, mass_solar))
+
+
+def import_observations(pool, source, file_format: Optional[str] = None, chunk_size: int = INGEST_CHUNK_SIZE,
+                        progress: Optional[Callable[[dict], Any]] = None) -> dict:
+    """Bulk-load a CSV / Parquet file (path or file object); returns the astro_ingest report."""
+    rows = iter_source_rows(source, file_format=file_format, batch_size=chunk_size)
+    return ingest_observations(pool, rows, chunk_size=chunk_size, progress=progress)
+
+
+# ===================================================
+# CLI
+# ===================================================
+
+SERVICE_FUNCTIONS = {
+    fn.__name__: fn for fn in (
+        record_exists, create_researcher, update_quality_rating, audit_log_page,
+        rerate_preview, rerate_by_rule, rerate_from_file,
+        observers_of_discoverer, seeing_join_page, telescope_usage, distance_extreme, magnitude_extreme, top_n_per_type,
+        sky_cone_search, sky_box_search, search_observation_notes,
+        telescope_name, telescope_hours, telescope_hours_report, query_plan_report,
+        update_researcher_total_time, researcher_stats, researcher_totals_drift, rebuild_researcher_totals,
+        observation_magnitude, calculate_effective_magnitude, effective_magnitudes, effective_magnitude_parity,
+        telescope_daily_usage, pending_archive_count, archive_observations, recent_archive_runs,
+        validate_observation, insert_observation, insert_telescope, insert_celestial_object, import_observations,
+        refresh_last_observed_dates,
+    )
+}
+
+
+def _cli_value(text):
+    try:
+        return ast.literal_eval(text)
+    except (ValueError, SyntaxError):
+        return text
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Call one data-access function and print its result as JSON.")
+    parser.add_argument("function", nargs="?", help="function name (see --list)")
+    parser.add_argument("args", nargs="*", help="positional values or key=value pairs (Python literals)")
+    parser.add_argument("--list", action="store_true", help="list the available functions")
+    parser.add_argument("--statements", action="store_true", help="print the registered SQL statements")
+    args = parser.parse_args(argv)
+
+    if args.statements:
+        for name, sql in STATEMENTS.items():
+            print(f"-- {name}\n{sql.strip()}\n")
+        return 0
+
+    if args.list or not args.function:
+        for name, fn in SERVICE_FUNCTIONS.items():
+            params = list(inspect.signature(fn).parameters)[1:]
+            print(f"{name}({', '.join(params)})")
+        return 0
+    if args.function not in SERVICE_FUNCTIONS:
+        parser.error(f"unknown function {args.function!r}")
+
+    positional, keywords = [], {}
+    for arg in args.args:
+        key, sep, value = arg.partition("=")
+        if sep and key.isidentifier():
+            keywords[key] = _cli_value(value)
+        else:
+            positional.append(_cli_value(arg))
+
+    try:
+        result = SERVICE_FUNCTIONS[args.function](get_pool(), *positional, **keywords)
+    except Error as e:
+        print(f"SQL Error: {e}", file=sys.stderr)
+        return 1
+    if isinstance(result, QueryResult):
+        result = [dict(zip(result.columns, row)) for row in result.rows]
+    elif hasattr(result, "to_dict"):   # DataFrame from the analytics wrappers
+        result = result.to_dict(orient="records")
+    print(json.dumps(result, indent=2, default=str))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+"""Cone and box searches over the catalog's sky positions.
+
+CELESTIALOBJECTS keeps RightAscension / Declination as text; layer3.sql adds
+numeric RA_Deg / Dec_Deg and SkyZone (the object's declination band), kept in
+step by triggers and indexed as (SkyZone, RA_Deg, Dec_Deg). A search lists the
+zones it overlaps and, per zone, the RA interval that can contain matches. MySQL
+then reads one short index range per zone instead of the whole catalog, and
+only those candidates get the exact great-circle test.
+"""
+import math
+import re
+
+from astro_db import get_statement_cache
+from astro_metrics import get_query_metrics
+
+# Must match the zone height in sky_zone() (layer3.sql)
+SKY_ZONE_HEIGHT = 0.5
+MAX_RADIUS_DEG = 30.0
+DEFAULT_SKY_LIMIT = 100
+MAX_SKY_LIMIT = 1000
+
+# Same formats the SQL parsers accept: sexagesimal as stored, or decimal degrees
+_RA_HMS_RE = re.compile(r'^(\d{1,2})h *(\d{1,2})m *(\d{1,2}(?:\.\d+)?)s$')
+_DEC_DMS_RE = re.compile(r'^([+-]?)(\d{1,2})d *(\d{1,2})m *(\d{1,2}(?:\.\d+)?)s$')
+
+_SKY_COLUMNS = "ObjectID, ObjectName, ObjectType, Magnitude, RightAscension, Declination, RA_Deg, Dec_Deg"
+
+# Haversine separation in degrees from the pointing (params: dec, dec, ra); stable for tiny radii
+_SEPARATION = """DEGREES(2 * ASIN(LEAST(1, SQRT(
+           POW(SIN(RADIANS(Dec_Deg - %s) / 2), 2)
+           + COS(RADIANS(Dec_Deg)) * COS(RADIANS(%s)) * POW(SIN(RADIANS(RA_Deg - %s) / 2), 2)
+       ))))"""
+
+CONE_SEARCH_SQL = """
+SELECT {columns},
+       {separation} AS SeparationDeg
+FROM CELESTIALOBJECTS
+WHERE SkyZone IN ({zones}) AND ({ra_ranges}) AND Dec_Deg BETWEEN %s AND %s
+  AND (%s IS NULL OR ObjectType = %s)
+HAVING SeparationDeg <= %s
+ORDER BY SeparationDeg
+LIMIT %s
+"""
+
+BOX_SEARCH_SQL = """
+SELECT {columns}
+FROM CELESTIALOBJECTS
+WHERE SkyZone IN ({zones}) AND ({ra_ranges}) AND Dec_Deg BETWEEN %s AND %s
+  AND (%s IS NULL OR ObjectType = %s)
+ORDER BY SkyZone, RA_Deg
+LIMIT %s
+"""
+
+
+# ===================================================
+# Coordinates
+# ===================================================
+
+def parse_ra(value):
+    """Right ascension in degrees [0, 360) from degrees or "HHh MMm SSs"; raises ValueError."""
+    if isinstance(value, (int, float)):
+        degrees = float(value)
+    else:
+        text = str(value).strip()
+        match = _RA_HMS_RE.match(text)
+        if match:
+            hours, minutes, seconds = (float(g) for g in match.groups())
+            degrees = hours * 15 + minutes / 4 + seconds / 240
+        else:
+            try:
+                degrees = float(text)
+            except ValueError:
+                raise ValueError(f"Right ascension '{value}' is not degrees or 'HHh MMm SSs'")
+    if not 0 <= degrees < 360:
+        raise ValueError(f"Right ascension {degrees:g} is outside 0..360 degrees")
+    return degrees
+
+
+def parse_dec(value):
+    """Declination in degrees [-90, 90] from degrees or "+DDd MMm SSs"; raises ValueError."""
+    if isinstance(value, (int, float)):
+        degrees = float(value)
+    else:
+        text = str(value).strip()
+        match = _DEC_DMS_RE.match(text)
+        if match:
+            sign, deg, minutes, seconds = match.groups()
+            degrees = float(deg) + float(minutes) / 60 + float(seconds) / 3600
+            degrees = -degrees if sign == "-" else degrees
+        else:
+            try:
+                degrees = float(text)
+            except ValueError:
+                raise ValueError(f"Declination '{value}' is not degrees or '+DDd MMm SSs'")
+    if not -90 <= degrees <= 90:
+        raise ValueError(f"Declination {degrees:g} is outside -90..90 degrees")
+    return degrees
+
+
+def sky_zone(dec_deg):
+    return math.floor((dec_deg + 90) / SKY_ZONE_HEIGHT)
+
+
+def _zones(dec_min, dec_max):
+    return list(range(sky_zone(max(dec_min, -90.0)), sky_zone(min(dec_max, 90.0)) + 1))
+
+
+def _ra_ranges(ra_min, ra_max):
+    """RA intervals covering ra_min..ra_max, split in two when it wraps through 0h."""
+    if ra_max - ra_min >= 360:
+        return [(0.0, 360.0)]
+    if 0 <= ra_min <= ra_max <= 360:
+        return [(ra_min, ra_max)]
+    ra_min, ra_max = ra_min % 360, ra_max % 360
+    if ra_min <= ra_max:
+        return [(ra_min, ra_max)]
+    return [(ra_min, 360.0), (0.0, ra_max)]
+
+
+def cone_ra_half_width(dec_deg, radius_deg):
+    """Largest RA offset a point within ``radius_deg`` of (ra, dec_deg) can have; 180 when a pole is inside."""
+    if abs(dec_deg) + radius_deg >= 90:
+        return 180.0
+    ratio = math.sin(math.radians(radius_deg)) / math.cos(math.radians(dec_deg))
+    return math.degrees(math.asin(min(1.0, ratio))) + 1e-9
+
+
+# ===================================================
+# Query builders
+# ===================================================
+
+def _range_sql(ranges):
+    return " OR ".join("RA_Deg BETWEEN %s AND %s" for _ in ranges), [v for r in ranges for v in r]
+
+
+def _limit(limit):
+    return max(1, min(int(limit), MAX_SKY_LIMIT))
+
+
+def cone_query(ra, dec, radius_deg, object_type=None, limit=DEFAULT_SKY_LIMIT):
+    """(sql, params) for objects within ``radius_deg`` of the pointing, nearest first."""
+    ra, dec, radius_deg = parse_ra(ra), parse_dec(dec), float(radius_deg)
+    if not 0 < radius_deg <= MAX_RADIUS_DEG:
+        raise ValueError(f"Radius must be between 0 and {MAX_RADIUS_DEG:g} degrees")
+    half_width = cone_ra_half_width(dec, radius_deg)
+    zones = _zones(dec - radius_deg, dec + radius_deg)
+    ra_sql, ra_params = _range_sql(_ra_ranges(ra - half_width, ra + half_width))
+    sql = CONE_SEARCH_SQL.format(
+        columns=_SKY_COLUMNS, separation=_SEPARATION, zones=", ".join(["%s"] * len(zones)), ra_ranges=ra_sql,
+    )
+    params = [dec, dec, ra, *zones, *ra_params, dec - radius_deg, dec + radius_deg,
+              object_type, object_type, radius_deg, _limit(limit)]
+    return sql, params
+
+
+def box_query(ra_min, ra_max, dec_min, dec_max, object_type=None, limit=DEFAULT_SKY_LIMIT):
+    """(sql, params) for objects inside an RA/Dec box; ra_min > ra_max means the box wraps through 0h.
+
+    ``ra_max`` may be 360 to close the box at 24h.
+    """
+    ra_min = parse_ra(ra_min)
+    ra_max = 360.0 if isinstance(ra_max, (int, float)) and ra_max == 360 else parse_ra(ra_max)
+    dec_min, dec_max = parse_dec(dec_min), parse_dec(dec_max)
+    if dec_min > dec_max:
+        raise ValueError("Minimum declination is above the maximum")
+    zones = _zones(dec_min, dec_max)
+    ra_sql, ra_params = _range_sql(_ra_ranges(ra_min, ra_max))
+    sql = BOX_SEARCH_SQL.format(columns=_SKY_COLUMNS, zones=", ".join(["%s"] * len(zones)), ra_ranges=ra_sql)
+    params = [*zones, *ra_params, dec_min, dec_max, object_type, object_type, _limit(limit)]
+    return sql, params
+
+
+# ===================================================
+# Searches
+# ===================================================
+
+def _run(pool, name, sql, params):
+    with pool.connection() as conn:
+        with get_query_metrics().track(name, sql) as stat:
+            with get_statement_cache().execute(conn, sql, params) as cursor:
+                rows = cursor.fetchall()
+                columns = [c[0] for c in cursor.description]
+            stat["rows"] = len(rows)
+    return columns, rows
+
+
+def cone_search(pool, ra, dec, radius_deg, object_type=None, limit=DEFAULT_SKY_LIMIT):
+    """(columns, rows) of the objects within ``radius_deg`` of (ra, dec), with SeparationDeg, nearest first."""
+    return _run(pool, "sky_cone", *cone_query(ra, dec, radius_deg, object_type, limit))
+
+
+def box_search(pool, ra_min, ra_max, dec_min, dec_max, object_type=None, limit=DEFAULT_SKY_LIMIT):
+    """(columns, rows) of the objects inside the RA/Dec box, in zone / RA order."""
+    return _run(pool, "sky_box", *box_query(ra_min, ra_max, dec_min, dec_max, object_type, limit))
@@ -0,0 +1,290 @@
+"""Precomputed Tab 2 dashboard: every summary from one scan-and-aggregate pass per source table.
+
+The snapshot is stored in DASHBOARD_SNAPSHOT (layer3.sql) with its generation
+time. There is one row per section, so a refresh only rebuilds the sections
+whose source tables changed (writes made through this process) or that are
+older than the maximum age (writes made elsewhere).
+
+Usage:
+    python astro_snapshot.py refresh [--section objects] [--force]
+    python astro_snapshot.py refresh --every 300       # scheduled refresh loop
+    python astro_snapshot.py show
+"""
+import argparse
+import decimal
+import json
+import os
+import sys
+import threading
+import time
+
+from astro_db import get_pool, get_query_cache
+from astro_metrics import get_query_metrics
+
+# --- Snapshot Configuration (override with environment variables) ---
+SNAPSHOT_CONFIG = {
+    # sections older than this are rebuilt even without a known change
+    'max_age_seconds': float(os.environ.get('ASTRO_SNAPSHOT_MAX_AGE', 300)),
+}
+
+# Per-type extremes in one scan of the catalog: each object gets its rank in all four
+# orderings and only rank-1 rows come back (at most four per type). NULLs sort last.
+OBJECT_EXTREMES_SQL = """
+SELECT ObjectType, ObjectName, Distance_Parsecs, Magnitude, Objects,
+       FarRank, NearRank, BrightRank, DimRank
+FROM (
+    SELECT ObjectType, ObjectName, Distance_Parsecs, Magnitude,
+           COUNT(*) OVER (PARTITION BY ObjectType) AS Objects,
+           ROW_NUMBER() OVER (PARTITION BY ObjectType ORDER BY Distance_Parsecs IS NULL, Distance_Parsecs DESC) AS FarRank,
+           ROW_NUMBER() OVER (PARTITION BY ObjectType ORDER BY Distance_Parsecs IS NULL, Distance_Parsecs ASC) AS NearRank,
+           ROW_NUMBER() OVER (PARTITION BY ObjectType ORDER BY Magnitude IS NULL, Magnitude ASC) AS BrightRank,
+           ROW_NUMBER() OVER (PARTITION BY ObjectType ORDER BY Magnitude IS NULL, Magnitude DESC) AS DimRank
+    FROM CELESTIALOBJECTS
+) AS ranked
+WHERE 1 IN (FarRank, NearRank, BrightRank, DimRank);
+"""
+
+# Telescope usage and seeing counts in one grouped scan of the observation join.
+# Timed counts only observations with a duration, so Minutes / Timed is AVG(DurationMinutes).
+OBSERVATION_TOTALS_SQL = """
+SELECT OS.TelescopeID, OS.SeeingCondition, COUNT(*) AS Observations,
+       COUNT(O.DurationMinutes) AS Timed, SUM(O.DurationMinutes) AS Minutes
+FROM OBSERVATIONS AS O
+JOIN OBSERVATIONSESSIONS AS OS ON O.SessionID = OS.SessionID
+GROUP BY OS.TelescopeID, OS.SeeingCondition;
+"""
+
+TELESCOPE_NAMES_SQL = "SELECT TelescopeID, Name FROM TELESCOPES"
+
+SNAPSHOT_LOAD_SQL = """
+SELECT Section, GeneratedAt, BuildMs, TIMESTAMPDIFF(SECOND, GeneratedAt, NOW(3)) AS AgeSeconds, Payload
+FROM DASHBOARD_SNAPSHOT
+"""
+
+_SNAPSHOT_STORE_SQL = """
+REPLACE INTO DASHBOARD_SNAPSHOT (Section, GeneratedAt, BuildMs, Payload)
+VALUES (%s, NOW(3), %s, %s)
+"""
+
+# (extreme key, rank column, value column) for the per-type extremes
+_EXTREMES = (
+    ("farthest", "FarRank", "Distance_Parsecs"),
+    ("nearest", "NearRank", "Distance_Parsecs"),
+    ("brightest", "BrightRank", "Magnitude"),
+    ("dimmest", "DimRank", "Magnitude"),
+)
+
+
+def _number(value):
+    return float(value) if isinstance(value, decimal.Decimal) else value
+
+
+def build_objects_section(cursor):
+    """{"by_type": {type: {"objects", "farthest": [name, parsecs], ...}}, "brightest", "dimmest"}."""
+    cursor.execute(OBJECT_EXTREMES_SQL)
+    columns = [c[0] for c in cursor.description]
+    by_type = {}
+    for row in cursor.fetchall():
+        r = dict(zip(columns, row))
+        entry = by_type.setdefault(r["ObjectType"], {"objects": r["Objects"]})
+        for key, rank, value in _EXTREMES:
+            if r[rank] == 1 and r[value] is not None:
+                entry[key] = [r["ObjectName"], _number(r[value])]
+    brightest = min((e["brightest"] for e in by_type.values() if "brightest" in e), key=lambda x: x[1], default=None)
+    dimmest = max((e["dimmest"] for e in by_type.values() if "dimmest" in e), key=lambda x: x[1], default=None)
+    return {"by_type": by_type, "brightest": brightest, "dimmest": dimmest}
+
+
+def build_observations_section(cursor):
+    """{"telescopes": [{"TelescopeID", "Name", "ObsCount", "TimedCount", "Minutes", "AvgDuration", "Hours"}],
+    "seeing": {cond: n}, "observations": n}."""
+    cursor.execute(TELESCOPE_NAMES_SQL)
+    names = dict(cursor.fetchall())
+    cursor.execute(OBSERVATION_TOTALS_SQL)
+    telescopes = {telescope_id: {"count": 0, "timed": 0, "minutes": 0} for telescope_id in names}
+    seeing, total = {}, 0
+    for telescope_id, condition, count, timed, minutes in cursor.fetchall():
+        minutes = _number(minutes) or 0
+        t = telescopes.setdefault(telescope_id, {"count": 0, "timed": 0, "minutes": 0})
+        t["count"] += count
+        t["timed"] += timed
+        t["minutes"] += minutes
+        seeing[condition or "Unknown"] = seeing.get(condition or "Unknown", 0) + count
+        total += count
+    rows = [
+        {
+            "TelescopeID": telescope_id, "Name": names.get(telescope_id),
+            "ObsCount": t["count"], "TimedCount": t["timed"], "Minutes": t["minutes"],
+            "AvgDuration": t["minutes"] / t["timed"] if t["timed"] else None,
+            "Hours": t["minutes"] / 60.0,
+        }
+        for telescope_id, t in sorted(telescopes.items(), key=lambda item: (item[0] is None, item[0] or 0))
+    ]
+    return {"telescopes": rows, "seeing": seeing, "observations": total}
+
+
+# section -> (source tables, builder)
+SNAPSHOT_SECTIONS = {
+    "objects": (("CELESTIALOBJECTS",), build_objects_section),
+    "observations": (("OBSERVATIONS", "OBSERVATIONSESSIONS", "TELESCOPES"), build_observations_section),
+}
+
+# query-cache table versions each section was built from (or first seen with) in this process
+_section_versions = {}
+_versions_lock = threading.Lock()
+
+
+def _source_versions(section):
+    return get_query_cache().table_versions(SNAPSHOT_SECTIONS[section][0])
+
+
+def refresh_snapshot(pool, sections=None):
+    """Rebuild the given sections (default: all) in one read-consistent pass; returns {section: build_ms}."""
+    sections = list(sections or SNAPSHOT_SECTIONS)
+    # versions are taken before reading, so a write racing with the build marks it stale again
+    versions = {section: _source_versions(section) for section in sections}
+    built = {}
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT, READ ONLY")
+            try:
+                for section in sections:
+                    started = time.perf_counter()
+                    with get_query_metrics().track(f"snapshot_{section}"):
+                        payload = SNAPSHOT_SECTIONS[section][1](cursor)
+                    built[section] = (payload, int((time.perf_counter() - started) * 1000))
+            finally:
+                conn.rollback()
+            for section, (payload, build_ms) in built.items():
+                cursor.execute(_SNAPSHOT_STORE_SQL, (section, build_ms, json.dumps(payload)))
+            conn.commit()
+        finally:
+            cursor.close()
+    with _versions_lock:
+        _section_versions.update(versions)
+    return {section: build_ms for section, (_, build_ms) in built.items()}
+
+
+def load_snapshot(pool):
+    """{section: {"generated_at", "build_ms", "age_s", **payload}} for every stored section."""
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            with get_query_metrics().track("snapshot_load", SNAPSHOT_LOAD_SQL):
+                cursor.execute(SNAPSHOT_LOAD_SQL)
+                rows = cursor.fetchall()
+        finally:
+            cursor.close()
+    snapshot = {}
+    for section, generated_at, build_ms, age_s, payload in rows:
+        if section not in SNAPSHOT_SECTIONS:
+            continue
+        snapshot[section] = dict(json.loads(payload), generated_at=generated_at, build_ms=build_ms, age_s=age_s)
+        with _versions_lock:
+            _section_versions.setdefault(section, _source_versions(section))
+    return snapshot
+
+
+def stale_sections(snapshot, max_age=None):
+    """Sections that are missing, older than ``max_age`` seconds, or whose tables this process wrote since."""
+    max_age = SNAPSHOT_CONFIG['max_age_seconds'] if max_age is None else max_age
+    stale = []
+    for section in SNAPSHOT_SECTIONS:
+        entry = snapshot.get(section)
+        with _versions_lock:
+            seen = _section_versions.get(section)
+        if entry is None or entry["age_s"] > max_age or seen != _source_versions(section):
+            stale.append(section)
+    return stale
+
+
+def ensure_snapshot(pool, max_age=None, force=False):
+    """Refresh what is stale (everything if ``force``) and return the loaded snapshot."""
+    snapshot = {} if force else load_snapshot(pool)
+    stale = list(SNAPSHOT_SECTIONS) if force else stale_sections(snapshot, max_age)
+    if stale:
+        refresh_snapshot(pool, stale)
+        snapshot = load_snapshot(pool)
+    return snapshot
+
+
+# ===================================================
+# Tab 2 answers from a loaded snapshot (same shapes as the astro_service functions)
+# ===================================================
+
+def snapshot_distance_extreme(snapshot, object_type, farthest=True):
+    entry = snapshot["objects"]["by_type"].get(object_type, {})
+    found = entry.get("farthest" if farthest else "nearest")
+    return tuple(found) if found else None
+
+
+def snapshot_magnitude_extreme(snapshot, brightest=True):
+    found = snapshot["objects"]["brightest" if brightest else "dimmest"]
+    return tuple(found) if found else None
+
+
+def snapshot_telescope_usage(snapshot, min_observations):
+    """(columns, rows) like telescope_usage(): Name, AvgDuration, ObsCount for telescopes above the count.
+
+    Grouped by telescope name like TELESCOPE_AGG_LIVE_SQL; observations without a
+    known telescope are left out, as the live join drops them.
+    """
+    by_name = {}
+    for t in snapshot["observations"]["telescopes"]:
+        if t["Name"] is None:
+            continue
+        agg = by_name.setdefault(t["Name"], {"count": 0, "timed": 0, "minutes": 0})
+        agg["count"] += t["ObsCount"]
+        agg["timed"] += t["TimedCount"]
+        agg["minutes"] += t["Minutes"]
+    rows = [
+        (name, agg["minutes"] / agg["timed"] if agg["timed"] else None, agg["count"])
+        for name, agg in sorted(by_name.items()) if agg["count"] > min_observations
+    ]
+    return ["Name", "AvgDuration", "ObsCount"], rows
+
+
+def snapshot_telescope_hours(snapshot, telescope_id):
+    """(Name, hours) like telescope_hours_report(); (None, None) for a telescope the snapshot does not know."""
+    for t in snapshot["observations"]["telescopes"]:
+        if t["TelescopeID"] == telescope_id:
+            return t["Name"], t["Hours"]
+    return None, None
+
+
+# ===================================================
+# CLI
+# ===================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or show the Tab 2 dashboard snapshot.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    refresh = sub.add_parser("refresh", help="rebuild stale (or all) snapshot sections")
+    refresh.add_argument("--section", action="append", choices=sorted(SNAPSHOT_SECTIONS), help="only these sections")
+    refresh.add_argument("--force", action="store_true", help="rebuild even if not stale")
+    refresh.add_argument("--every", type=float, help="keep refreshing every N seconds")
+    sub.add_parser("show", help="print the stored snapshot as JSON")
+    args = parser.parse_args(argv)
+
+    pool = get_pool()
+    if args.command == "show":
+        print(json.dumps(load_snapshot(pool), indent=2, default=str))
+        return 0
+
+    while True:
+        if args.force or args.every or args.section:
+            # this process never sees the app's writes, so a scheduled run rebuilds what it was asked for
+            sections = args.section or list(SNAPSHOT_SECTIONS)
+        else:
+            sections = stale_sections(load_snapshot(pool))
+        built = refresh_snapshot(pool, sections) if sections else {}
+        summary = ", ".join(f"{s} {ms} ms" for s, ms in built.items()) or "nothing stale"
+        print(f"{time.strftime('%H:%M:%S')} snapshot refreshed: {summary}", file=sys.stderr)
+        if not args.every:
+            return 0
+        time.sleep(args.every)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
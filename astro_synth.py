@@ -0,0 +1,348 @@
+"""Reproducible synthetic observatory data at benchmark scale (1e3 .. 1e7 observations).
+
+Usage:
+    python astro_synth.py generate --observations 100000 [--seed 42] [--skew 1.1]
+    python astro_synth.py purge
+
+Synthetic rows use their own ID ranges (SYNTHETIC_ID_BASE) so they never collide
+with the Table_Creation.sql sample data and can be purged again. For a given
+seed, skew and scale the generated data is identical between runs.
+"""
+import argparse
+import datetime
+import sys
+import time
+
+import numpy as np
+from mysql.connector import Error
+
+from astro_db import get_pool, get_query_cache
+from astro_ingest import OBSERVATION_INSERT_SQL, SESSION_INSERT_SQL
+
+DEFAULT_SEED = 42
+DEFAULT_SKEW = 1.1            # Zipf exponent for object / telescope / researcher popularity
+DEFAULT_BATCH_SIZE = 5000     # rows per executemany + commit
+GENERATION_BLOCK = 10000      # sessions drawn per RNG block (fixed, keeps output seed-stable)
+
+SYNTHETIC_ID_BASE = {
+    "RESEARCHERS": 100000,
+    "TELESCOPES": 100000,
+    "CELESTIALOBJECTS": 1000000,
+    "OBSERVATIONSESSIONS": 1000000,
+    "OBSERVATIONS": 10000000,
+}
+
+DATE_RANGE = (datetime.date(2015, 1, 1), datetime.date(2026, 12, 31))
+
+# (type, share of catalog, magnitude mean/sd, log10 distance pc mean/sd, redshift scale)
+OBJECT_TYPES = (
+    ("Star", 0.40, 9.0, 3.0, 2.0, 0.6, 0.00001),
+    ("Binary Star", 0.12, 8.0, 3.0, 2.2, 0.6, 0.00001),
+    ("Galaxy", 0.25, 12.0, 2.5, 6.5, 0.8, 0.02),
+    ("Nebula", 0.10, 8.5, 2.0, 3.3, 0.5, 0.0001),
+    ("Quasar", 0.05, 17.0, 1.5, 9.0, 0.4, 0.8),
+    ("Black Hole", 0.03, 11.0, 3.0, 4.0, 1.0, 0.001),
+    ("Exoplanet", 0.05, 13.0, 2.5, 1.8, 0.5, 0.000005),
+)
+SEEING_CONDITIONS = (("Excellent", 0.15), ("Good", 0.40), ("Fair", 0.25), ("Poor", 0.20))
+WEATHER_CONDITIONS = (("Clear", 0.55), ("Good", 0.20), ("Fair", 0.10), ("Cloudy", 0.10), ("Windy", 0.05))
+QUALITY_WEIGHTS = (0.05, 0.10, 0.25, 0.35, 0.25)     # ratings 1..5
+DISCOVERERS = (
+    "Galileo Galilei", "Charles Messier", "William Herschel", "Edwin Hubble", "Caroline Herschel",
+    "Henrietta Leavitt", "Cyril Hazard", "Jocelyn Bell Burnell", "Vera Rubin", "Clyde Tombaugh",
+)
+INSTITUTIONS = (
+    "PESU Astro Lab", "Max Planck Institute", "NASA JPL", "Indian Institute of Space",
+    "Beijing Observatory", "Complutense Univ.", "Stellar Dynamics Inst.", "Nebula Research Group",
+)
+SITES = ("Chile, Atacama", "Hawaii, Mauna Kea", "South Africa", "Canary Islands", "Orbit", "California", "India, Hanle")
+MOUNTS = ("Altazimuth", "Equatorial", "Fixed Reflector")
+MIRRORS = ("Zerodur Glass", "Fused Silica", "Borosilicate", "Aluminum", "Beryllium")
+NOTE_WORDS = (
+    "photometry", "spectroscopy", "transit", "deep field", "wide field", "calibration",
+    "faint", "bright", "variable", "flare", "occultation", "redshift", "poor signal",
+    "tracking error", "clouds", "excellent seeing", "follow-up", "survey",
+)
+
+
+def dataset_shape(observations):
+    """Row counts per table for a target observation count."""
+    observations = int(observations)
+    return {
+        "RESEARCHERS": max(10, observations // 500),
+        "TELESCOPES": min(500, max(10, observations // 20000)),
+        "CELESTIALOBJECTS": max(12, observations // 50),
+        "OBSERVATIONS": observations,
+    }
+
+
+def zipf_weights(n, skew):
+    """Popularity weights ~ 1 / rank^skew, shuffled so popular IDs are spread out."""
+    weights = 1.0 / np.arange(1, n + 1) ** skew
+    return weights / weights.sum()
+
+
+def _pick(rng, choices, size):
+    labels, weights = zip(*choices)
+    return np.asarray(labels, dtype=object)[rng.choice(len(labels), size=size, p=np.asarray(weights) / sum(weights))]
+
+
+def _dates(rng, size):
+    """Session dates that grow denser towards the present (observatory usage ramps up)."""
+    start, end = DATE_RANGE
+    span = (end - start).days
+    offsets = (np.sqrt(rng.random(size)) * span).astype(int)
+    return [start + datetime.timedelta(days=int(d)) for d in offsets]
+
+
+# ===================================================
+# Dimension tables
+# ===================================================
+
+def _researcher_rows(rng, count):
+    base = SYNTHETIC_ID_BASE["RESEARCHERS"]
+    experience = rng.integers(0, 40, size=count)
+    return [
+        (base + i, f"Synthetic Researcher {i}", INSTITUTIONS[i % len(INSTITUTIONS)],
+         f"r{base + i}@synthetic.astro", datetime.date(1960 + i % 40, 1 + i % 12, 1 + i % 28), int(experience[i]))
+        for i in range(count)
+    ]
+
+
+def _telescope_rows(rng, count):
+    base = SYNTHETIC_ID_BASE["TELESCOPES"]
+    apertures = np.round(rng.lognormal(1.0, 0.9, size=count) + 0.3, 2)
+    return [
+        (base + i, f"Synthetic Telescope {i}", SITES[i % len(SITES)], float(apertures[i]),
+         MIRRORS[i % len(MIRRORS)], MOUNTS[i % len(MOUNTS)])
+        for i in range(count)
+    ]
+
+
+def _object_rows(rng, count):
+    base = SYNTHETIC_ID_BASE["CELESTIALOBJECTS"]
+    type_index = rng.choice(len(OBJECT_TYPES), size=count, p=[t[1] for t in OBJECT_TYPES])
+    rows = []
+    for i, t in enumerate(type_index):
+        name, _, mag_mu, mag_sd, dist_mu, dist_sd, z_scale = OBJECT_TYPES[t]
+        magnitude = float(np.clip(rng.normal(mag_mu, mag_sd), -30, 30))
+        distance = float(10 ** rng.normal(dist_mu, dist_sd))
+        redshift = float(rng.exponential(z_scale))
+        ra = f"{rng.integers(0, 24):02d}h {rng.integers(0, 60):02d}m {rng.integers(0, 60):02d}s"
+        dec_deg = int(rng.integers(-89, 90))
+        dec = f"{'+' if dec_deg >= 0 else '-'}{abs(dec_deg):02d}d {rng.integers(0, 60):02d}m {rng.integers(0, 60):02d}s"
+        rows.append((
+            base + i, f"SYN-{name.replace(' ', '')}-{base + i}", name, round(magnitude, 2), ra, dec,
+            None, distance, redshift, float(10 ** rng.normal(8, 3)), float(10 ** rng.normal(0, 2)),
+        ))
+    return rows
+
+
+_DIMENSION_SQL = {
+    "RESEARCHERS": "INSERT INTO RESEARCHERS (ResearcherID, Name, Institution, Email, DOB, InitialExperience) "
+                   "VALUES (%s, %s, %s, %s, %s, %s)",
+    "TELESCOPES": "INSERT INTO TELESCOPES (TelescopeID, Name, Location, ApertureSize, PrimaryMirrorMaterial, MountType) "
+                  "VALUES (%s, %s, %s, %s, %s, %s)",
+    "CELESTIALOBJECTS": "INSERT INTO CELESTIALOBJECTS (ObjectID, ObjectName, ObjectType, Magnitude, RightAscension, "
+                        "Declination, LastObservedDate, Distance_Parsecs, Redshift, Diameter_km, Mass_SolarMass) "
+                        "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+    "OBJECTDISCOVERY": "INSERT INTO OBJECTDISCOVERY (ObjectID, DiscovererName, DiscoveryDate) VALUES (%s, %s, %s)",
+}
+
+
+def _insert_batches(conn, sql, rows, batch_size):
+    cursor = conn.cursor()
+    try:
+        for start in range(0, len(rows), batch_size):
+            cursor.executemany(sql, rows[start:start + batch_size])
+            conn.commit()
+    finally:
+        cursor.close()
+
+
+# ===================================================
+# Fact tables (streamed in blocks)
+# ===================================================
+
+def iter_session_blocks(rng, shape, skew):
+    """Yield (session_rows, observation_rows) blocks until the observation target is reached."""
+    researcher_p = zipf_weights(shape["RESEARCHERS"], skew)
+    telescope_p = zipf_weights(shape["TELESCOPES"], skew)
+    object_p = zipf_weights(shape["CELESTIALOBJECTS"], skew)
+    researcher_ids = SYNTHETIC_ID_BASE["RESEARCHERS"] + rng.permutation(shape["RESEARCHERS"])
+    telescope_ids = SYNTHETIC_ID_BASE["TELESCOPES"] + rng.permutation(shape["TELESCOPES"])
+    object_ids = SYNTHETIC_ID_BASE["CELESTIALOBJECTS"] + rng.permutation(shape["CELESTIALOBJECTS"])
+
+    next_session = SYNTHETIC_ID_BASE["OBSERVATIONSESSIONS"]
+    next_observation = SYNTHETIC_ID_BASE["OBSERVATIONS"]
+    remaining = shape["OBSERVATIONS"]
+    while remaining > 0:
+        # 1 + Poisson(3) observations per session
+        per_session = 1 + rng.poisson(3, size=GENERATION_BLOCK)
+        per_session = per_session[np.cumsum(per_session) - per_session < remaining]
+        per_session[-1] -= max(0, int(per_session.sum()) - remaining)
+        n_sessions, n_obs = len(per_session), int(per_session.sum())
+
+        dates = _dates(rng, n_sessions)
+        researchers = researcher_ids[rng.choice(len(researcher_ids), size=n_sessions, p=researcher_p)]
+        telescopes = telescope_ids[rng.choice(len(telescope_ids), size=n_sessions, p=telescope_p)]
+        weather = _pick(rng, WEATHER_CONDITIONS, n_sessions)
+        seeing = _pick(rng, SEEING_CONDITIONS, n_sessions)
+        sessions = [
+            (next_session + i, dates[i], weather[i], seeing[i], int(researchers[i]), int(telescopes[i]))
+            for i in range(n_sessions)
+        ]
+
+        session_of_obs = np.repeat(np.arange(n_sessions), per_session)
+        objects = object_ids[rng.choice(len(object_ids), size=n_obs, p=object_p)]
+        durations = np.clip(rng.lognormal(3.4, 0.7, size=n_obs), 1, 600).astype(int)
+        quality = 1 + rng.choice(5, size=n_obs, p=QUALITY_WEIGHTS)
+        seconds = (18 * 3600 + rng.integers(0, 12 * 3600, size=n_obs)) % 86400
+        words = rng.integers(0, len(NOTE_WORDS), size=(n_obs, 3))
+        observations = [
+            (next_observation + j, next_session + int(session_of_obs[j]), int(objects[j]), int(durations[j]),
+             " ".join(NOTE_WORDS[w] for w in words[j]) + ".",
+             f"{seconds[j] // 3600:02d}:{seconds[j] % 3600 // 60:02d}:{seconds[j] % 60:02d}", int(quality[j]))
+            for j in range(n_obs)
+        ]
+        yield sessions, observations
+
+        next_session += n_sessions
+        next_observation += n_obs
+        remaining -= n_obs
+
+
+def generate(pool, observations, seed=DEFAULT_SEED, skew=DEFAULT_SKEW, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """Insert a synthetic dataset; returns a report with row counts and insert throughput.
+
+    Observations go through the normal INSERT path, so the layer2/layer3
+    triggers fire for every row exactly as they do for real data.
+    """
+    rng = np.random.default_rng(seed)
+    shape = dataset_shape(observations)
+    started = time.perf_counter()
+    report = {"seed": seed, "skew": skew, "shape": shape, "sessions": 0, "observations": 0, "discoveries": 0}
+
+    discovered = rng.random(shape["CELESTIALOBJECTS"]) < 0.3
+    discoverer = rng.choice(len(DISCOVERERS), size=shape["CELESTIALOBJECTS"], p=zipf_weights(len(DISCOVERERS), skew))
+    discovery_rows = [
+        (SYNTHETIC_ID_BASE["CELESTIALOBJECTS"] + i, DISCOVERERS[discoverer[i]], datetime.date(1600 + i % 420, 1, 1))
+        for i in np.flatnonzero(discovered).tolist()
+    ]
+    with pool.connection() as conn:
+        _insert_batches(conn, _DIMENSION_SQL["RESEARCHERS"], _researcher_rows(rng, shape["RESEARCHERS"]), batch_size)
+        _insert_batches(conn, _DIMENSION_SQL["TELESCOPES"], _telescope_rows(rng, shape["TELESCOPES"]), batch_size)
+        _insert_batches(conn, _DIMENSION_SQL["CELESTIALOBJECTS"], _object_rows(rng, shape["CELESTIALOBJECTS"]), batch_size)
+        _insert_batches(conn, _DIMENSION_SQL["OBJECTDISCOVERY"], discovery_rows, batch_size)
+        report["discoveries"] = len(discovery_rows)
+
+        cursor = conn.cursor()
+        try:
+            for sessions, obs_rows in iter_session_blocks(rng, shape, skew):
+                cursor.executemany(SESSION_INSERT_SQL, sessions)
+                conn.commit()
+                for start in range(0, len(obs_rows), batch_size):
+                    cursor.executemany(OBSERVATION_INSERT_SQL, obs_rows[start:start + batch_size])
+                    conn.commit()
+                report["sessions"] += len(sessions)
+                report["observations"] += len(obs_rows)
+                report["elapsed_s"] = time.perf_counter() - started
+                report["observations_per_sec"] = report["observations"] / report["elapsed_s"]
+                if progress:
+                    progress(report)
+        finally:
+            cursor.close()
+    get_query_cache().clear()
+
+    report["elapsed_s"] = time.perf_counter() - started
+    report["observations_per_sec"] = report["observations"] / report["elapsed_s"] if report["elapsed_s"] else 0.0
+    return report
+
+
+# ===================================================
+# Cleanup
+# ===================================================
+
+# children first; (table, id column, base key)
+_PURGE_ORDER = (
+    ("OBSERVATION_LOG", "ObservationID", "OBSERVATIONS"),
+    ("OBSERVATION_LOG_ARCHIVE", "ObservationID", "OBSERVATIONS"),
+    ("OBSERVATIONS_ARCHIVE", "ObservationID", "OBSERVATIONS"),
+    ("OBSERVATIONS", "ObservationID", "OBSERVATIONS"),
+    ("OBSERVATIONSESSIONS", "SessionID", "OBSERVATIONSESSIONS"),
+    ("OBJECTDISCOVERY", "ObjectID", "CELESTIALOBJECTS"),
+    ("CELESTIALOBJECTS", "ObjectID", "CELESTIALOBJECTS"),
+    ("TELESCOPE_UTILIZATION_DAILY", "TelescopeID", "TELESCOPES"),
+    ("TELESCOPE_UTILIZATION", "TelescopeID", "TELESCOPES"),
+    ("TELESCOPES", "TelescopeID", "TELESCOPES"),
+    ("RESEARCHERS", "ResearcherID", "RESEARCHERS"),
+)
+
+
+def purge(pool, batch_size=50000):
+    """Delete every synthetic row (in bounded batches); returns {table: rows deleted}."""
+    deleted = {}
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        try:
+            for table, column, base_key in _PURGE_ORDER:
+                deleted[table] = 0
+                while True:
+                    try:
+                        cursor.execute(
+                            f"DELETE FROM {table} WHERE {column} >= %s LIMIT {int(batch_size)}",
+                            (SYNTHETIC_ID_BASE[base_key],),
+                        )
+                    except Error as err:
+                        if err.errno == 1146:   # optional table (layer3.sql) not installed
+                            break
+                        raise
+                    conn.commit()
+                    deleted[table] += cursor.rowcount
+                    if cursor.rowcount < batch_size:
+                        break
+        finally:
+            cursor.close()
+    get_query_cache().clear()
+    return deleted
+
+
+# ===================================================
+# CLI
+# ===================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate or purge synthetic benchmark data.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    gen = sub.add_parser("generate", help="insert a synthetic dataset")
+    gen.add_argument("--observations", type=float, default=1e4, help="target observation count (1e3 .. 1e7)")
+    gen.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    gen.add_argument("--skew", type=float, default=DEFAULT_SKEW, help="Zipf exponent for popularity skew")
+    gen.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    gen.add_argument("--purge", action="store_true", help="remove earlier synthetic rows first")
+
+    sub.add_parser("purge", help="delete all synthetic rows")
+
+    args = parser.parse_args(argv)
+    pool = get_pool()
+    if args.command == "purge" or args.purge:
+        deleted = purge(pool)
+        print("Purged: " + ", ".join(f"{t}={n}" for t, n in deleted.items() if n))
+        if args.command == "purge":
+            return 0
+
+    def progress(r):
+        print(f"  {r['observations']} observations, {r['observations_per_sec']:.0f} rows/s", file=sys.stderr)
+
+    report = generate(pool, int(args.observations), seed=args.seed, skew=args.skew,
+                      batch_size=args.batch_size, progress=progress)
+    print(f"Generated {report['shape']['RESEARCHERS']} researchers, {report['shape']['TELESCOPES']} telescopes, "
+          f"{report['shape']['CELESTIALOBJECTS']} objects, {report['sessions']} sessions, "
+          f"{report['observations']} observations in {report['elapsed_s']:.1f}s "
+          f"({report['observations_per_sec']:.0f} observations/s).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+from astro_metrics import get_query_metrics
+
+# ===================================================
+# Batched Foreign-Key / Duplicate Pre-Validation
+# ===================================================
+# Resolves every key referenced by a list of pending observation entries in
+# one UNION ALL round-trip (per chunk of keys) instead of one SELECT per key.
+
+# (report flag, table, column, entry field, flag raised when the key EXISTS)
+KEY_CHECKS = (
+    ("researcher_missing", "RESEARCHERS", "ResearcherID", "researcher_id", False),
+    ("tel_missing", "TELESCOPES", "TelescopeID", "telescope_id", False),
+    ("obj_missing", "CELESTIALOBJECTS", "ObjectID", "object_id", False),
+    ("sess_dup", "OBSERVATIONSESSIONS", "SessionID", "session_id", True),
+    ("obs_dup", "OBSERVATIONS", "ObservationID", "obs_id", True),
+)
+
+PROBLEM_MESSAGES = {
+    "researcher_missing": "ResearcherID {researcher_id} does not exist.",
+    "tel_missing": "TelescopeID {telescope_id} does not exist.",
+    "obj_missing": "ObjectID {object_id} does not exist.",
+    "sess_dup": "SessionID {session_id} already exists.",
+    "obs_dup": "ObservationID {obs_id} already exists.",
+    "obs_batch_dup": "ObservationID {obs_id} appears more than once in this batch.",
+}
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def fetch_existing_keys(conn, keys_by_table, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Return {(table, column): set(existing values)} for the requested keys.
+
+    ``keys_by_table`` maps (table, column) -> iterable of values. All tables are
+    probed in a single UNION ALL statement per ``chunk_size`` keys, so a single
+    entry costs exactly one round-trip.
+    """
+    wanted = {tc: sorted(set(v for v in values if v is not None)) for tc, values in keys_by_table.items()}
+    found = {tc: set() for tc in wanted}
+    column_of = {table: column for table, column in wanted}
+    longest = max((len(v) for v in wanted.values()), default=0)
+    cursor = conn.cursor()
+    try:
+        for start in range(0, longest, chunk_size):
+            parts, params = [], []
+            for (table, column), values in wanted.items():
+                chunk = values[start:start + chunk_size]
+                if not chunk:
+                    continue
+                placeholders = ", ".join(["%s"] * len(chunk))
+                parts.append(
+                    f"SELECT '{table}' AS tbl, {column} AS id FROM {table} WHERE {column} IN ({placeholders})"
+                )
+                params.extend(chunk)
+            sql = " UNION ALL ".join(parts)
+            with get_query_metrics().track("validate_keys", sql) as stat:
+                cursor.execute(sql, params)
+                rows = cursor.fetchall()
+                stat["rows"] = len(rows)
+            for table, key in rows:
+                found[(table, column_of[table])].add(key)
+    finally:
+        cursor.close()
+    return found
+
+
+def validate_observations(pool, entries, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Validate pending observation entries against the database in bulk.
+
+    Each entry is a dict with session_id, researcher_id, telescope_id,
+    object_id and obs_id (the same shape TAB 4 keeps in ``pending_obs``).
+    Returns one report dict per entry, in order, carrying the boolean flags
+    researcher_missing / tel_missing / obj_missing / sess_dup / obs_dup /
+    obs_batch_dup, an ``ok`` flag and a list of human-readable ``problems``.
+    """
+    entries = list(entries)
+    keys_by_table = {
+        (table, column): [e.get(field) for e in entries]
+        for _, table, column, field, _ in KEY_CHECKS
+    }
+    with pool.connection() as conn:
+        found = fetch_existing_keys(conn, keys_by_table, chunk_size)
+
+    seen_obs = set()
+    reports = []
+    for entry in entries:
+        report = {}
+        for flag, table, column, field, flag_if_exists in KEY_CHECKS:
+            exists = entry.get(field) in found[(table, column)]
+            report[flag] = exists if flag_if_exists else not exists
+        report["obs_batch_dup"] = entry.get("obs_id") in seen_obs
+        seen_obs.add(entry.get("obs_id"))
+        report["problems"] = [
+            PROBLEM_MESSAGES[flag].format(**entry) for flag in PROBLEM_MESSAGES if report[flag]
+        ]
+        report["ok"] = not report["problems"]
+        reports.append(report)
+    return reports
+
+
+def summarize_problems(reports):
+    """Count failing entries per problem flag, e.g. {'obj_missing': 12}."""
+    summary = {}
+    for report in reports:
+        for flag in PROBLEM_MESSAGES:
+            if report[flag]:
+                summary[flag] = summary.get(flag, 0) + 1
+    return summary
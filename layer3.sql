@@ -0,0 +1,819 @@
+-- ===================================================
+-- LAYER 3: Performance Layer
+-- Run after Table_Creation.sql and layer2.sql.
+-- ===================================================
+USE astro_observatory;
+
+
+-- Index Migration 1: Secondary indexes for the app's hot predicates
+-- Each index matches one access path used by the Streamlit tabs or the stored routines.
+-- Verify the plans with Tab 2 -> "Query Plan Report (EXPLAIN)".
+
+-- Join Query (Tab 2 #2): WHERE OS.SeeingCondition = ? then join to TELESCOPES; Date is returned.
+CREATE INDEX idx_sessions_seeing ON OBSERVATIONSESSIONS (SeeingCondition, TelescopeID, Date);
+
+-- archive_old_observations / time-window queries: WHERE OS.Date < cutoff
+CREATE INDEX idx_sessions_date ON OBSERVATIONSESSIONS (Date);
+
+-- Nested Query (Tab 2 #1): WHERE OD.DiscovererName = ?
+CREATE INDEX idx_discovery_discoverer ON OBJECTDISCOVERY (DiscovererName, ObjectID);
+
+-- Farthest / Nearest (Tab 2 #4): WHERE ObjectType = ? ORDER BY Distance_Parsecs LIMIT 1
+-- ObjectName is included so the lookup never touches the base row (covering index).
+CREATE INDEX idx_objects_type_distance ON CELESTIALOBJECTS (ObjectType, Distance_Parsecs, ObjectName);
+
+-- Brightest / Dimmest (Tab 2 #5): ORDER BY Magnitude LIMIT 1 (optionally per type)
+CREATE INDEX idx_objects_magnitude ON CELESTIALOBJECTS (Magnitude, ObjectName);
+CREATE INDEX idx_objects_type_magnitude ON CELESTIALOBJECTS (ObjectType, Magnitude, ObjectName);
+
+-- archive_old_observations: WHERE DataQualityRating < ? joined on SessionID
+CREATE INDEX idx_observations_quality ON OBSERVATIONS (DataQualityRating, SessionID);
+
+-- Every OBSERVATIONS <-> OBSERVATIONSESSIONS aggregate (telescope usage, utilization hours,
+-- researcher totals) reads only SessionID + DurationMinutes: covering index for the join.
+CREATE INDEX idx_observations_session_duration ON OBSERVATIONS (SessionID, DurationMinutes, ObjectID);
+
+-- (Sessions by TelescopeID / ResearcherID are already served by the implicit FK indexes,
+--  which InnoDB extends with the SessionID primary key.)
+
+-- Verify:
+-- EXPLAIN SELECT ObjectName, Distance_Parsecs FROM CELESTIALOBJECTS WHERE ObjectType = 'Galaxy' ORDER BY Distance_Parsecs DESC LIMIT 1;
+-- -- key = idx_objects_type_distance, Extra = 'Using where; Backward index scan; Using index'
+
+
+-- Trigger 3-6: Incrementally maintained RESEARCHERS.TotalObservationMinutes
+-- Every OBSERVATIONS insert/update/delete adjusts the owning researcher's total by the
+-- difference only (O(1) per write) instead of re-aggregating the researcher's history.
+-- update_researcher_total_time (layer2.sql) stays as the per-researcher repair path, and
+-- rebuild_all_researcher_totals below is the full rebuild. Needs MySQL 5.7.2+ (several
+-- triggers per table event).
+
+DELIMITER //
+CREATE TRIGGER trg_researcher_minutes_insert
+AFTER INSERT ON OBSERVATIONS
+FOR EACH ROW
+BEGIN
+    UPDATE RESEARCHERS AS R
+    JOIN OBSERVATIONSESSIONS AS OS ON OS.ResearcherID = R.ResearcherID
+    SET R.TotalObservationMinutes = IFNULL(R.TotalObservationMinutes, 0) + IFNULL(NEW.DurationMinutes, 0)
+    WHERE OS.SessionID = NEW.SessionID;
+END //
+
+CREATE TRIGGER trg_researcher_minutes_delete
+AFTER DELETE ON OBSERVATIONS
+FOR EACH ROW
+BEGIN
+    UPDATE RESEARCHERS AS R
+    JOIN OBSERVATIONSESSIONS AS OS ON OS.ResearcherID = R.ResearcherID
+    SET R.TotalObservationMinutes = IFNULL(R.TotalObservationMinutes, 0) - IFNULL(OLD.DurationMinutes, 0)
+    WHERE OS.SessionID = OLD.SessionID;
+END //
+
+CREATE TRIGGER trg_researcher_minutes_update
+AFTER UPDATE ON OBSERVATIONS
+FOR EACH ROW
+BEGIN
+    -- Only duration changes and moves to another session affect the totals
+    IF NOT (OLD.SessionID <=> NEW.SessionID) OR NOT (OLD.DurationMinutes <=> NEW.DurationMinutes) THEN
+        UPDATE RESEARCHERS AS R
+        JOIN OBSERVATIONSESSIONS AS OS ON OS.ResearcherID = R.ResearcherID
+        SET R.TotalObservationMinutes = IFNULL(R.TotalObservationMinutes, 0) - IFNULL(OLD.DurationMinutes, 0)
+        WHERE OS.SessionID = OLD.SessionID;
+
+        UPDATE RESEARCHERS AS R
+        JOIN OBSERVATIONSESSIONS AS OS ON OS.ResearcherID = R.ResearcherID
+        SET R.TotalObservationMinutes = IFNULL(R.TotalObservationMinutes, 0) + IFNULL(NEW.DurationMinutes, 0)
+        WHERE OS.SessionID = NEW.SessionID;
+    END IF;
+END //
+
+-- A session handed over to another researcher moves all of its minutes with it
+CREATE TRIGGER trg_researcher_minutes_session_reassign
+AFTER UPDATE ON OBSERVATIONSESSIONS
+FOR EACH ROW
+BEGIN
+    DECLARE session_minutes INT;
+
+    IF NOT (OLD.ResearcherID <=> NEW.ResearcherID) THEN
+        SELECT IFNULL(SUM(DurationMinutes), 0) INTO session_minutes
+        FROM OBSERVATIONS
+        WHERE SessionID = NEW.SessionID;
+
+        UPDATE RESEARCHERS
+        SET TotalObservationMinutes = IFNULL(TotalObservationMinutes, 0) - session_minutes
+        WHERE ResearcherID = OLD.ResearcherID;
+
+        UPDATE RESEARCHERS
+        SET TotalObservationMinutes = IFNULL(TotalObservationMinutes, 0) + session_minutes
+        WHERE ResearcherID = NEW.ResearcherID;
+    END IF;
+END //
+DELIMITER ;
+
+
+-- Procedure 3: Rebuild All Researcher Totals (full repair)
+-- One set-based pass over OBSERVATIONS instead of one update_researcher_total_time call per researcher.
+
+DELIMITER //
+CREATE PROCEDURE rebuild_all_researcher_totals ()
+BEGIN
+    UPDATE RESEARCHERS AS R
+    LEFT JOIN (
+        SELECT OS.ResearcherID, SUM(O.DurationMinutes) AS Minutes
+        FROM OBSERVATIONS AS O
+        JOIN OBSERVATIONSESSIONS AS OS ON O.SessionID = OS.SessionID
+        GROUP BY OS.ResearcherID
+    ) AS T ON T.ResearcherID = R.ResearcherID
+    SET R.TotalObservationMinutes = IFNULL(T.Minutes, 0);
+END //
+DELIMITER ;
+
+-- Bring the stored totals in line once, so the triggers start from correct values
+CALL rebuild_all_researcher_totals();
+
+-- Consistency check (should return no rows):
+-- SELECT R.ResearcherID, R.TotalObservationMinutes, SUM(O.DurationMinutes)
+-- FROM RESEARCHERS R LEFT JOIN OBSERVATIONSESSIONS OS ON OS.ResearcherID = R.ResearcherID
+-- LEFT JOIN OBSERVATIONS O ON O.SessionID = OS.SessionID
+-- GROUP BY R.ResearcherID, R.TotalObservationMinutes
+-- HAVING NOT (R.TotalObservationMinutes <=> IFNULL(SUM(O.DurationMinutes), 0));
+
+
+-- Summary Tables: Materialized telescope utilization
+-- Per-telescope and per-telescope-per-day observation counts and minutes, kept current by
+-- the triggers below, so utilization lookups read one row instead of joining every
+-- session and observation of the telescope. TimedCount counts only observations that
+-- have a DurationMinutes, so TotalMinutes / TimedCount matches AVG(DurationMinutes).
+
+CREATE TABLE TELESCOPE_UTILIZATION (
+    TelescopeID INT PRIMARY KEY,
+    ObservationCount INT NOT NULL DEFAULT 0,
+    TimedCount INT NOT NULL DEFAULT 0,
+    TotalMinutes BIGINT NOT NULL DEFAULT 0,
+    FOREIGN KEY (TelescopeID) REFERENCES TELESCOPES(TelescopeID)
+);
+
+CREATE TABLE TELESCOPE_UTILIZATION_DAILY (
+    TelescopeID INT,
+    UsageDate DATE,
+    ObservationCount INT NOT NULL DEFAULT 0,
+    TimedCount INT NOT NULL DEFAULT 0,
+    TotalMinutes BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (TelescopeID, UsageDate),
+    FOREIGN KEY (TelescopeID) REFERENCES TELESCOPES(TelescopeID)
+);
+
+
+-- Procedure 4: Apply a usage delta to both summary tables (called by the triggers)
+
+DELIMITER //
+CREATE PROCEDURE apply_telescope_usage_delta (
+    IN telescope_id_in INT,
+    IN usage_date_in DATE,
+    IN count_delta INT,
+    IN timed_delta INT,
+    IN minutes_delta INT
+)
+BEGIN
+    IF telescope_id_in IS NOT NULL THEN
+        INSERT INTO TELESCOPE_UTILIZATION (TelescopeID, ObservationCount, TimedCount, TotalMinutes)
+        VALUES (telescope_id_in, count_delta, timed_delta, minutes_delta)
+        ON DUPLICATE KEY UPDATE
+            ObservationCount = ObservationCount + VALUES(ObservationCount),
+            TimedCount = TimedCount + VALUES(TimedCount),
+            TotalMinutes = TotalMinutes + VALUES(TotalMinutes);
+
+        INSERT INTO TELESCOPE_UTILIZATION_DAILY (TelescopeID, UsageDate, ObservationCount, TimedCount, TotalMinutes)
+        VALUES (telescope_id_in, usage_date_in, count_delta, timed_delta, minutes_delta)
+        ON DUPLICATE KEY UPDATE
+            ObservationCount = ObservationCount + VALUES(ObservationCount),
+            TimedCount = TimedCount + VALUES(TimedCount),
+            TotalMinutes = TotalMinutes + VALUES(TotalMinutes);
+    END IF;
+END //
+DELIMITER ;
+
+
+-- Trigger 7-10: Keep the utilization summaries current
+
+DELIMITER //
+CREATE TRIGGER trg_telescope_usage_insert
+AFTER INSERT ON OBSERVATIONS
+FOR EACH ROW
+BEGIN
+    DECLARE tel_id INT;
+    DECLARE session_date DATE;
+
+    SELECT TelescopeID, Date INTO tel_id, session_date
+    FROM OBSERVATIONSESSIONS
+    WHERE SessionID = NEW.SessionID;
+
+    CALL apply_telescope_usage_delta(tel_id, session_date, 1, NEW.DurationMinutes IS NOT NULL, IFNULL(NEW.DurationMinutes, 0));
+END //
+
+CREATE TRIGGER trg_telescope_usage_delete
+AFTER DELETE ON OBSERVATIONS
+FOR EACH ROW
+BEGIN
+    DECLARE tel_id INT;
+    DECLARE session_date DATE;
+
+    SELECT TelescopeID, Date INTO tel_id, session_date
+    FROM OBSERVATIONSESSIONS
+    WHERE SessionID = OLD.SessionID;
+
+    CALL apply_telescope_usage_delta(tel_id, session_date, -1, -(OLD.DurationMinutes IS NOT NULL), -IFNULL(OLD.DurationMinutes, 0));
+END //
+
+CREATE TRIGGER trg_telescope_usage_update
+AFTER UPDATE ON OBSERVATIONS
+FOR EACH ROW
+BEGIN
+    DECLARE tel_id INT;
+    DECLARE session_date DATE;
+
+    IF NOT (OLD.SessionID <=> NEW.SessionID) OR NOT (OLD.DurationMinutes <=> NEW.DurationMinutes) THEN
+        SELECT TelescopeID, Date INTO tel_id, session_date
+        FROM OBSERVATIONSESSIONS
+        WHERE SessionID = OLD.SessionID;
+        CALL apply_telescope_usage_delta(tel_id, session_date, -1, -(OLD.DurationMinutes IS NOT NULL), -IFNULL(OLD.DurationMinutes, 0));
+
+        SET tel_id = NULL;
+        SELECT TelescopeID, Date INTO tel_id, session_date
+        FROM OBSERVATIONSESSIONS
+        WHERE SessionID = NEW.SessionID;
+        CALL apply_telescope_usage_delta(tel_id, session_date, 1, NEW.DurationMinutes IS NOT NULL, IFNULL(NEW.DurationMinutes, 0));
+    END IF;
+END //
+
+-- A session moved to another telescope or date carries its observations with it
+CREATE TRIGGER trg_telescope_usage_session_move
+AFTER UPDATE ON OBSERVATIONSESSIONS
+FOR EACH ROW
+BEGIN
+    DECLARE session_count INT;
+    DECLARE session_timed INT;
+    DECLARE session_minutes INT;
+
+    IF NOT (OLD.TelescopeID <=> NEW.TelescopeID) OR NOT (OLD.Date <=> NEW.Date) THEN
+        SELECT COUNT(*), COUNT(DurationMinutes), IFNULL(SUM(DurationMinutes), 0)
+        INTO session_count, session_timed, session_minutes
+        FROM OBSERVATIONS
+        WHERE SessionID = NEW.SessionID;
+
+        IF session_count > 0 THEN
+            CALL apply_telescope_usage_delta(OLD.TelescopeID, OLD.Date, -session_count, -session_timed, -session_minutes);
+            CALL apply_telescope_usage_delta(NEW.TelescopeID, NEW.Date, session_count, session_timed, session_minutes);
+        END IF;
+    END IF;
+END //
+DELIMITER ;
+
+
+-- Procedure 5: Rebuild Telescope Utilization (full refresh / repair)
+
+DELIMITER //
+CREATE PROCEDURE rebuild_telescope_utilization ()
+BEGIN
+    DELETE FROM TELESCOPE_UTILIZATION_DAILY;
+    DELETE FROM TELESCOPE_UTILIZATION;
+
+    INSERT INTO TELESCOPE_UTILIZATION_DAILY (TelescopeID, UsageDate, ObservationCount, TimedCount, TotalMinutes)
+    SELECT OS.TelescopeID, OS.Date, COUNT(*), COUNT(O.DurationMinutes), IFNULL(SUM(O.DurationMinutes), 0)
+    FROM OBSERVATIONS AS O
+    JOIN OBSERVATIONSESSIONS AS OS ON O.SessionID = OS.SessionID
+    WHERE OS.TelescopeID IS NOT NULL
+    GROUP BY OS.TelescopeID, OS.Date;
+
+    INSERT INTO TELESCOPE_UTILIZATION (TelescopeID, ObservationCount, TimedCount, TotalMinutes)
+    SELECT TelescopeID, SUM(ObservationCount), SUM(TimedCount), SUM(TotalMinutes)
+    FROM TELESCOPE_UTILIZATION_DAILY
+    GROUP BY TelescopeID;
+END //
+DELIMITER ;
+
+CALL rebuild_telescope_utilization();
+
+
+-- Function 2 (replaces the layer2.sql version): read hours from the summary table (O(1))
+
+DROP FUNCTION IF EXISTS get_telescope_utilization_hours;
+
+DELIMITER //
+CREATE FUNCTION get_telescope_utilization_hours (
+    telescope_id_in INT
+)
+RETURNS FLOAT READS SQL DATA
+BEGIN
+    DECLARE total_minutes BIGINT;
+
+    SELECT TotalMinutes INTO total_minutes
+    FROM TELESCOPE_UTILIZATION
+    WHERE TelescopeID = telescope_id_in;
+
+    RETURN IFNULL(total_minutes, 0) / 60.0;
+END //
+DELIMITER ;
+
+-- Test Query:
+-- SELECT get_telescope_utilization_hours(108); -- Still 3.167 hours, now a single primary-key lookup
+
+
+-- Archive Tables: Long-term storage for archived observations
+-- Range-partitioned by date, so whole years can later be exported or dropped one
+-- partition at a time. Partitioned InnoDB tables cannot carry foreign keys, and the
+-- partitioning column must be part of every unique key.
+
+CREATE TABLE OBSERVATIONS_ARCHIVE (
+    ObservationID INT NOT NULL,
+    SessionID INT,
+    ObjectID INT,
+    DurationMinutes INT,
+    Notes TEXT,
+    AcquisitionTime TIME,
+    DataQualityRating INT,
+    SessionDate DATE NOT NULL,
+    ArchiveRunID INT,
+    ArchivedAt DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (ObservationID, SessionDate),
+    KEY idx_obs_archive_session (SessionID)
+)
+PARTITION BY RANGE COLUMNS (SessionDate) (
+    PARTITION p2024 VALUES LESS THAN ('2025-01-01'),
+    PARTITION p2025 VALUES LESS THAN ('2026-01-01'),
+    PARTITION p2026 VALUES LESS THAN ('2027-01-01'),
+    PARTITION pmax VALUES LESS THAN (MAXVALUE)
+);
+
+CREATE TABLE OBSERVATION_LOG_ARCHIVE (
+    LogID INT NOT NULL,
+    ObservationID INT,
+    ChangeType VARCHAR(10) NOT NULL,
+    ChangeTimestamp DATETIME NOT NULL,
+    OldDataQuality INT,
+    ArchiveRunID INT,
+    ArchivedAt DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (LogID, ChangeTimestamp),
+    KEY idx_log_archive_observation (ObservationID)
+)
+PARTITION BY RANGE COLUMNS (ChangeTimestamp) (
+    PARTITION p2024 VALUES LESS THAN ('2025-01-01'),
+    PARTITION p2025 VALUES LESS THAN ('2026-01-01'),
+    PARTITION p2026 VALUES LESS THAN ('2027-01-01'),
+    PARTITION pmax VALUES LESS THAN (MAXVALUE)
+);
+
+-- One row per archival run; LastObservationID is the resume checkpoint
+CREATE TABLE ARCHIVE_RUNS (
+    RunID INT PRIMARY KEY AUTO_INCREMENT,
+    CutoffDate DATE NOT NULL,
+    MinQualityRating INT NOT NULL,
+    Status VARCHAR(10) NOT NULL DEFAULT 'running',
+    LastObservationID INT NOT NULL DEFAULT 0,
+    RowsArchived INT NOT NULL DEFAULT 0,
+    LogRowsArchived INT NOT NULL DEFAULT 0,
+    Chunks INT NOT NULL DEFAULT 0,
+    StartedAt DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    UpdatedAt DATETIME,
+    FinishedAt DATETIME
+);
+
+
+-- Procedure 6: Archive one chunk of an archival run
+-- Moves at most chunk_size_in qualifying observations (and their OBSERVATION_LOG rows,
+-- which would otherwise block the delete through the foreign key) into the archive
+-- tables and advances the run's checkpoint, all in one short transaction. Observations
+-- are taken in ObservationID order after the checkpoint, so an interrupted run resumes
+-- exactly where its last committed chunk ended.
+
+DELIMITER //
+CREATE PROCEDURE archive_observation_chunk (
+    IN run_id_in INT,
+    IN chunk_size_in INT,
+    OUT rows_moved INT,
+    OUT log_rows_moved INT
+)
+BEGIN
+    DECLARE cutoff DATE;
+    DECLARE min_quality INT;
+    DECLARE last_id INT;
+    DECLARE chunk_last_id INT;
+    DECLARE run_status VARCHAR(10);
+
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+    BEGIN
+        ROLLBACK;
+        DROP TEMPORARY TABLE IF EXISTS archive_chunk_ids;
+        RESIGNAL;
+    END;
+
+    SET rows_moved = 0;
+    SET log_rows_moved = 0;
+
+    START TRANSACTION;
+
+    SELECT CutoffDate, MinQualityRating, LastObservationID, Status
+    INTO cutoff, min_quality, last_id, run_status
+    FROM ARCHIVE_RUNS
+    WHERE RunID = run_id_in
+    FOR UPDATE;
+
+    IF run_status = 'running' THEN
+        DROP TEMPORARY TABLE IF EXISTS archive_chunk_ids;
+        CREATE TEMPORARY TABLE archive_chunk_ids (
+            ObservationID INT PRIMARY KEY,
+            SessionDate DATE NOT NULL
+        ) ENGINE = MEMORY;
+
+        INSERT INTO archive_chunk_ids (ObservationID, SessionDate)
+        SELECT O.ObservationID, OS.Date
+        FROM OBSERVATIONS AS O
+        JOIN OBSERVATIONSESSIONS AS OS ON O.SessionID = OS.SessionID
+        WHERE OS.Date < cutoff
+        AND O.DataQualityRating < min_quality
+        AND O.ObservationID > last_id
+        ORDER BY O.ObservationID
+        LIMIT chunk_size_in;
+
+        INSERT INTO OBSERVATIONS_ARCHIVE (ObservationID, SessionID, ObjectID, DurationMinutes, Notes,
+                                          AcquisitionTime, DataQualityRating, SessionDate, ArchiveRunID)
+        SELECT O.ObservationID, O.SessionID, O.ObjectID, O.DurationMinutes, O.Notes,
+               O.AcquisitionTime, O.DataQualityRating, C.SessionDate, run_id_in
+        FROM OBSERVATIONS AS O
+        JOIN archive_chunk_ids AS C ON C.ObservationID = O.ObservationID;
+        SET rows_moved = ROW_COUNT();
+
+        INSERT INTO OBSERVATION_LOG_ARCHIVE (LogID, ObservationID, ChangeType, ChangeTimestamp,
+                                             OldDataQuality, ArchiveRunID)
+        SELECT L.LogID, L.ObservationID, L.ChangeType, L.ChangeTimestamp, L.OldDataQuality, run_id_in
+        FROM OBSERVATION_LOG AS L
+        JOIN archive_chunk_ids AS C ON C.ObservationID = L.ObservationID;
+        SET log_rows_moved = ROW_COUNT();
+
+        DELETE L FROM OBSERVATION_LOG AS L
+        JOIN archive_chunk_ids AS C ON C.ObservationID = L.ObservationID;
+
+        DELETE O FROM OBSERVATIONS AS O
+        JOIN archive_chunk_ids AS C ON C.ObservationID = O.ObservationID;
+
+        SELECT MAX(ObservationID) INTO chunk_last_id FROM archive_chunk_ids;
+
+        -- A short chunk means nothing qualifying is left after the checkpoint
+        UPDATE ARCHIVE_RUNS
+        SET LastObservationID = IFNULL(chunk_last_id, LastObservationID),
+            RowsArchived = RowsArchived + rows_moved,
+            LogRowsArchived = LogRowsArchived + log_rows_moved,
+            Chunks = Chunks + 1,
+            Status = IF(rows_moved < chunk_size_in, 'done', 'running'),
+            UpdatedAt = NOW(),
+            FinishedAt = IF(rows_moved < chunk_size_in, NOW(), NULL)
+        WHERE RunID = run_id_in;
+
+        DROP TEMPORARY TABLE archive_chunk_ids;
+    END IF;
+
+    COMMIT;
+END //
+DELIMITER ;
+
+
+-- Procedure 2 (replaces the layer2.sql version): Archive Old Observations
+-- Same arguments as before, but rows are copied to the archive tables before they are
+-- removed, in chunks of 1000 with one commit each, and an interrupted call with the
+-- same arguments resumes its unfinished run. astro_archive.py drives the same chunk
+-- procedure with progress and throughput reporting.
+
+DROP PROCEDURE IF EXISTS archive_old_observations;
+
+DELIMITER //
+CREATE PROCEDURE archive_old_observations (
+    IN cutoff_date DATE,
+    IN min_quality_rating INT
+)
+BEGIN
+    DECLARE run_id INT DEFAULT NULL;
+    DECLARE moved INT DEFAULT 0;
+    DECLARE log_moved INT DEFAULT 0;
+    DECLARE total_moved INT DEFAULT 0;
+
+    SELECT MAX(RunID) INTO run_id
+    FROM ARCHIVE_RUNS
+    WHERE Status = 'running' AND CutoffDate = cutoff_date AND MinQualityRating = min_quality_rating;
+
+    IF run_id IS NULL THEN
+        INSERT INTO ARCHIVE_RUNS (CutoffDate, MinQualityRating) VALUES (cutoff_date, min_quality_rating);
+        SET run_id = LAST_INSERT_ID();
+        COMMIT;
+    END IF;
+
+    REPEAT
+        CALL archive_observation_chunk(run_id, 1000, moved, log_moved);
+        SET total_moved = total_moved + moved;
+    UNTIL moved < 1000 END REPEAT;
+
+    SELECT total_moved AS Rows_Archived;
+END //
+DELIMITER ;
+
+-- Execution Example:
+-- CALL archive_old_observations('2025-09-02', 3); -- Moves the matching observations and their audit rows to the archive tables
+-- SELECT * FROM ARCHIVE_RUNS ORDER BY RunID DESC;
+
+
+-- ===================================================
+-- Summary Table: Dashboard snapshot (Tab 2)
+-- One row per snapshot section, written by astro_snapshot.py. Each section is the result of
+-- one scan-and-aggregate pass over its source tables (CELESTIALOBJECTS for the per-type
+-- extremes; OBSERVATIONS + OBSERVATIONSESSIONS for telescope usage and seeing counts), so the
+-- tab renders from here instead of re-running a join per section. Sections are replaced
+-- independently when their source tables change or they exceed the maximum age.
+-- ===================================================
+
+CREATE TABLE DASHBOARD_SNAPSHOT (
+    Section VARCHAR(32) PRIMARY KEY,
+    GeneratedAt DATETIME(3) NOT NULL,
+    BuildMs INT NOT NULL,
+    Payload JSON NOT NULL
+);
+
+-- Refresh: python astro_snapshot.py refresh [--every 300]
+-- SELECT Section, GeneratedAt, BuildMs FROM DASHBOARD_SNAPSHOT;
+
+
+-- Index Migration 2: Top-N per object type (Tab 2 "Top-N per object type")
+-- top_n_per_type reads the N first entries of each type from an (ObjectType, <metric>, ObjectName)
+-- index; distance and magnitude are covered by Index Migration 1, redshift needs its own.
+CREATE INDEX idx_objects_type_redshift ON CELESTIALOBJECTS (ObjectType, Redshift, ObjectName);
+
+-- Verify:
+-- EXPLAIN SELECT T.ObjectType, X.ObjectName, X.Value
+-- FROM (SELECT DISTINCT ObjectType FROM CELESTIALOBJECTS) AS T
+-- JOIN LATERAL (SELECT C.ObjectName, C.Redshift AS Value FROM CELESTIALOBJECTS AS C
+--               WHERE C.ObjectType = T.ObjectType AND C.Redshift IS NOT NULL
+--               ORDER BY C.Redshift DESC LIMIT 5) AS X ON TRUE;
+-- -- derived T: 'Using index for group-by'; X: key = idx_objects_type_redshift, 'Backward index scan; Using index'
+
+
+-- ===================================================
+-- Sky Search: numeric coordinates + declination-zone index (Tab 2 "Sky Region Search")
+-- RightAscension / Declination stay the source of truth ("08h 00m 00s", "+41d 16m 09s");
+-- the triggers below derive RA_Deg / Dec_Deg in degrees and SkyZone, a 0.5-degree
+-- declination band. astro_sky.py turns a cone or box into "SkyZone IN (...) AND RA_Deg
+-- BETWEEN ..." so the (SkyZone, RA_Deg, Dec_Deg) index is read as one short range per
+-- zone, and only those candidates get the exact great-circle test.
+-- Keep SKY_ZONE_HEIGHT in astro_sky.py equal to the zone height in sky_zone().
+-- ===================================================
+
+ALTER TABLE CELESTIALOBJECTS
+    ADD COLUMN RA_Deg DOUBLE NULL,
+    ADD COLUMN Dec_Deg DOUBLE NULL,
+    ADD COLUMN SkyZone SMALLINT NULL;
+
+CREATE INDEX idx_objects_sky ON CELESTIALOBJECTS (SkyZone, RA_Deg, Dec_Deg);
+
+
+-- Function 3-5: Coordinate parsing (NULL for anything that is not a valid coordinate)
+-- Accepted: sexagesimal as stored by the app, or plain decimal degrees.
+
+DELIMITER //
+CREATE FUNCTION ra_to_degrees (
+    ra_in VARCHAR(20)
+)
+RETURNS DOUBLE DETERMINISTIC NO SQL
+BEGIN
+    DECLARE ra VARCHAR(20) DEFAULT TRIM(ra_in);
+    DECLARE deg_value DOUBLE;
+
+    IF ra REGEXP '^[0-9]{1,2}h *[0-9]{1,2}m *[0-9]{1,2}([.][0-9]+)?s$' THEN
+        SET deg_value = SUBSTRING_INDEX(ra, 'h', 1) * 15.0
+                    + SUBSTRING_INDEX(SUBSTRING_INDEX(ra, 'm', 1), 'h', -1) / 4.0
+                    + SUBSTRING_INDEX(SUBSTRING_INDEX(ra, 's', 1), 'm', -1) / 240.0;
+    ELSEIF ra REGEXP '^[0-9]{1,3}([.][0-9]+)?$' THEN
+        SET deg_value = ra + 0.0;
+    END IF;
+    RETURN IF(deg_value >= 0 AND deg_value < 360, deg_value, NULL);
+END //
+
+CREATE FUNCTION dec_to_degrees (
+    dec_in VARCHAR(20)
+)
+RETURNS DOUBLE DETERMINISTIC NO SQL
+BEGIN
+    DECLARE dec_text VARCHAR(20) DEFAULT TRIM(dec_in);
+    DECLARE deg_value DOUBLE;
+
+    IF dec_text REGEXP '^[+-]?[0-9]{1,2}d *[0-9]{1,2}m *[0-9]{1,2}([.][0-9]+)?s$' THEN
+        SET deg_value = ABS(SUBSTRING_INDEX(dec_text, 'd', 1) + 0.0)
+                    + SUBSTRING_INDEX(SUBSTRING_INDEX(dec_text, 'm', 1), 'd', -1) / 60.0
+                    + SUBSTRING_INDEX(SUBSTRING_INDEX(dec_text, 's', 1), 'm', -1) / 3600.0;
+        -- the sign belongs to the whole value ("-00d 30m 00s" is -0.5)
+        SET deg_value = IF(LEFT(dec_text, 1) = '-', -deg_value, deg_value);
+    ELSEIF dec_text REGEXP '^[+-]?[0-9]{1,2}([.][0-9]+)?$' THEN
+        SET deg_value = dec_text + 0.0;
+    END IF;
+    RETURN IF(deg_value BETWEEN -90 AND 90, deg_value, NULL);
+END //
+
+CREATE FUNCTION sky_zone (
+    dec_deg_in DOUBLE
+)
+RETURNS SMALLINT DETERMINISTIC NO SQL
+BEGIN
+    RETURN FLOOR((dec_deg_in + 90) / 0.5);
+END //
+DELIMITER ;
+
+-- Test Query:
+-- SELECT ra_to_degrees('00h 42m 44s'), dec_to_degrees('+41d 16m 09s'), sky_zone(41.27); -- 10.68, 41.27, 262
+
+
+-- Trigger 11-12: Keep the numeric coordinates in step with the text columns
+
+DELIMITER //
+CREATE TRIGGER trg_objects_sky_insert
+BEFORE INSERT ON CELESTIALOBJECTS
+FOR EACH ROW
+BEGIN
+    SET NEW.RA_Deg = ra_to_degrees(NEW.RightAscension);
+    SET NEW.Dec_Deg = dec_to_degrees(NEW.Declination);
+    SET NEW.SkyZone = sky_zone(NEW.Dec_Deg);
+END //
+
+CREATE TRIGGER trg_objects_sky_update
+BEFORE UPDATE ON CELESTIALOBJECTS
+FOR EACH ROW
+BEGIN
+    -- LastObservedDate updates (Trigger 2) leave the coordinates alone
+    IF NOT (NEW.RightAscension <=> OLD.RightAscension AND NEW.Declination <=> OLD.Declination) THEN
+        SET NEW.RA_Deg = ra_to_degrees(NEW.RightAscension);
+        SET NEW.Dec_Deg = dec_to_degrees(NEW.Declination);
+        SET NEW.SkyZone = sky_zone(NEW.Dec_Deg);
+    END IF;
+END //
+DELIMITER ;
+
+-- Backfill the existing catalog once
+UPDATE CELESTIALOBJECTS
+SET RA_Deg = ra_to_degrees(RightAscension),
+    Dec_Deg = dec_to_degrees(Declination),
+    SkyZone = sky_zone(dec_to_degrees(Declination));
+
+-- Objects whose coordinates could not be parsed (never returned by a sky search):
+-- SELECT ObjectID, ObjectName, RightAscension, Declination FROM CELESTIALOBJECTS WHERE SkyZone IS NULL;
+
+
+-- ===================================================
+-- Deferred LastObservedDate maintenance (bulk loads)
+-- Trigger 2 looked up the session and updated the object once per inserted observation,
+-- and its "LastObservedDate < session_date" test is never true for a NULL date, so
+-- objects without one were never filled in. The replacement below does both in one
+-- statement and treats NULL as "never observed". A loading session can switch it off
+-- with SET @astro_defer_last_observed = 1 (per connection; other writers are not
+-- affected) and afterwards recompute the affected objects in one set-based pass with
+-- refresh_last_observed_dates. astro_ingest.py does this for every import.
+-- ===================================================
+
+-- Trigger 2 (replaces the layer2.sql version)
+
+DROP TRIGGER IF EXISTS trg_update_last_observed_date;
+
+DELIMITER //
+CREATE TRIGGER trg_update_last_observed_date
+AFTER INSERT ON OBSERVATIONS
+FOR EACH ROW
+BEGIN
+    IF @astro_defer_last_observed IS NULL THEN
+        UPDATE CELESTIALOBJECTS AS C
+        JOIN OBSERVATIONSESSIONS AS OS ON OS.SessionID = NEW.SessionID
+        SET C.LastObservedDate = OS.Date
+        WHERE C.ObjectID = NEW.ObjectID
+          AND (C.LastObservedDate IS NULL OR C.LastObservedDate < OS.Date);
+    END IF;
+END //
+DELIMITER ;
+
+
+-- Procedure 7: Recompute LastObservedDate from the observations in an ID range
+-- One aggregate over the range (NULL bounds = open ended), then one update per affected
+-- object. Dates only move forward, as with the trigger, so repeating a range is harmless.
+
+DELIMITER //
+CREATE PROCEDURE refresh_last_observed_dates (
+    IN first_observation_id INT,
+    IN last_observation_id INT
+)
+BEGIN
+    UPDATE CELESTIALOBJECTS AS C
+    JOIN (
+        SELECT O.ObjectID, MAX(OS.Date) AS LastDate
+        FROM OBSERVATIONS AS O
+        JOIN OBSERVATIONSESSIONS AS OS ON O.SessionID = OS.SessionID
+        WHERE (first_observation_id IS NULL OR O.ObservationID >= first_observation_id)
+          AND (last_observation_id IS NULL OR O.ObservationID <= last_observation_id)
+        GROUP BY O.ObjectID
+    ) AS N ON N.ObjectID = C.ObjectID
+    SET C.LastObservedDate = N.LastDate
+    WHERE C.LastObservedDate IS NULL OR C.LastObservedDate < N.LastDate;
+END //
+DELIMITER ;
+
+-- Fill in the dates the old trigger skipped (objects that started out NULL)
+CALL refresh_last_observed_dates(NULL, NULL);
+
+-- Bulk load pattern:
+-- SET @astro_defer_last_observed = 1;
+-- INSERT INTO OBSERVATIONS ... ;                      -- any number of rows
+-- SET @astro_defer_last_observed = NULL;
+-- CALL refresh_last_observed_dates(<first id>, <last id>);
+
+
+-- ===================================================
+-- Full-Text Index: Observation notes search (Tab 2 "Observation Notes Search")
+-- astro_notes.py searches Notes with MATCH ... AGAINST in natural-language or boolean
+-- mode, ranked by relevance, instead of a LIKE '%word%' scan of every observation.
+-- Words shorter than innodb_ft_min_token_size (default 3) and InnoDB stopwords are not
+-- indexed. Adding the first FULLTEXT index rebuilds the table once (hidden FTS_DOC_ID).
+-- Table_Partitioning.sql drops this index again: partitioned tables cannot have one,
+-- and astro_notes.py then falls back to an unranked LIKE scan.
+-- ===================================================
+
+ALTER TABLE OBSERVATIONS ADD FULLTEXT INDEX ft_observations_notes (Notes);
+
+-- Verify:
+-- EXPLAIN SELECT ObservationID FROM OBSERVATIONS WHERE MATCH(Notes) AGAINST ('+transit -clouds' IN BOOLEAN MODE);
+-- -- type = fulltext, key = ft_observations_notes
+
+
+-- ===================================================
+-- Bulk Data-Quality Re-rating (astro_quality.py)
+-- Trigger 1 wrote one OBSERVATION_LOG row per updated observation, so re-rating
+-- thousands of observations ran thousands of single-row inserts. A bulk re-rating
+-- stages one chunk of (ObservationID, NewRating) pairs in the temporary table
+-- quality_rerate_chunk, and apply_quality_rerate_chunk writes the chunk's audit rows
+-- with one INSERT ... SELECT before applying the ratings with one UPDATE ... JOIN.
+-- The audit rows are the same as the trigger's. While that UPDATE runs,
+-- @astro_batch_audit switches the trigger off for this connection only.
+-- Like the layer2.sql trigger, a change from or to NULL is not a change: "<>" is
+-- never true for NULL, so such rows are neither logged nor updated by the procedure.
+-- ===================================================
+
+-- Trigger 1 (replaces the layer2.sql version)
+
+DROP TRIGGER IF EXISTS trg_log_data_quality_update;
+
+DELIMITER //
+CREATE TRIGGER trg_log_data_quality_update
+AFTER UPDATE ON OBSERVATIONS
+FOR EACH ROW
+BEGIN
+    IF @astro_batch_audit IS NULL AND OLD.DataQualityRating <> NEW.DataQualityRating THEN
+        INSERT INTO OBSERVATION_LOG (ObservationID, ChangeType, OldDataQuality)
+        VALUES (NEW.ObservationID, 'UPDATE', OLD.DataQualityRating);
+    END IF;
+END //
+DELIMITER ;
+
+
+-- Procedure 8: Apply one staged chunk of a bulk re-rating
+-- The caller creates quality_rerate_chunk (ObservationID INT PRIMARY KEY, NewRating INT),
+-- fills it and commits afterwards, so staging, audit rows and ratings share one transaction.
+-- Reading the old ratings for the audit rows locks them until that commit.
+
+DELIMITER //
+CREATE PROCEDURE apply_quality_rerate_chunk (
+    OUT rows_changed INT
+)
+BEGIN
+    DECLARE EXIT HANDLER FOR SQLEXCEPTION
+    BEGIN
+        SET @astro_batch_audit = NULL;
+        RESIGNAL;
+    END;
+
+    INSERT INTO OBSERVATION_LOG (ObservationID, ChangeType, OldDataQuality)
+    SELECT O.ObservationID, 'UPDATE', O.DataQualityRating
+    FROM OBSERVATIONS AS O
+    JOIN quality_rerate_chunk AS C ON C.ObservationID = O.ObservationID
+    WHERE O.DataQualityRating <> C.NewRating
+    ORDER BY O.ObservationID;
+
+    SET @astro_batch_audit = 1;
+    UPDATE OBSERVATIONS AS O
+    JOIN quality_rerate_chunk AS C ON C.ObservationID = O.ObservationID
+    SET O.DataQualityRating = C.NewRating
+    WHERE O.DataQualityRating <> C.NewRating;
+    SET rows_changed = ROW_COUNT();
+    SET @astro_batch_audit = NULL;
+END //
+DELIMITER ;
+
+-- Audit-log browser (Tab 1): pages by (ChangeTimestamp, LogID) within a time range.
+-- InnoDB appends the primary key to every secondary index, so this index already
+-- holds that order.
+CREATE INDEX idx_log_timestamp ON OBSERVATION_LOG (ChangeTimestamp);
+
+-- Bulk pattern:
+-- CREATE TEMPORARY TABLE quality_rerate_chunk (ObservationID INT PRIMARY KEY, NewRating INT) ENGINE = MEMORY;
+-- INSERT INTO quality_rerate_chunk VALUES (201, 4), (202, 3), ... ;   -- one chunk
+-- CALL apply_quality_rerate_chunk(@changed);
+-- COMMIT;
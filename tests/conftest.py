@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+# the astro_* modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "db: needs the MySQL database from astro_db.DB_CONFIG (set ASTRO_DB_TESTS=1)")
+
+
+@pytest.fixture(scope="session")
+def db_pool():
+    """The app's pool, for tests marked ``db``; skipped unless ASTRO_DB_TESTS=1."""
+    if os.environ.get("ASTRO_DB_TESTS") != "1":
+        pytest.skip("set ASTRO_DB_TESTS=1 to run the database tests")
+    from astro_db import get_pool
+    return get_pool()
@@ -0,0 +1,61 @@
+"""effective_magnitude(): formula tests against a Python transcription of layer2.sql, and a parity
+check against the stored calculate_effective_magnitude() function (marked ``db``)."""
+import math
+
+import numpy as np
+import pytest
+
+from astro_analytics import PARITY_TOLERANCE, check_effective_magnitude_parity, effective_magnitude
+
+
+def layer2_effective_magnitude(mag_in, redshift_in):
+    """calculate_effective_magnitude() as MySQL evaluates it: NULL in, NULL out; LOG10(x <= 0) is NULL."""
+    if mag_in is None or redshift_in is None:
+        return None
+    scaled = redshift_in * 1000.0
+    if scaled <= 0:
+        return None
+    return mag_in + 5 * math.log10(scaled)
+
+
+CASES = [
+    (12.9, 0.158),      # the layer2.sql test query (3C 273)
+    (-1.46, 0.00001),   # bright star, tiny redshift: negative LOG10 term
+    (0.0, 1.0),
+    (25.3, 7.5),
+    (None, 0.5),        # NULL magnitude
+    (14.0, None),       # NULL redshift
+    (None, None),
+    (10.0, 0.0),        # LOG10(0) is NULL
+    (10.0, -0.002),     # blueshift: LOG10 of a negative number is NULL
+]
+
+
+@pytest.mark.parametrize("magnitude, redshift", CASES)
+def test_formula_matches_layer2(magnitude, redshift):
+    expected = layer2_effective_magnitude(magnitude, redshift)
+    result = effective_magnitude([magnitude], [redshift])[0]
+    if expected is None:
+        assert np.isnan(result)
+    else:
+        assert result == pytest.approx(expected, abs=PARITY_TOLERANCE)
+
+
+def test_known_value():
+    assert effective_magnitude([12.9], [0.158])[0] == pytest.approx(23.8933, abs=1e-4)
+
+
+def test_vectorized_over_columns():
+    magnitudes = [c[0] for c in CASES]
+    redshifts = [c[1] for c in CASES]
+    result = effective_magnitude(magnitudes, redshifts)
+    assert result.shape == (len(CASES),)
+    for value, (magnitude, redshift) in zip(result, CASES):
+        expected = layer2_effective_magnitude(magnitude, redshift)
+        assert np.isnan(value) if expected is None else value == pytest.approx(expected, abs=PARITY_TOLERANCE)
+
+
+@pytest.mark.db
+def test_parity_with_stored_function(db_pool):
+    result = check_effective_magnitude_parity(db_pool)
+    assert result["mismatches"] == []
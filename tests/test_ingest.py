@@ -0,0 +1,88 @@
+"""Row coercion and end-of-import reconciliation in astro_ingest."""
+import datetime
+from contextlib import contextmanager
+
+import pytest
+
+import astro_ingest
+from astro_ingest import coerce_row
+
+RAW = {
+    "SessionID": "7", "ResearcherID": 1, "TelescopeID": 2.0, "Date": "2025-03-04",
+    "ObservationID": "900", "ObjectID": "1001", "DurationMinutes": " 45 ", "DataQualityRating": "",
+}
+
+
+def test_coerce_row_maps_and_converts():
+    entry = coerce_row(dict(RAW, Notes="  ", data_quality_rating=4))
+    assert entry["session_id"] == 7 and entry["telescope_id"] == 2 and entry["duration"] == 45
+    assert entry["date"] == datetime.date(2025, 3, 4)
+    assert entry["quality"] == 4           # column names match case- and underscore-insensitively
+    assert entry["notes"] is None          # blank strings become NULL
+    assert entry["weather"] is None and entry["acquisition_time"] is None
+
+
+def test_coerce_row_accepts_datetime_dates():
+    assert coerce_row(dict(RAW, Date=datetime.datetime(2025, 3, 4, 22, 15)))["date"] == datetime.date(2025, 3, 4)
+
+
+@pytest.mark.parametrize("override, reason", [
+    ({"ObjectID": None}, "missing required field(s): object_id"),
+    ({"DurationMinutes": "x"}, "duration is not an integer"),
+    ({"TelescopeID": 2.5}, "telescope_id is not an integer"),
+    ({"DurationMinutes": 0}, "DurationMinutes must be > 0"),
+    ({"DataQualityRating": 6}, "DataQualityRating must be between 1 and 5"),
+    ({"Date": "04/03/2025"}, "date is not YYYY-MM-DD"),
+])
+def test_coerce_row_rejects(override, reason):
+    with pytest.raises(ValueError, match=reason.replace("(", r"\(").replace(")", r"\)")):
+        coerce_row(dict(RAW, **override))
+
+
+class _Conn:
+    def cursor(self):
+        return self
+
+    def execute(self, *args):
+        pass
+
+    def close(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+class _Pool:
+    @contextmanager
+    def connection(self):
+        yield _Conn()
+
+
+def test_committed_chunks_are_reconciled_when_a_later_chunk_fails(monkeypatch):
+    calls = {"last_observed": [], "totals": [], "invalidated": []}
+    chunks = []
+
+    def insert_chunk(conn, new_sessions, entries):
+        chunks.append(entries)
+        if len(chunks) == 2:
+            raise RuntimeError("connection lost")
+
+    monkeypatch.setattr(astro_ingest, "_insert_chunk", insert_chunk)
+    monkeypatch.setattr(astro_ingest, "deferred_last_observed_enabled", lambda pool: True)
+    monkeypatch.setattr(astro_ingest, "incremental_totals_enabled", lambda pool: False)
+    monkeypatch.setattr(astro_ingest, "validate_observations",
+                        lambda pool, entries: [dict.fromkeys(astro_ingest.PROBLEM_MESSAGES, False) for _ in entries])
+    monkeypatch.setattr(astro_ingest, "refresh_last_observed_dates",
+                        lambda pool, lo, hi: calls["last_observed"].append((lo, hi)) or 0)
+    monkeypatch.setattr(astro_ingest, "refresh_researcher_totals",
+                        lambda pool, ids: calls["totals"].append(set(ids)))
+    monkeypatch.setattr(astro_ingest.get_query_cache(), "invalidate_tables",
+                        lambda tables: calls["invalidated"].append(set(tables)))
+
+    rows = [dict(RAW, SessionID=i, ObservationID=i, ResearcherID=i % 2 + 1) for i in range(1, 7)]
+    with pytest.raises(RuntimeError):
+        astro_ingest.ingest_observations(_Pool(), rows, chunk_size=3)
+    assert calls["last_observed"] == [(1, 6)]
+    assert calls["totals"] == [{1, 2}]
+    assert calls["invalidated"] == [{"OBSERVATIONSESSIONS", "OBSERVATIONS", "RESEARCHERS"}]
@@ -0,0 +1,143 @@
+"""QueryJobRunner job states: done / failed / timeout / cancelled, without a server."""
+import threading
+from contextlib import contextmanager
+
+import pytest
+from mysql.connector import Error
+
+import astro_jobs
+from astro_jobs import ER_QUERY_INTERRUPTED, ER_QUERY_TIMEOUT, QueryJobRunner
+
+
+class FakeCursor:
+    def __init__(self, log):
+        self.log = log
+
+    def execute(self, sql, params=()):
+        self.log.append((sql, params))
+
+    def fetchone(self):
+        return (42,)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    unread_result = False
+
+    def __init__(self):
+        self.log = []
+
+    def cursor(self):
+        return FakeCursor(self.log)
+
+
+class FakePool:
+    db_config = {}
+
+    def __init__(self):
+        self.conn = FakeConnection()
+
+    @contextmanager
+    def connection(self):
+        yield self.conn
+
+
+@pytest.fixture
+def runner():
+    r = QueryJobRunner(FakePool(), workers=1, timeout_ms=500, history=3)
+    yield r
+    r._executor.shutdown(wait=True)
+
+
+@pytest.fixture
+def kills(monkeypatch):
+    calls = []
+    monkeypatch.setattr(astro_jobs, "kill_query", lambda pool, connection_id: calls.append(connection_id))
+    return calls
+
+
+def test_done_sets_and_resets_the_session_timeout(runner):
+    job_id = runner.submit("sum", lambda pool, a, b: a + b, 2, 3)
+    job = runner.wait([job_id], timeout=5)[0]
+    assert job["status"] == "done" and job["result"] == 5
+    assert job["connection_id"] is None
+    executed = [sql for sql, _ in runner.pool.conn.log]
+    assert ("SET SESSION MAX_EXECUTION_TIME = %s", (500,)) in runner.pool.conn.log
+    assert executed[-1] == "SET SESSION MAX_EXECUTION_TIME = DEFAULT"
+
+
+@pytest.mark.parametrize("error, status", [
+    (Error(msg="too slow", errno=ER_QUERY_TIMEOUT), "timeout"),
+    (Error(msg="interrupted", errno=ER_QUERY_INTERRUPTED), "cancelled"),
+    (Error(msg="syntax", errno=1064), "failed"),
+    (ValueError("bad input"), "failed"),
+])
+def test_errors_map_to_states(runner, error, status):
+    def fail(pool):
+        raise error
+    job = runner.wait([runner.submit("fail", fail)], timeout=5)[0]
+    assert job["status"] == status and job["error"] is error
+
+
+def test_cancel_queued_job_never_runs(runner, kills):
+    release = threading.Event()
+    ran = []
+    blocker = runner.submit("blocker", lambda pool: release.wait(5))
+    queued = runner.submit("queued", lambda pool: ran.append(True))
+    assert runner.cancel(queued)
+    release.set()
+    jobs = runner.wait([blocker, queued], timeout=5)
+    assert [j["status"] for j in jobs] == ["done", "cancelled"]
+    assert not ran and kills == []
+
+
+def test_cancel_running_job_kills_its_connection(runner, monkeypatch):
+    started, killed = threading.Event(), threading.Event()
+    calls = []
+
+    def kill(pool, connection_id):
+        calls.append(connection_id)
+        killed.set()
+    monkeypatch.setattr(astro_jobs, "kill_query", kill)
+
+    def slow(pool):
+        started.set()
+        killed.wait(5)
+        raise Error(msg="Query execution was interrupted", errno=ER_QUERY_INTERRUPTED)
+
+    job_id = runner.submit("slow", slow)
+    started.wait(5)
+    assert runner.cancel(job_id)
+    job = runner.wait([job_id], timeout=5)[0]
+    assert job["status"] == "cancelled" and calls == [42]
+
+
+def test_cancel_between_statements_still_ends_cancelled(runner, kills):
+    started, proceed = threading.Event(), threading.Event()
+
+    def finishes_anyway(pool):
+        started.set()
+        proceed.wait(5)      # the kill found no running statement
+        return "rows"
+
+    job_id = runner.submit("late", finishes_anyway)
+    started.wait(5)
+    runner.cancel(job_id)
+    proceed.set()
+    job = runner.wait([job_id], timeout=5)[0]
+    assert job["status"] == "cancelled" and job["result"] is None
+
+
+def test_cancel_finished_job_is_refused(runner, kills):
+    job_id = runner.submit("quick", lambda pool: 1)
+    runner.wait([job_id], timeout=5)
+    assert runner.cancel(job_id) is False and kills == []
+
+
+def test_history_keeps_the_newest_finished_jobs(runner):
+    ids = [runner.submit(f"job {i}", lambda pool: None) for i in range(5)]
+    runner.wait(ids, timeout=5)
+    runner.submit("one more", lambda pool: None)
+    assert [runner.get(i) is not None for i in ids] == [False, False, False, True, True]
@@ -0,0 +1,42 @@
+"""notes_query SQL and keyset parameters, for both the FULLTEXT and the LIKE fallback paths."""
+import pytest
+
+from astro_notes import notes_query
+from astro_paging import MAX_PAGE_SIZE
+
+
+def test_first_page_is_best_first():
+    sql, params = notes_query("spiral arms")
+    assert "AGAINST (%s IN NATURAL LANGUAGE MODE)" in sql
+    assert "ORDER BY Relevance DESC, O.ObservationID ASC" in sql
+    assert params[:2] == ["spiral arms", "spiral arms"]
+    assert sql.count("%s") == len(params)
+
+
+def test_next_page_keyset():
+    sql, params = notes_query("spiral", after=(1.5, 40), page_size=10)
+    assert "< %s OR (MATCH(O.Notes) AGAINST (%s IN NATURAL LANGUAGE MODE) = %s AND O.ObservationID > %s)" in sql
+    assert params[-6:] == ["spiral", 1.5, "spiral", 1.5, 40, 11]
+    assert sql.count("%s") == len(params)
+
+
+def test_previous_page_reads_in_reverse():
+    sql, params = notes_query("spiral", mode="boolean", before=(1.5, 40))
+    assert "IN BOOLEAN MODE" in sql
+    assert "> %s OR (" in sql and "O.ObservationID < %s" in sql
+    assert "ORDER BY Relevance ASC, O.ObservationID DESC" in sql
+    assert sql.count("%s") == len(params)
+
+
+def test_like_fallback_keys_on_id_only():
+    sql, params = notes_query("spiral arms", after=(0, 40), fulltext=False, page_size=10 ** 6)
+    assert "MATCH" not in sql and sql.count("O.Notes LIKE %s") == 2
+    assert params[:2] == ["%spiral%", "%arms%"]
+    assert "AND O.ObservationID > %s" in sql and params[-2:] == [40, MAX_PAGE_SIZE + 1]
+    assert sql.count("%s") == len(params)
+
+
+@pytest.mark.parametrize("text, mode", [("", "natural"), ("  !! ", "natural"), ("spiral", "fuzzy")])
+def test_rejects_bad_input(text, mode):
+    with pytest.raises(ValueError):
+        notes_query(text, mode)
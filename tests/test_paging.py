@@ -0,0 +1,100 @@
+"""Keyset SQL rendering, page_from_rows and streamed exports in astro_paging."""
+import csv
+
+import pytest
+
+import astro_paging
+from astro_paging import AUDIT_LOG_PAGED, KeysetQuery, export_rows, page_from_rows
+
+ASCENDING = KeysetQuery("t", "SELECT Id FROM T WHERE 1 = 1 {keyset} ORDER BY Id {order} {limit}", "Id")
+DESCENDING = KeysetQuery("t", "SELECT Id FROM T WHERE 1 = 1 {keyset} ORDER BY Id {order} {limit}", "Id",
+                         descending=True)
+
+
+def test_first_page():
+    sql, extra = ASCENDING.render()
+    assert "ORDER BY Id ASC" in sql and "LIMIT %s" in sql
+    assert "AND Id" not in sql and extra == []
+
+
+def test_after_and_before():
+    sql, extra = ASCENDING.render(after=10)
+    assert "AND Id > %s" in sql and "ORDER BY Id ASC" in sql and extra == [10]
+    sql, extra = ASCENDING.render(before=10)
+    assert "AND Id < %s" in sql and "ORDER BY Id DESC" in sql and extra == [10]
+
+
+def test_descending_walks_down():
+    sql, extra = DESCENDING.render(after=10)
+    assert "AND Id < %s" in sql and "ORDER BY Id DESC" in sql and extra == [10]
+    sql, extra = DESCENDING.render(before=10)
+    assert "AND Id > %s" in sql and "ORDER BY Id ASC" in sql
+
+
+def test_full_sql_has_no_keyset_or_limit():
+    sql = DESCENDING.full_sql()
+    assert "%s" not in sql and "ORDER BY Id DESC" in sql
+
+
+
+def test_page_from_rows_forward():
+    rows = [(1,), (2,), (3,), (4,)]
+    page = page_from_rows(ASCENDING, ["Id"], rows, page_size=3)
+    assert page["rows"] == [(1,), (2,), (3,)]
+    assert (page["first_key"], page["last_key"]) == (1, 3)
+    assert page["has_next"] and not page["has_prev"]
+    page = page_from_rows(ASCENDING, ["Id"], rows[:2], page_size=3, after=0)
+    assert not page["has_next"] and page["has_prev"]
+
+
+def test_page_from_rows_backward_restores_display_order():
+    # a "before" page is read in reverse key order
+    page = page_from_rows(ASCENDING, ["Id"], [(9,), (8,), (7,), (6,)], page_size=3, before=10)
+    assert page["rows"] == [(7,), (8,), (9,)]
+    assert page["has_prev"] and page["has_next"]
+
+
+def test_page_from_rows_empty():
+    page = page_from_rows(ASCENDING, ["Id"], [], page_size=3)
+    assert page["rows"] == [] and page["first_key"] is None and page["last_key"] is None
+
+
+def test_composite_key():
+    sql, extra = AUDIT_LOG_PAGED.render(after=("2025-09-30 10:00:00", 7))
+    assert "((ChangeTimestamp < %s) OR (ChangeTimestamp = %s AND LogID < %s))" in sql
+    assert "ORDER BY ChangeTimestamp DESC, LogID DESC" in sql
+    assert extra == ["2025-09-30 10:00:00", "2025-09-30 10:00:00", 7]
+    # range bounds, keyset values and the limit line up with the placeholders
+    assert sql.count("%s") == 2 + len(extra) + 1
+
+
+def test_page_from_rows_composite_key():
+    rows = [(5, 1, "UPDATE", 3, "t2"), (4, 1, "UPDATE", 2, "t1")]
+    page = page_from_rows(AUDIT_LOG_PAGED, [], rows, page_size=5)
+    assert page["first_key"] == ("t2", 5) and page["last_key"] == ("t1", 4)
+
+@pytest.fixture
+def two_blocks(monkeypatch):
+    def stream_rows(pool, sql, params=(), block_size=None, name=None):
+        yield ["Id", "Name"], [(1, "a"), (2, "b")]
+        yield ["Id", "Name"], [(3, None)]
+    monkeypatch.setattr(astro_paging, "stream_rows", stream_rows)
+
+
+def test_export_csv(tmp_path, two_blocks):
+    out = tmp_path / "rows.csv"
+    assert export_rows(None, "SELECT", (), str(out)) == 3
+    with open(out, newline="", encoding="utf-8") as f:
+        assert list(csv.reader(f)) == [["Id", "Name"], ["1", "a"], ["2", "b"], ["3", ""]]
+
+
+def test_export_parquet(tmp_path, two_blocks):
+    pq = pytest.importorskip("pyarrow.parquet")
+    out = tmp_path / "rows.parquet"
+    assert export_rows(None, "SELECT", (), str(out)) == 3
+    assert pq.read_table(out).to_pylist() == [{"Id": 1, "Name": "a"}, {"Id": 2, "Name": "b"}, {"Id": 3, "Name": None}]
+
+
+def test_export_rejects_unknown_format(tmp_path, two_blocks):
+    with pytest.raises(ValueError):
+        export_rows(None, "SELECT", (), str(tmp_path / "rows.xlsx"))
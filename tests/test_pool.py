@@ -0,0 +1,66 @@
+"""ConnectionPool checkout / release without a server (connections are fakes)."""
+import threading
+import time
+
+import pytest
+from mysql.connector import Error
+
+from astro_db import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    def __init__(self, broken=False):
+        self.broken = broken
+        self.in_transaction = broken
+        self.closed = False
+
+    def rollback(self):
+        if self.broken:
+            raise Error(msg="Lost connection to MySQL server")
+
+    def close(self):
+        self.closed = True
+
+
+class FakePool(ConnectionPool):
+    def __init__(self, **kwargs):
+        super().__init__({}, **kwargs)
+        self.opened = []
+
+    def _connect(self):
+        conn = FakeConnection()
+        self.opened.append(conn)
+        return conn
+
+
+def test_reuses_idle_connection():
+    pool = FakePool(pool_size=2)
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        assert second is first
+    assert pool.stats()["open"] == 1
+
+
+def test_times_out_when_exhausted():
+    pool = FakePool(pool_size=1, checkout_timeout=0.2)
+    held = pool.acquire()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    assert pool.stats()["timeouts"] == 1
+    pool.release(held)
+
+
+def test_waiter_gets_slot_freed_by_discarded_connection():
+    pool = FakePool(pool_size=1, checkout_timeout=5)
+    held = pool.acquire()
+    held.broken = held.in_transaction = True
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.acquire()))
+    waiter.start()
+    time.sleep(0.2)             # the waiter is blocked on the empty idle queue
+    pool.release(held)          # rollback fails: the connection is discarded, its slot freed
+    waiter.join(timeout=2)
+    assert got and got[0] is not held
+    assert held.closed
+    assert pool.stats()["discarded"] == 1 and pool.stats()["open"] == 1
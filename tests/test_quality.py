@@ -0,0 +1,41 @@
+"""Rule SQL and file-row checks for bulk re-rating (no database needed)."""
+import pytest
+
+from astro_quality import RATING_MAX, RATING_MIN, coerce_rating_row, rule_query
+
+
+def test_absolute_rating_rule():
+    sql, params = rule_query(rating=2, after_id=100, chunk_size=50, seeing="Poor", telescope_id=None)
+    assert "SELECT O.ObservationID, %s AS NewRating" in sql
+    assert "AND OS.SeeingCondition = %s" in sql and "TelescopeID" not in sql
+    assert "CELESTIALOBJECTS" not in sql
+    assert params == [2, 100, "Poor", 50]
+    assert sql.count("%s") == len(params)
+
+
+def test_adjustment_stays_on_the_scale():
+    sql, params = rule_query(adjust=-1, object_type="Galaxy")
+    assert f"LEAST(GREATEST(O.DataQualityRating + %s, {RATING_MIN}), {RATING_MAX})" in sql
+    assert "JOIN CELESTIALOBJECTS AS CO" in sql and "AND CO.ObjectType = %s" in sql
+    assert params[0] == -1 and params[2] == "Galaxy"
+
+
+@pytest.mark.parametrize("kwargs", [
+    {},                                 # neither a rating nor an adjustment
+    {"rating": 3, "adjust": 1},         # both
+    {"rating": RATING_MAX + 1},
+    {"rating": 3, "colour": "red"},     # unknown filter
+])
+def test_rule_rejects(kwargs):
+    with pytest.raises(ValueError):
+        rule_query(**kwargs)
+
+
+def test_coerce_rating_row():
+    assert coerce_rating_row({"ObservationID": "7", "DataQualityRating": "4"}) == (7, 4)
+    with pytest.raises(ValueError, match="missing"):
+        coerce_rating_row({"ObservationID": "7"})
+    with pytest.raises(ValueError, match="not an integer"):
+        coerce_rating_row({"ObservationID": "x", "DataQualityRating": "4"})
+    with pytest.raises(ValueError, match="between"):
+        coerce_rating_row({"ObservationID": "7", "DataQualityRating": "9"})
@@ -0,0 +1,52 @@
+"""QueryCache TTL, LRU eviction and table invalidation."""
+from astro_db import QueryCache
+
+SQL = "SELECT * FROM OBSERVATIONS WHERE ObservationID = %s"
+
+
+def test_hit_and_whitespace_insensitive_key():
+    cache = QueryCache()
+    cache.put(SQL, (1,), "row", {"OBSERVATIONS"})
+    assert cache.get("SELECT *  FROM OBSERVATIONS\nWHERE ObservationID = %s", (1,)) == (True, "row")
+    assert cache.get(SQL, (2,)) == (False, None)
+
+
+def test_ttl_expiry(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr("astro_db.time.monotonic", lambda: clock[0])
+    cache = QueryCache(ttl_seconds=10)
+    cache.put(SQL, (1,), "row", {"OBSERVATIONS"})
+    clock[0] += 9
+    assert cache.get(SQL, (1,))[0]
+    clock[0] += 2
+    assert cache.get(SQL, (1,)) == (False, None)
+    assert cache.stats()["expired"] == 1
+
+
+def test_lru_eviction():
+    cache = QueryCache(max_entries=2)
+    cache.put(SQL, (1,), "a", set())
+    cache.put(SQL, (2,), "b", set())
+    cache.get(SQL, (1,))             # 1 is now the most recently used
+    cache.put(SQL, (3,), "c", set())
+    assert cache.get(SQL, (2,)) == (False, None)
+    assert cache.get(SQL, (1,)) == (True, "a")
+    assert cache.stats()["evictions"] == 1
+
+
+def test_invalidation_includes_trigger_effects():
+    cache = QueryCache()
+    cache.put("SELECT * FROM OBSERVATION_LOG", (), "log", {"OBSERVATION_LOG"})
+    cache.put("SELECT * FROM TELESCOPES", (), "tel", {"TELESCOPES"})
+    # the audit trigger writes OBSERVATION_LOG when OBSERVATIONS is updated
+    cache.invalidate_tables({"OBSERVATIONS"})
+    assert cache.get("SELECT * FROM OBSERVATION_LOG")[0] is False
+    assert cache.get("SELECT * FROM TELESCOPES") == (True, "tel")
+
+
+def test_stale_read_is_not_cached():
+    cache = QueryCache()
+    versions = cache.table_versions({"OBSERVATIONS"})
+    cache.invalidate_tables({"OBSERVATIONS"})   # a write lands while the read is running
+    cache.put(SQL, (1,), "stale", {"OBSERVATIONS"}, versions)
+    assert cache.get(SQL, (1,)) == (False, None)
@@ -0,0 +1,74 @@
+"""Coordinate parsing and RA interval splitting in astro_sky."""
+import pytest
+
+from astro_sky import (
+    MAX_SKY_LIMIT, _ra_ranges, _zones, box_query, cone_query, cone_ra_half_width, parse_dec, parse_ra, sky_zone,
+)
+
+
+def test_parse_ra():
+    assert parse_ra("05h 35m 17s") == pytest.approx(83.820833, abs=1e-6)
+    assert parse_ra("0h 0m 0s") == 0.0
+    assert parse_ra("123.5") == 123.5
+    assert parse_ra(359.9) == 359.9
+
+
+@pytest.mark.parametrize("value", ["24h 0m 0s", 360, -1, "north", "5h 35m"])
+def test_parse_ra_rejects(value):
+    with pytest.raises(ValueError):
+        parse_ra(value)
+
+
+def test_parse_dec():
+    assert parse_dec("-05d 23m 28s") == pytest.approx(-5.391111, abs=1e-6)
+    assert parse_dec("+41d 16m 09s") == pytest.approx(41.269167, abs=1e-6)
+    assert parse_dec("-0.5") == -0.5
+    assert parse_dec(90) == 90.0
+
+
+@pytest.mark.parametrize("value", ["91d 0m 0s", -90.5, "south"])
+def test_parse_dec_rejects(value):
+    with pytest.raises(ValueError):
+        parse_dec(value)
+
+
+def test_ra_ranges():
+    assert _ra_ranges(10.0, 20.0) == [(10.0, 20.0)]
+    # wrapping through 0h splits into two intervals
+    assert _ra_ranges(-5.0, 5.0) == [(355.0, 360.0), (0.0, 5.0)]
+    assert _ra_ranges(355.0, 365.0) == [(355.0, 360.0), (0.0, 5.0)]
+    assert _ra_ranges(-200.0, 200.0) == [(0.0, 360.0)]
+
+
+def test_zones_cover_the_band():
+    assert sky_zone(-90) == 0 and sky_zone(89.9) == 359
+    assert _zones(-0.2, 0.7) == [179, 180, 181]
+    assert _zones(89.6, 95) == [359, 360]    # clamped at the pole
+
+
+def test_cone_ra_half_width():
+    assert cone_ra_half_width(0, 1) == pytest.approx(1, abs=1e-6)
+    assert cone_ra_half_width(60, 1) == pytest.approx(2.0003, abs=1e-3)   # widens with 1/cos(dec)
+    assert cone_ra_half_width(89.5, 1) == 180.0                           # pole inside the cone
+
+
+def test_cone_query_wraps_and_binds_every_placeholder():
+    sql, params = cone_query("0h 1m 0s", "+10d 0m 0s", 1.0, limit=5000)
+    assert sql.count("RA_Deg BETWEEN") == 2          # 0.25 deg +/- ~1 deg wraps through 0h
+    assert sql.count("%s") == len(params)
+    assert params[-1] == MAX_SKY_LIMIT
+
+
+@pytest.mark.parametrize("radius", [0, 31])
+def test_cone_query_rejects_radius(radius):
+    with pytest.raises(ValueError):
+        cone_query(10, 10, radius)
+
+
+def test_box_query():
+    sql, params = box_query(350, 10, -1, 1)
+    assert sql.count("RA_Deg BETWEEN") == 2 and sql.count("%s") == len(params)
+    sql, params = box_query(0, 360, -1, 1)
+    assert sql.count("RA_Deg BETWEEN") == 1
+    with pytest.raises(ValueError):
+        box_query(0, 10, 5, -5)
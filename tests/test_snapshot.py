@@ -0,0 +1,84 @@
+"""Snapshot section builders and the Tab 2 answers read from a snapshot."""
+from astro_snapshot import (
+    build_objects_section, build_observations_section, snapshot_distance_extreme, snapshot_magnitude_extreme,
+    snapshot_telescope_hours, snapshot_telescope_usage,
+)
+
+
+class FakeCursor:
+    """Answers each statement by a substring of its SQL."""
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.description = None
+        self.rows = []
+
+    def execute(self, sql, params=()):
+        for marker, (columns, rows) in self.answers.items():
+            if marker in sql:
+                self.description = [(c,) for c in columns]
+                self.rows = rows
+                return
+        raise AssertionError(f"unexpected SQL: {sql}")
+
+    def fetchall(self):
+        return self.rows
+
+
+OBSERVATIONS = {
+    "Name FROM TELESCOPES": (["TelescopeID", "Name"], [(1, "Keck"), (2, "Keck"), (3, "VLT"), (4, "Idle")]),
+    "OS.SeeingCondition": (["TelescopeID", "SeeingCondition", "Observations", "Timed", "Minutes"], [
+        (1, "Good", 3, 2, 100),
+        (2, "Poor", 1, 1, 50),
+        (3, "Good", 2, 0, None),      # no durations recorded
+        (None, None, 4, 4, 40),       # sessions without a telescope
+    ]),
+}
+
+
+def observations_section():
+    return build_observations_section(FakeCursor(OBSERVATIONS))
+
+
+def test_observations_section_per_telescope():
+    section = observations_section()
+    by_id = {t["TelescopeID"]: t for t in section["telescopes"]}
+    assert by_id[1]["AvgDuration"] == 50.0 and by_id[1]["ObsCount"] == 3
+    assert by_id[3]["AvgDuration"] is None and by_id[3]["Hours"] == 0.0
+    assert by_id[4]["ObsCount"] == 0
+    assert section["telescopes"][-1]["TelescopeID"] is None      # unknown telescope sorts last
+    assert section["seeing"] == {"Good": 5, "Poor": 1, "Unknown": 4}
+    assert section["observations"] == 10
+
+
+def test_telescope_usage_matches_live_grouping():
+    # grouped by name, AVG over timed observations only, telescope-less sessions dropped
+    columns, rows = snapshot_telescope_usage({"observations": observations_section()}, 1)
+    assert columns == ["Name", "AvgDuration", "ObsCount"]
+    assert rows == [("Keck", 50.0, 4), ("VLT", None, 2)]
+
+
+def test_telescope_hours():
+    snapshot = {"observations": observations_section()}
+    assert snapshot_telescope_hours(snapshot, 2) == ("Keck", 50 / 60.0)
+    assert snapshot_telescope_hours(snapshot, 99) == (None, None)
+
+
+def test_objects_section_extremes():
+    columns = ["ObjectType", "ObjectName", "Distance_Parsecs", "Magnitude", "Objects",
+               "FarRank", "NearRank", "BrightRank", "DimRank"]
+    rows = [
+        ("Galaxy", "M31", 778000, 3.4, 3, 1, 2, 2, 1),
+        ("Galaxy", "M33", 840000, None, 3, 2, 3, 3, 3),
+        ("Galaxy", "LMC", 50000, 0.9, 3, 3, 1, 1, 2),
+        ("Star", "Sirius", 2.64, -1.46, 1, 1, 1, 1, 1),
+    ]
+    section = build_objects_section(FakeCursor({"CELESTIALOBJECTS": (columns, rows)}))
+    snapshot = {"objects": section}
+    assert section["by_type"]["Galaxy"]["objects"] == 3
+    assert section["by_type"]["Galaxy"]["brightest"] == ["LMC", 0.9]
+    assert snapshot_distance_extreme(snapshot, "Galaxy") == ("M31", 778000)
+    assert snapshot_distance_extreme(snapshot, "Galaxy", farthest=False) == ("LMC", 50000)
+    assert snapshot_distance_extreme(snapshot, "Nebula") is None
+    assert snapshot_magnitude_extreme(snapshot) == ("Sirius", -1.46)
+    assert snapshot_magnitude_extreme(snapshot, brightest=False) == ("M31", 3.4)
@@ -0,0 +1,83 @@
+"""Batched key / duplicate validation (one UNION ALL per chunk of keys)."""
+import re
+from contextlib import contextmanager
+
+from astro_validation import summarize_problems, validate_observations
+
+_PART_RE = re.compile(r"SELECT '(\w+)' AS tbl, \w+ AS id FROM \w+ WHERE \w+ IN \(([%s, ]*)\)")
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.rows = []
+
+    def execute(self, sql, params=()):
+        self.db.statements.append(sql)
+        params, rows = list(params), []
+        for table, placeholders in _PART_RE.findall(sql):
+            count = placeholders.count("%s")
+            values, params = params[:count], params[count:]
+            rows += [(table, v) for v in values if v in self.db.existing.get(table, ())]
+        self.rows = rows
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+
+class FakePool:
+    def __init__(self, existing):
+        self.existing = existing
+        self.statements = []
+
+    @contextmanager
+    def connection(self):
+        yield self
+
+    def cursor(self):
+        return FakeCursor(self)
+
+
+EXISTING = {
+    "RESEARCHERS": {1, 2},
+    "TELESCOPES": {101},
+    "CELESTIALOBJECTS": {1001},
+    "OBSERVATIONSESSIONS": {7},
+    "OBSERVATIONS": {201},
+}
+
+
+def entry(**overrides):
+    e = {"session_id": 50, "researcher_id": 1, "telescope_id": 101, "object_id": 1001, "obs_id": 900}
+    e.update(overrides)
+    return e
+
+
+def test_flags_and_messages():
+    pool = FakePool(EXISTING)
+    reports = validate_observations(pool, [
+        entry(),
+        entry(obs_id=901, researcher_id=3, object_id=9999),
+        entry(obs_id=201, session_id=7),
+        entry(),   # same ObservationID as the first entry
+    ])
+    assert reports[0]["ok"] and reports[0]["problems"] == []
+    assert reports[1]["researcher_missing"] and reports[1]["obj_missing"] and not reports[1]["tel_missing"]
+    assert "ObjectID 9999 does not exist." in reports[1]["problems"]
+    assert reports[2]["obs_dup"] and reports[2]["sess_dup"]
+    assert reports[3]["obs_batch_dup"] and not reports[0]["obs_batch_dup"]
+    assert summarize_problems(reports) == {
+        "researcher_missing": 1, "obj_missing": 1, "sess_dup": 1, "obs_dup": 1, "obs_batch_dup": 1,
+    }
+
+
+def test_one_round_trip_per_chunk():
+    pool = FakePool(EXISTING)
+    validate_observations(pool, [entry(obs_id=i, session_id=i) for i in range(25)])
+    assert len(pool.statements) == 1
+    pool = FakePool(EXISTING)
+    validate_observations(pool, [entry(obs_id=i, session_id=i) for i in range(25)], chunk_size=10)
+    assert len(pool.statements) == 3